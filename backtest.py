@@ -0,0 +1,269 @@
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+WEIGHTINGS = ('equal', 'cap', 'sector')
+
+# Rebalance frequencies as pandas period codes; 'hold' buys once and never rebalances
+FREQUENCIES = ('W', 'M', 'Q', 'Y', 'hold')
+
+TRADING_DAYS = 252
+
+# Dates per block when expanding period weights into daily portfolio growth
+CHUNK_DAYS = 1024
+
+# Configurations simulated together; also bounds the (periods, configs, tickers) weight array
+SHARD_CONFIGS = 32
+
+# Below this many configurations a sweep runs in-process instead of in a pool
+POOL_MIN_CONFIGS = 256
+
+STAT_COLUMNS = ['total_return_pct', 'cagr_pct', 'volatility_pct', 'sharpe', 'max_drawdown_pct', 'avg_turnover_pct']
+
+
+def build_price_panel(stock_data, ticker_list=None):
+    """Closes aligned on the union of trading dates (dates x tickers), forward-filled after listing"""
+    closes = {}
+    for ticker in ticker_list or list(stock_data):
+        if ticker in stock_data:
+            df = stock_data[ticker]
+            dates = df['date'] if 'date' in df.columns else df.index
+            closes[ticker] = pd.Series(df['close'].to_numpy(), index=pd.DatetimeIndex(dates))
+    return pd.DataFrame(closes).sort_index().ffill()
+
+
+def rebalance_points(dates, freq):
+    """Row positions of the first trading day of each rebalance period"""
+    if freq == 'hold' or len(dates) == 0:
+        return np.zeros(min(1, len(dates)), dtype=np.int64)
+    periods = dates.to_period(freq).asi8
+    return np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+
+
+def performance_stats(equity, dates):
+    """Return and risk statistics for each column of a (dates x configs) equity array"""
+    years = max((dates[-1] - dates[0]).days / 365.25, 1 / 365.25)
+    daily = equity[1:] / equity[:-1] - 1
+    volatility = daily.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS) if len(daily) > 1 else np.full(equity.shape[1], np.nan)
+    mean = daily.mean(axis=0) * TRADING_DAYS if len(daily) else np.full(equity.shape[1], np.nan)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+    return {
+        'total_return_pct': (equity[-1] - 1) * 100,
+        'cagr_pct': (equity[-1] ** (1 / years) - 1) * 100,
+        'volatility_pct': volatility * 100,
+        'sharpe': np.divide(mean, volatility, out=np.full_like(mean, np.nan), where=volatility > 0),
+        'max_drawdown_pct': drawdown.min(axis=0) * 100
+    }
+
+
+def parameter_grid(sectors, weightings=WEIGHTINGS, frequencies=FREQUENCIES, costs_bps=(0,), min_sectors=1):
+    """Every combination of weighting, rebalance frequency, trading cost and sector subset"""
+    mixes = [list(mix) for size in range(min_sectors, len(sectors) + 1)
+             for mix in itertools.combinations(sectors, size)]
+    return [{'weighting': weighting, 'rebalance': freq, 'sectors': mix, 'cost_bps': cost}
+            for weighting, freq, cost, mix in itertools.product(weightings, frequencies, costs_bps, mixes)]
+
+
+def describe_config(config):
+    sectors = config.get('sectors')
+    if sectors is None:
+        mix = "All"
+    elif isinstance(sectors, dict):
+        mix = ", ".join(f"{sector} {weight:g}" for sector, weight in sectors.items())
+    else:
+        mix = ", ".join(sectors)
+    return {
+        'weighting': config.get('weighting', 'equal'),
+        'rebalance': config.get('rebalance', 'M'),
+        'sectors': mix,
+        'cost_bps': config.get('cost_bps', 0)
+    }
+
+
+class Backtester:
+    """Periodically rebalanced portfolios built from the stock metadata.
+
+    Target weights are set at the close of the first trading day of each
+    rebalance period over the tickers priced that day, then drift with prices
+    until the next rebalance. 'equal' splits evenly, 'cap' weights by the
+    metadata Market Cap and 'sector' gives each selected sector a share
+    (equal, or as given in a {sector: weight} mix) split evenly within it.
+    The metadata holds a single market cap snapshot, so cap weights are
+    static and carry that look-ahead. stock_metadata must have Market Cap
+    parsed to numbers, as stock_store.load_stock_metadata does.
+    """
+
+    def __init__(self, stock_data, stock_metadata):
+        metadata = stock_metadata.drop_duplicates('Ticker').set_index('Ticker')
+        known = [ticker for ticker in metadata.index if ticker in stock_data]
+        self.prices = build_price_panel(stock_data, known)
+        self.tickers = list(self.prices.columns)
+        self.dates = self.prices.index
+        self.price_array = self.prices.to_numpy(dtype=np.float64)
+        self.metadata = metadata.loc[self.tickers]
+        self.caps = self.metadata['Market Cap'].to_numpy(dtype=np.float64)
+        self.sectors = sorted(self.metadata['Sector'].unique())
+        sector_codes = self.metadata['Sector'].map({sector: i for i, sector in enumerate(self.sectors)}).to_numpy()
+        self.sector_codes = sector_codes.astype(np.int64)
+        self.sector_onehot = np.eye(len(self.sectors))[self.sector_codes]
+
+    def _check(self, config):
+        if config.get('weighting', 'equal') not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting: {config.get('weighting')}")
+        if config.get('rebalance', 'M') not in FREQUENCIES:
+            raise ValueError(f"Unknown rebalance frequency: {config.get('rebalance')}")
+
+    def _members(self, config):
+        members = np.ones(len(self.tickers), dtype=bool)
+        if config.get('tickers') is not None:
+            members &= np.isin(self.tickers, list(config['tickers']))
+        if config.get('sectors') is not None:
+            members &= np.isin(self.metadata['Sector'].to_numpy(), list(config['sectors']))
+        return members
+
+    def _sector_weights(self, config):
+        sectors = config.get('sectors')
+        if isinstance(sectors, dict):
+            return np.array([sectors.get(sector, 0.0) for sector in self.sectors], dtype=np.float64)
+        return np.ones(len(self.sectors))
+
+    def _period_weights(self, configs, prices, points):
+        """Target weights at each rebalance point, shaped (periods, configs, tickers)"""
+        available = np.isfinite(prices[points])
+        members = np.stack([self._members(c) for c in configs])
+        is_cap = np.array([c.get('weighting', 'equal') == 'cap' for c in configs])
+        is_sector = np.array([c.get('weighting', 'equal') == 'sector' for c in configs])
+
+        held = available[:, None, :] & members[None]
+        base = np.where(is_cap[:, None], self.caps[None], 1.0)
+        weights = held * base[None]
+
+        if is_sector.any():
+            sector_weights = np.stack([self._sector_weights(c) for c in configs])
+            per_sector = held.astype(np.float64) @ self.sector_onehot
+            share = np.divide(sector_weights[None], per_sector, out=np.zeros_like(per_sector), where=per_sector > 0)
+            weights = np.where(is_sector[None, :, None], held * share[:, :, self.sector_codes], weights)
+
+        total = weights.sum(axis=2, keepdims=True)
+        return np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+
+    def row_range(self, start_year, end_year):
+        years = self.dates.year
+        lo = 0 if start_year is None else int(np.searchsorted(years, start_year, side='left'))
+        hi = len(self.dates) if end_year is None else int(np.searchsorted(years, end_year, side='right'))
+        return lo, hi
+
+    def _simulate(self, configs, freq, lo, hi):
+        """Equity curves (dates x configs) and average turnover for configs sharing one frequency"""
+        prices = self.price_array[lo:hi]
+        dates = self.dates[lo:hi]
+        n_days = len(dates)
+        points = rebalance_points(dates, freq)
+        weights = self._period_weights(configs, prices, points)
+
+        # Each day's growth since the last rebalance, from prices relative to that day
+        period = np.maximum(np.searchsorted(points, np.arange(n_days), side='left') - 1, 0)
+        relative = prices / prices[points[period]]
+        relative = np.where(np.isfinite(relative), relative, 0.0)
+        growth = np.empty((n_days, len(configs)))
+        for start in range(0, n_days, CHUNK_DAYS):
+            stop = min(start + CHUNK_DAYS, n_days)
+            growth[start:stop] = np.einsum('tn,tcn->tc', relative[start:stop], weights[period[start:stop]])
+        invested = weights.sum(axis=2) > 0
+        growth = np.where(invested[period], growth, 1.0)
+
+        # Turnover and costs at each rebalance after the first
+        ends = points[1:]
+        period_growth = growth[ends]
+        drifted = weights[:-1] * relative[ends][:, None, :]
+        drifted = np.divide(drifted, period_growth[:, :, None], out=np.zeros_like(drifted),
+                            where=period_growth[:, :, None] > 0)
+        turnover = np.abs(weights[1:] - drifted).sum(axis=2)
+        costs = np.array([c.get('cost_bps', 0) for c in configs], dtype=np.float64) / 10_000
+        net = period_growth * (1 - costs[None] * turnover)
+
+        start_value = np.vstack([np.ones((1, len(configs))), np.cumprod(net, axis=0)])
+        equity = start_value[period] * growth
+        avg_turnover = turnover.mean(axis=0) if len(turnover) else np.zeros(len(configs))
+        return equity, avg_turnover
+
+    def run_many(self, configs, start_year=None, end_year=None):
+        """Simulate every configuration; returns (equity array dates x configs, stats DataFrame)"""
+        for config in configs:
+            self._check(config)
+        lo, hi = self.row_range(start_year, end_year)
+        dates = self.dates[lo:hi]
+        if len(dates) == 0:
+            return np.empty((0, len(configs))), pd.DataFrame(columns=STAT_COLUMNS, index=range(len(configs)))
+
+        equity = np.empty((len(dates), len(configs)))
+        turnover = np.empty(len(configs))
+        by_freq = {}
+        for i, config in enumerate(configs):
+            by_freq.setdefault(config.get('rebalance', 'M'), []).append(i)
+        for freq, positions in by_freq.items():
+            for s in range(0, len(positions), SHARD_CONFIGS):
+                shard = positions[s:s + SHARD_CONFIGS]
+                equity[:, shard], turnover[shard] = self._simulate([configs[i] for i in shard], freq, lo, hi)
+
+        stats = pd.DataFrame(performance_stats(equity, dates))
+        stats['avg_turnover_pct'] = turnover * 100
+        return equity, stats[STAT_COLUMNS]
+
+    def run(self, start_year=None, end_year=None, **config):
+        """Equity curve (starting at 1.0) and statistics for one configuration"""
+        equity, stats = self.run_many([config], start_year, end_year)
+        lo, hi = self.row_range(start_year, end_year)
+        return pd.Series(equity[:, 0], index=self.dates[lo:hi], name='equity'), stats.iloc[0].to_dict()
+
+    def sweep(self, configs, start_year=None, end_year=None, workers=None):
+        """Statistics for every configuration, sharded across a process pool when large"""
+        shards = [configs[i:i + SHARD_CONFIGS] for i in range(0, len(configs), SHARD_CONFIGS)]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(configs) >= POOL_MIN_CONFIGS:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as pool:
+                results = list(pool.map(_sweep_shard, shards, [start_year] * len(shards), [end_year] * len(shards)))
+        else:
+            results = [self.run_many(shard, start_year, end_year)[1] for shard in shards]
+
+        stats = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=STAT_COLUMNS)
+        described = pd.DataFrame([describe_config(c) for c in configs])
+        return pd.concat([described, stats], axis=1)
+
+
+# Each pool worker receives the backtester once instead of with every shard
+_worker_backtester = None
+
+
+def _init_worker(backtester):
+    global _worker_backtester
+    _worker_backtester = backtester
+
+
+def _sweep_shard(configs, start_year, end_year):
+    return _worker_backtester.run_many(configs, start_year, end_year)[1]
+
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    from stock_store import load_stock_data, load_stock_metadata
+
+    parser = argparse.ArgumentParser(description="Sweep portfolio backtests over the metadata universe")
+    parser.add_argument("--start-year", type=int, default=None)
+    parser.add_argument("--end-year", type=int, default=None)
+    parser.add_argument("--costs", default="0", help="Comma-separated trading costs in basis points")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20, help="Rows to print, best Sharpe first")
+    args = parser.parse_args()
+
+    backtester = Backtester(load_stock_data(), load_stock_metadata())
+    costs = [float(cost) for cost in args.costs.split(",")]
+    configs = parameter_grid(backtester.sectors, costs_bps=costs)
+    start = time.perf_counter()
+    results = backtester.sweep(configs, args.start_year, args.end_year, args.workers)
+    elapsed = time.perf_counter() - start
+    print(results.sort_values('sharpe', ascending=False).head(args.top).to_string(index=False))
+    print(f"{len(configs)} configurations in {elapsed:.2f} s")
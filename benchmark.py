@@ -0,0 +1,423 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from contextlib import contextmanager
+
+# Render off-screen so the benchmark can run on a headless machine
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import pandas as pd
+import matplotlib
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QPointF
+from macrotrends_reader import read_macrotrends
+
+# Directory holding the MacroTrends CSV downloads
+DATA_DIR = "data"
+
+# Baselines are committed so that regressions show up as diffs
+BASELINE_PATH = "benchmark_baseline.json"
+
+# A result slower than the baseline by more than this ratio counts as a regression
+REGRESSION_THRESHOLD = 1.25
+
+# Time from launching dashboard.py to the first paint of its window, which
+# must stay under this regardless of the baseline. The data loads after the
+# window is up, so this only covers Python, Qt and the host window itself.
+FIRST_PAINT_TARGET_MS = 400
+
+# Absolute limits checked alongside the baseline ratios
+TARGETS_MS = {'startup_first_paint': FIRST_PAINT_TARGET_MS}
+
+tickers = ["AAPL", "ABBV", "AVGO", "BAC", "BRK.A", "BRK.B", "COST", "GOOGL", "HD", "JNJ", "JPM", "LLY", "MA", "META",
+           "MSFT", "NFLX", "NVDA", "ORCL", "PG", "TSLA", "UNH", "V", "WMT", "XOM"]
+
+
+def time_call(func, repeat=5):
+    """Run func repeat times and return timing statistics in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'repeat': repeat
+    }
+
+
+def load_csv_data(data_dir=DATA_DIR, engine=None):
+    """Load every MacroTrends CSV the same way the dashboards do"""
+    data = {}
+    for ticker in tickers:
+        data[ticker] = read_macrotrends(os.path.join(data_dir, f"MacroTrends_Data_Download_{ticker}.csv"),
+                                        engine=engine)
+    return data
+
+
+def make_synthetic_universe(base_data, n_tickers=5000, n_years=50, seed=0):
+    """Replicate the real tickers into a larger universe of synthetic daily bars.
+
+    Each synthetic ticker replays the daily log returns of one real ticker,
+    rotated by a random offset and perturbed with noise so replicas differ.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2024-12-31", periods=n_years * 252)
+    n_rows = len(dates)
+    base = list(base_data.items())
+    universe = {}
+
+    for i in range(n_tickers):
+        source_ticker, source_df = base[i % len(base)]
+        log_returns = np.diff(np.log(source_df['close'].to_numpy()))
+        log_returns = log_returns[np.isfinite(log_returns)]
+
+        # Tile the source returns up to the target length
+        reps = -(-(n_rows - 1) // len(log_returns))
+        tiled = np.roll(np.tile(log_returns, reps)[:n_rows - 1], rng.integers(len(log_returns)))
+        tiled = tiled + rng.normal(0, 0.002, n_rows - 1)
+
+        close = rng.uniform(5, 200) * np.exp(np.concatenate([[0.0], np.cumsum(tiled)]))
+        open_ = close * (1 + rng.normal(0, 0.005, n_rows))
+        spread = np.abs(rng.normal(0, 0.01, n_rows))
+
+        name = source_ticker if i < len(base) else f"{source_ticker}.S{i // len(base)}"
+        universe[name] = pd.DataFrame({
+            'date': dates,
+            'open': open_,
+            'high': np.maximum(open_, close) * (1 + spread),
+            'low': np.minimum(open_, close) * (1 - spread),
+            'close': close,
+            'volume': rng.integers(100_000, 100_000_000, n_rows)
+        })
+
+    return universe
+
+
+def index_by_date(data):
+    """Return date-indexed copies of the frames, as visual3 stores them"""
+    return {ticker: df.set_index('date') for ticker, df in data.items()}
+
+
+@contextmanager
+def swap_stock_data(module, data):
+    """Temporarily point a dashboard module's stock_data at another universe, dropping its cached results.
+
+    A module reading the partition store gets a temporary one holding data instead.
+    """
+    import tempfile
+    from partition_store import PartitionStore
+
+    results = getattr(module, 'results', None)
+    partitions = getattr(module, 'partitions', None)
+    original = dict(module.stock_data)
+    with tempfile.TemporaryDirectory() as root:
+        if partitions is not None:
+            module.partitions = PartitionStore(root)
+            for ticker, df in data.items():
+                module.partitions.write(ticker, df)
+        module.stock_data.clear()
+        module.stock_data.update(data)
+        if results is not None:
+            results.clear()
+        try:
+            yield
+        finally:
+            module.stock_data.clear()
+            module.stock_data.update(original)
+            if partitions is not None:
+                module.partitions = partitions
+            if results is not None:
+                results.clear()
+
+
+class _MouseMove:
+    """Minimal stand-in for a QMouseEvent carrying only a position"""
+
+    def __init__(self, x, y):
+        self._pos = QPointF(x, y)
+
+    def position(self):
+        return self._pos
+
+
+def bench_csv_ingest(repeat, engine=None):
+    result = time_call(lambda: load_csv_data(engine=engine), repeat)
+    rows = sum(len(df) for df in load_csv_data(engine=engine).values())
+    result['rows_per_sec'] = round(rows / (result['median_ms'] / 1000))
+    return result
+
+
+def bench_year_slice(data, repeat):
+    """Slice 2000-2020 out of every ticker and compute its gain, bypassing visual1's result cache"""
+    import visual1
+
+    def run():
+        for ticker in data:
+            visual1.cumulative_gain(visual1.select_years(ticker, 2000, 2020))
+
+    with swap_stock_data(visual1, data):
+        return time_call(run, repeat)
+
+
+def bench_yearly_change(indexed_data, repeat):
+    import visual3
+
+    def run():
+        for df in indexed_data.values():
+            visual3.calculate_yearly_percentage_change(df)
+
+    return time_call(run, repeat)
+
+
+def bench_impact_table(data, repeat, max_tickers=100):
+    import visual4
+    canvas = visual4.StockPlotCanvas(width=12, height=6)
+    selected_tickers = list(data)[:max_tickers]
+    selected_events = visual4.market_events['Event'].tolist()
+
+    with swap_stock_data(visual4, data):
+        return time_call(lambda: canvas.create_impact_table(selected_tickers, selected_events), repeat)
+
+
+def bench_event_drawdown(data, repeat):
+    from stock_store import load_market_events
+    from event_analysis import EventAnalyzer
+    events = load_market_events()
+    return time_call(lambda: EventAnalyzer(data).analyze(events), repeat)
+
+
+def bench_partition_read(data, repeat):
+    """Read 2007-2009 of every ticker from a year-partitioned copy of data, from disk and from the hot tier"""
+    import tempfile
+    from partition_store import PartitionStore
+
+    with tempfile.TemporaryDirectory() as root:
+        store = PartitionStore(root)
+        for ticker, df in data.items():
+            store.write(ticker, df)
+        store.save_catalog()
+
+        def run(cold):
+            if cold:
+                store.clear_hot()
+            for ticker in data:
+                store.read_years(ticker, 2007, 2009)
+
+        return {
+            'partition_read_cold': time_call(lambda: run(True), repeat),
+            'partition_read_hot': time_call(lambda: run(False), repeat)
+        }
+
+
+def bench_hover_hit_test(repeat, grid=20):
+    import visual3
+    canvas = visual3.YearlyChangePlotCanvas(width=15, height=10)
+    canvas.resize(*canvas.get_width_height())
+    canvas.plot_yearly_changes(tickers, 1980, 2024)
+
+    # Sweep a grid of cursor positions across the axes area
+    ratio = canvas.devicePixelRatioF()
+    bbox = canvas.ax.get_window_extent()
+    height = canvas.height() * ratio
+    events = [
+        _MouseMove(x / ratio, (height - y) / ratio)
+        for x in np.linspace(bbox.x0, bbox.x1, grid)
+        for y in np.linspace(bbox.y0, bbox.y1, grid)
+    ]
+
+    def run():
+        for event in events:
+            canvas.mouseMoveEvent(event)
+
+    result = time_call(run, repeat)
+    result['events'] = len(events)
+    return result
+
+
+def bench_render(repeat):
+    """Time an Agg draw of every dashboard canvas after it has been plotted"""
+    import visual1
+    import visual2
+    import visual3
+    import visual4
+
+    canvas1 = visual1.StockPlotCanvas(width=8, height=6)
+    canvas1.plot_stock("AAPL", 1980, 2024, "Apple")
+
+    canvas2 = visual2.StockPlotCanvas(width=10, height=8)
+    canvas2.plot_stocks(tickers, 1980, 2024)
+
+    canvas3 = visual3.YearlyChangePlotCanvas(width=15, height=10)
+    canvas3.plot_yearly_changes(tickers, 1980, 2024)
+
+    canvas4 = visual4.StockPlotCanvas(width=12, height=6)
+    canvas4.plot_stocks(["AAPL", "MSFT", "JPM"], visual4.market_events['Event'].tolist())
+
+    canvases = {
+        'render_visual1': canvas1,
+        'render_visual2': canvas2,
+        'render_visual3': canvas3,
+        'render_visual4': canvas4
+    }
+    return {name: time_call(canvas.draw, repeat) for name, canvas in canvases.items()}
+
+
+def bench_startup(repeat):
+    """Launch dashboard.py repeatedly and time its first paint and first built view.
+
+    The launch time is passed in STOCK_STARTUP_T0 so interpreter startup and
+    imports are included.
+    """
+    timings = {'first_paint': [], 'ready': []}
+    for _ in range(repeat):
+        env = dict(os.environ, STOCK_STARTUP_T0=repr(time.time()))
+        output = subprocess.run([sys.executable, "dashboard.py", "--exit-after", "ready"], env=env,
+                                capture_output=True, text=True, timeout=300).stdout
+        for line in output.splitlines():
+            name, _, value = line.partition("_ms ")
+            if name in timings:
+                timings[name].append(float(value))
+    results = {}
+    for name, values in timings.items():
+        if not values:
+            print(f"Error timing startup: dashboard.py reported no {name} time")
+            continue
+        results[f'startup_{name}'] = {
+            'min_ms': round(min(values), 3),
+            'median_ms': round(statistics.median(values), 3),
+            'repeat': len(values)
+        }
+    return results
+
+
+def run_suite(repeat=5, scale=None):
+    results = {}
+
+    print("Benchmarking CSV ingestion...")
+    results['csv_ingest'] = bench_csv_ingest(repeat)
+    results['csv_ingest_pandas'] = bench_csv_ingest(repeat, engine='pandas')
+
+    data = load_csv_data()
+    indexed_data = index_by_date(data)
+
+    print("Benchmarking year-range slicing...")
+    results['year_slice'] = bench_year_slice(data, repeat)
+
+    print("Benchmarking yearly percentage change...")
+    results['yearly_change'] = bench_yearly_change(indexed_data, repeat)
+
+    print("Benchmarking impact table...")
+    results['impact_table'] = bench_impact_table(data, repeat)
+
+    print("Benchmarking event drawdown analysis...")
+    results['event_drawdown'] = bench_event_drawdown(data, repeat)
+
+    print("Benchmarking partitioned reads...")
+    results.update(bench_partition_read(data, repeat))
+
+    print("Benchmarking hover hit-testing...")
+    results['hover_hit_test'] = bench_hover_hit_test(repeat)
+
+    print("Benchmarking Agg rendering...")
+    results.update(bench_render(repeat))
+
+    print("Benchmarking dashboard startup...")
+    results.update(bench_startup(repeat))
+
+    if scale:
+        n_tickers, n_years = scale
+        label = f"{n_tickers}x{n_years}"
+        print(f"Building synthetic universe ({label})...")
+        synthetic = make_synthetic_universe(data, n_tickers, n_years)
+        scaled_repeat = max(1, repeat // 2)
+
+        print("Benchmarking scaled year-range slicing...")
+        results[f'year_slice_{label}'] = bench_year_slice(synthetic, scaled_repeat)
+
+        print("Benchmarking scaled yearly percentage change...")
+        results[f'yearly_change_{label}'] = bench_yearly_change(index_by_date(synthetic), scaled_repeat)
+
+        print("Benchmarking scaled impact table...")
+        results[f'impact_table_{label}'] = bench_impact_table(synthetic, scaled_repeat)
+
+        print("Benchmarking scaled event drawdown analysis...")
+        results[f'event_drawdown_{label}'] = bench_event_drawdown(synthetic, scaled_repeat)
+
+    return results
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'matplotlib': matplotlib.__version__
+    }
+
+
+def compare_to_baseline(results, baseline_path=BASELINE_PATH):
+    """Print the ratio of each result to the baseline and return the regressions"""
+    baseline = {}
+    if os.path.exists(baseline_path):
+        try:
+            with open(baseline_path) as f:
+                baseline = json.load(f)['results']
+        except Exception as e:
+            print(f"Error loading baseline: {e}")
+
+    regressions = []
+    for name, result in results.items():
+        target = TARGETS_MS.get(name)
+        if target is not None and result['median_ms'] > target:
+            print(f"{name:<32} {result['median_ms']:>10.2f} ms   OVER TARGET ({target} ms)")
+            regressions.append(name)
+            continue
+        if name not in baseline:
+            print(f"{name:<32} {result['median_ms']:>10.2f} ms   (new)")
+            continue
+        ratio = result['median_ms'] / baseline[name]['median_ms']
+        flag = "REGRESSION" if ratio > REGRESSION_THRESHOLD else ""
+        print(f"{name:<32} {result['median_ms']:>10.2f} ms   x{ratio:.2f} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def parse_scale(text):
+    n_tickers, n_years = text.lower().split("x")
+    return int(n_tickers), int(n_years)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard load, compute and render paths")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--scale", type=parse_scale, default=None,
+                        help="Also run on a synthetic universe, e.g. 5000x50 (tickers x years)")
+    parser.add_argument("--save", action="store_true", help=f"Write results to {BASELINE_PATH}")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = run_suite(args.repeat, args.scale)
+
+    regressions = compare_to_baseline(results)
+
+    if args.save:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({'environment': environment_info(), 'results': results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {BASELINE_PATH}")
+
+    sys.exit(1 if regressions and not args.save else 0)
+
+
+if __name__ == "__main__":
+    main()
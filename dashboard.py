@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import importlib
+
+# Wall-clock start of the process for startup timing; the benchmark passes
+# the time it launched us so interpreter startup is included
+STARTUP_T0 = float(os.environ.get("STOCK_STARTUP_T0", time.time()))
+
+from PyQt6.QtCore import Qt, QObject, QEvent, pyqtSignal
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel,
+                             QProgressBar)
+import instrumentation
+
+# Tab title, module and window class of each view; a view's module is only
+# imported, and its window built, the first time its tab is shown
+VIEWS = [
+    ("Price History", "visual1", "StockViewerApp"),
+    ("Filtered Prices", "visual2", "StockViewerApp"),
+    ("Yearly Changes", "visual3", "StockViewerApp"),
+    ("Event Impact", "visual4", "StockViewerApp"),
+    ("Portfolio Backtest", "visual5", "PortfolioViewerApp"),
+    ("Event Clusters", "visual6", "ClusterViewerApp")
+]
+
+# Progress messages for each SharedData.load_all step
+LOAD_STEPS = {
+    'partitions': "Updating partitioned price store",
+    'stock_data': "Loading prices",
+    'stock_metadata': "Loading stock metadata",
+    'market_events': "Loading market events",
+    'index_data': "Building sector and state indices"
+}
+
+
+def elapsed_ms():
+    return (time.time() - STARTUP_T0) * 1000
+
+
+class DataLoader(QObject):
+    """Loads the shared data on a background thread and reports progress to the UI thread"""
+    progress = pyqtSignal(str, int, int)
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def start(self):
+        threading.Thread(target=self._run, name="data-loader", daemon=True).start()
+
+    def _run(self):
+        try:
+            # pandas and the data layer are imported here, off the UI thread
+            from stock_store import shared_data
+            shared_data().load_all(lambda step, done, total: self.progress.emit(step, done, total))
+            self.finished.emit()
+        except Exception as e:
+            self.failed.emit(f"{type(e).__name__}: {e}")
+
+
+class DashboardHost(QMainWindow):
+    """All dashboards as tabs of one window, sharing the process's loaded data.
+
+    The window appears immediately; the data loads in the background with a
+    progress bar, and the first tab is built once it is ready.
+    """
+    first_painted = pyqtSignal()
+    ready = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.tabs = QTabWidget(self)
+        self.pages = []
+        self.views = {}
+        self.data_ready = False
+        self._painted = False
+
+        for title, _, _ in VIEWS:
+            page = QWidget()
+            layout = QVBoxLayout(page)
+            layout.setContentsMargins(0, 0, 0, 0)
+            self.tabs.addTab(page, title)
+            self.pages.append(page)
+
+        # Loading indicator shown until the data is ready
+        self.status_label = QLabel("Starting...")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(300)
+        self.statusBar().addWidget(self.status_label)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
+        self.tabs.currentChanged.connect(self.activate)
+        self.setCentralWidget(self.tabs)
+        self.installEventFilter(self)
+
+        self.loader = DataLoader()
+        self.loader.progress.connect(self.on_progress)
+        self.loader.finished.connect(self.on_loaded)
+        self.loader.failed.connect(self.on_failed)
+        self.loader.start()
+
+    def eventFilter(self, obj, event):
+        if obj is self and event.type() == QEvent.Type.Paint and not self._painted:
+            self._painted = True
+            self.first_painted.emit()
+        return super().eventFilter(obj, event)
+
+    def on_progress(self, step, done, total):
+        self.status_label.setText(LOAD_STEPS.get(step, step) + "...")
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def on_loaded(self):
+        self.data_ready = True
+        self.status_label.setText("Building view...")
+        self.activate(self.tabs.currentIndex())
+        self.status_label.setText("Ready")
+        self.progress_bar.hide()
+        self.ready.emit()
+
+    def on_failed(self, message):
+        self.status_label.setText(f"Error loading data: {message}")
+        self.progress_bar.hide()
+
+    def activate(self, index):
+        """Build the view behind a tab the first time it is shown"""
+        if not self.data_ready or index < 0 or index in self.views:
+            return
+        _, module_name, class_name = VIEWS[index]
+        with instrumentation.pipeline(f"dashboard.build_{module_name}") as trace:
+            trace.stage("import")
+            module = importlib.import_module(module_name)
+            trace.stage("build")
+            view = getattr(module, class_name)()
+            view.setWindowFlags(Qt.WindowType.Widget)
+            self.pages[index].layout().addWidget(view)
+        self.views[index] = view
+
+
+def main():
+    parser = argparse.ArgumentParser(description="All dashboards in one window")
+    parser.add_argument("--exit-after", choices=['first_paint', 'ready'], default=None,
+                        help="Print startup timings and exit after the first paint or once the first view is built")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    host = DashboardHost()
+    host.setWindowTitle("Stock Market Historical Analysis")
+    host.resize(1400, 900)
+
+    timings = {}
+
+    def record(name):
+        timings[name] = elapsed_ms()
+        if args.exit_after:
+            print(f"{name}_ms {timings[name]:.1f}", flush=True)
+            if name == args.exit_after:
+                app.quit()
+
+    host.first_painted.connect(lambda: record('first_paint'))
+    host.ready.connect(lambda: record('ready'))
+    host.loader.failed.connect(lambda message: app.exit(1) if args.exit_after else None)
+    host.show()
+    sys.exit(app.exec())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Per-ticker scan results are cached here, keyed on each CSV's size and mtime
+CACHE_DIR = os.path.join("data", ".cache")
+
+# Row flags, combined as a bitmask per row
+MISSING_PRICE = 1 << 0
+NONPOSITIVE_PRICE = 1 << 1
+OHLC_INCONSISTENT = 1 << 2
+DUPLICATE_DATE = 1 << 3
+NON_MONOTONIC_DATE = 1 << 4
+NEGATIVE_VOLUME = 1 << 5
+GAP = 1 << 6
+RETURN_OUTLIER = 1 << 7
+
+FLAG_NAMES = {
+    MISSING_PRICE: 'missing_price',
+    NONPOSITIVE_PRICE: 'nonpositive_price',
+    OHLC_INCONSISTENT: 'ohlc_inconsistent',
+    DUPLICATE_DATE: 'duplicate_date',
+    NON_MONOTONIC_DATE: 'non_monotonic_date',
+    NEGATIVE_VOLUME: 'negative_volume',
+    GAP: 'gap',
+    RETURN_OUTLIER: 'return_outlier'
+}
+
+# Rows with any of these flags are unusable and are dropped or masked by
+# clean(). Gaps and return outliers are only reported: the largest moves in
+# the data (1987, 2008, March 2020) are real.
+ERROR_FLAGS = MISSING_PRICE | NONPOSITIVE_PRICE | OHLC_INCONSISTENT | DUPLICATE_DATE | NON_MONOTONIC_DATE
+
+# Calendar days between consecutive rows above which the later row is flagged;
+# the longest real closure in the data is the 7 days after 9/11
+MAX_GAP_DAYS = 14
+
+# Robust z-score (median / 1.4826 * MAD of each ticker's daily log returns)
+# above which a return is flagged for review
+RETURN_Z_THRESHOLD = 12.0
+
+# Bump when the checks change so cached reports are rescanned
+SCAN_VERSION = 1
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def _columns(store, ticker):
+    """Date (epoch days), price and volume arrays for a frame dict or CompactStore entry"""
+    columns = getattr(store, 'columns', None)
+    if isinstance(columns, dict) and ticker in columns:
+        raw = columns[ticker]
+        scale = store.volume_scale.get(ticker, 1)
+        return {
+            'date': raw['date'].astype(np.int64),
+            **{column: raw[column].astype(np.float64) for column in PRICE_COLUMNS},
+            'volume': raw['volume'].astype(np.int64) * scale
+        }
+    df = store[ticker]
+    dates = df['date'] if 'date' in df.columns else df.index
+    return {
+        'date': np.asarray(dates, dtype='datetime64[D]').astype(np.int64),
+        **{column: df[column].to_numpy(dtype=np.float64) for column in PRICE_COLUMNS},
+        'volume': df['volume'].to_numpy(dtype=np.int64)
+    }
+
+
+def scan(store, ticker_list=None):
+    """Flag every row of every ticker in one vectorized pass over the concatenated columns.
+
+    store is a dict of DataFrames or a stock_store.CompactStore.
+    """
+    ticker_list = list(store) if ticker_list is None else list(ticker_list)
+    if not ticker_list:
+        return QualityReport({})
+    parts = [_columns(store, ticker) for ticker in ticker_list]
+    lengths = np.array([len(part['date']) for part in parts], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    segment = np.repeat(np.arange(len(parts)), lengths)
+    n = int(lengths.sum())
+
+    days = np.concatenate([part['date'] for part in parts])
+    o, h, l, c = (np.concatenate([part[column] for part in parts]) for column in PRICE_COLUMNS)
+    volume = np.concatenate([part['volume'] for part in parts])
+
+    first = np.zeros(n, dtype=bool)
+    first[offsets[lengths > 0]] = True
+
+    flags = np.zeros(n, dtype=np.uint16)
+    prices = np.vstack([o, h, l, c])
+    flags[~np.isfinite(prices).all(axis=0)] |= MISSING_PRICE
+    flags[(prices <= 0).any(axis=0)] |= NONPOSITIVE_PRICE
+    flags[(h < np.maximum(np.maximum(o, c), l)) | (l > np.minimum(np.minimum(o, c), h))] |= OHLC_INCONSISTENT
+    flags[volume < 0] |= NEGATIVE_VOLUME
+
+    # Date order within each ticker
+    step = np.diff(days, prepend=days[:1])
+    step[first] = 1
+    flags[step < 0] |= NON_MONOTONIC_DATE
+    flags[step > MAX_GAP_DAYS] |= GAP
+
+    # Any repeat of an earlier date in the same ticker, adjacent or not
+    order = np.lexsort((np.arange(n), days, segment))
+    repeat = (days[order][1:] == days[order][:-1]) & (segment[order][1:] == segment[order][:-1])
+    flags[order[1:][repeat]] |= DUPLICATE_DATE
+
+    # Daily log returns between usable closes, scored against each ticker's own spread
+    usable = np.isfinite(c) & (c > 0)
+    has_return = ~first & usable & np.roll(usable, 1)
+    returns = np.full(n, np.nan)
+    idx = np.flatnonzero(has_return)
+    returns[idx] = np.log(c[idx] / c[idx - 1])
+    grouped = pd.Series(returns).groupby(segment)
+    median = grouped.transform('median').to_numpy()
+    mad = pd.Series(np.abs(returns - median)).groupby(segment).transform('median').to_numpy() * 1.4826
+    z = np.divide(returns - median, mad, out=np.zeros(n), where=mad > 0)
+    flags[np.abs(np.nan_to_num(z)) > RETURN_Z_THRESHOLD] |= RETURN_OUTLIER
+
+    return QualityReport({ticker: flags[offsets[i]:offsets[i] + lengths[i]] for i, ticker in enumerate(ticker_list)})
+
+
+class QualityReport:
+    """Per-row anomaly flags for each ticker, with helpers to drop or mask bad rows"""
+
+    def __init__(self, flags):
+        self.flags = flags
+
+    def __contains__(self, ticker):
+        return ticker in self.flags
+
+    def bad_rows(self, ticker, mask_flags=ERROR_FLAGS):
+        return (self.flags[ticker] & mask_flags) != 0
+
+    def summary(self):
+        """One row per ticker with the number of rows carrying each flag"""
+        rows = []
+        for ticker, flags in self.flags.items():
+            row = {'ticker': ticker, 'rows': len(flags)}
+            for bit, name in FLAG_NAMES.items():
+                row[name] = int(np.count_nonzero(flags & bit))
+            row['bad_rows'] = int(np.count_nonzero(flags & ERROR_FLAGS))
+            rows.append(row)
+        return pd.DataFrame(rows, columns=['ticker', 'rows', *FLAG_NAMES.values(), 'bad_rows'])
+
+    def anomalies(self, ticker, df, mask_flags=None):
+        """The rows of df carrying any of mask_flags (default: any flag) with their flag names"""
+        flags = self.flags[ticker]
+        flagged = np.flatnonzero(flags if mask_flags is None else flags & mask_flags)
+        names = [", ".join(name for bit, name in FLAG_NAMES.items() if flags[i] & bit) for i in flagged]
+        rows = df.iloc[flagged].copy()
+        rows['flags'] = names
+        return rows
+
+    def clean(self, ticker, df, how='drop', mask_flags=ERROR_FLAGS):
+        """Drop the bad rows of df, or with how='mask' set their prices to NaN"""
+        if ticker not in self.flags or len(self.flags[ticker]) != len(df):
+            return df
+        bad = self.bad_rows(ticker, mask_flags)
+        if not bad.any():
+            return df
+        if how == 'drop':
+            df = df[~bad]
+            return df.reset_index(drop=True) if 'date' in df.columns else df
+        if how == 'mask':
+            df = df.copy()
+            df.loc[bad, PRICE_COLUMNS] = np.nan
+            return df
+        raise ValueError(f"Unknown cleaning mode: {how}")
+
+    def clean_frames(self, stock_data, how='drop', mask_flags=ERROR_FLAGS):
+        return {ticker: self.clean(ticker, df, how, mask_flags) for ticker, df in stock_data.items()}
+
+
+def _cache_path(source_path, cache_dir):
+    return os.path.join(cache_dir, os.path.basename(source_path) + ".quality.npz")
+
+
+def _signature(source_path):
+    stat = os.stat(source_path)
+    return np.array([stat.st_size, stat.st_mtime_ns, SCAN_VERSION, MAX_GAP_DAYS, RETURN_Z_THRESHOLD * 1000],
+                    dtype=np.int64)
+
+
+def load_cached_flags(source_path, cache_dir=CACHE_DIR):
+    """Cached flags for source_path, or None if missing or stale"""
+    path = _cache_path(source_path, cache_dir)
+    try:
+        with np.load(path) as cached:
+            if np.array_equal(cached['signature'], _signature(source_path)):
+                return cached['flags']
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def save_cached_flags(source_path, flags, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(source_path, cache_dir)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, flags=flags, signature=_signature(source_path))
+    os.replace(tmp_path, path)
+
+
+def check(stock_data, source_paths, cache_dir=CACHE_DIR):
+    """Report for stock_data, reusing cached scans and scanning the rest in one pass.
+
+    source_paths maps each ticker to the CSV it was loaded from.
+    """
+    flags = {}
+    stale = []
+    for ticker in stock_data:
+        cached = None
+        if ticker in source_paths:
+            cached = load_cached_flags(source_paths[ticker], cache_dir)
+        if cached is not None and len(cached) == len(stock_data[ticker]):
+            flags[ticker] = cached
+        else:
+            stale.append(ticker)
+
+    if stale:
+        scanned = scan(stock_data, stale)
+        for ticker in stale:
+            flags[ticker] = scanned.flags[ticker]
+            if ticker in source_paths:
+                try:
+                    save_cached_flags(source_paths[ticker], flags[ticker], cache_dir)
+                except OSError as e:
+                    print(f"Error caching quality report for {ticker}: {e}")
+    return QualityReport({ticker: flags[ticker] for ticker in stock_data})
+
+
+if __name__ == "__main__":
+    import time
+    from stock_store import load_stock_data
+
+    stock_data = load_stock_data()
+    start = time.perf_counter()
+    report = scan(stock_data)
+    elapsed = time.perf_counter() - start
+    print(report.summary().to_string(index=False))
+    for ticker, df in stock_data.items():
+        bad = report.anomalies(ticker, df, ERROR_FLAGS)
+        if not bad.empty:
+            print(f"\n{ticker}:\n{bad.to_string(index=False)}")
+    print(f"\nScanned {sum(len(df) for df in stock_data.values())} rows in {elapsed * 1000:.1f} ms")
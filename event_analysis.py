@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+
+# Rows per block of the range-max structure used for recovery searches
+BLOCK_SIZE = 256
+
+# Single-day events are widened by this much on each side, matching
+# visual4's calculate_event_impact
+SINGLE_DAY_PADDING = pd.Timedelta(days=1)
+
+_NO_DATE = np.iinfo(np.int64).max
+
+
+def _epoch_days(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def _segment_aranges(starts, lengths):
+    """Concatenate arange(start, start + length) for every segment"""
+    total = int(lengths.sum())
+    seg_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return np.repeat(starts - seg_starts, lengths) + np.arange(total)
+
+
+class EventAnalyzer:
+    """Drawdown and recovery statistics for every ticker x event pair.
+
+    All closes are packed into one array, each ticker padded to a whole
+    number of BLOCK_SIZE blocks so no block spans two tickers. Event windows
+    are located with searchsorted on each ticker's dates, drawdowns come
+    from a segmented running max over the concatenated windows, and the
+    recovery date is found with a sparse table of block maxima searched for
+    all pairs at once.
+    """
+
+    def __init__(self, stock_data, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.tickers = list(stock_data)
+
+        lengths = []
+        for ticker in self.tickers:
+            lengths.append(len(stock_data[ticker]))
+        lengths = np.asarray(lengths, dtype=np.int64)
+        padded = np.maximum(1, -(-lengths // block_size)) * block_size
+
+        self.lengths = lengths
+        self.offsets = np.concatenate([[0], np.cumsum(padded)[:-1]]).astype(np.int64)
+        self.ends = self.offsets + lengths
+        self.last_blocks = (self.offsets + padded) // block_size - 1
+
+        total = int(padded.sum())
+        self.close = np.full(total, -np.inf)
+        self.high_to_date = np.full(total, -np.inf)
+        self.days = np.full(total, _NO_DATE, dtype=np.int64)
+
+        for i, ticker in enumerate(self.tickers):
+            df = stock_data[ticker]
+            dates = df['date'] if 'date' in df.columns else df.index
+            start, end = self.offsets[i], self.ends[i]
+            self.days[start:end] = _epoch_days(dates)
+            # Missing closes can never set a peak or a recovery
+            self.close[start:end] = np.nan_to_num(df['close'].to_numpy(dtype=np.float64), nan=-np.inf)
+            self.high_to_date[start:end] = np.maximum.accumulate(self.close[start:end])
+
+        self._build_block_table()
+
+    def _build_block_table(self):
+        block_max = self.close.reshape(-1, self.block_size).max(axis=1)
+        table = [block_max]
+        width = 1
+        while width * 2 <= len(block_max):
+            prev = table[-1]
+            shifted = np.full(len(prev), -np.inf)
+            shifted[:len(prev) - width] = prev[width:]
+            table.append(np.maximum(prev, shifted))
+            width *= 2
+        self.block_table = table
+
+    def _first_in_block(self, blocks, lower, upper, threshold):
+        """First index in [lower, upper) of each block whose close >= threshold, or -1"""
+        candidates = blocks[:, None] * self.block_size + np.arange(self.block_size)[None, :]
+        in_range = (candidates >= lower[:, None]) & (candidates < upper[:, None])
+        hits = in_range & (self.close[candidates] >= threshold[:, None])
+        found = hits.any(axis=1)
+        return np.where(found, candidates[np.arange(len(blocks)), hits.argmax(axis=1)], -1)
+
+    def first_at_least(self, starts, ends, last_blocks, threshold):
+        """For each query, the first index in [start, end) with close >= threshold, or -1"""
+        result = np.full(len(starts), -1, dtype=np.int64)
+        active = starts < ends
+        if not active.any():
+            return result
+
+        # Look inside the block the search starts in
+        idx = np.flatnonzero(active)
+        blocks = starts[idx] // self.block_size
+        result[idx] = self._first_in_block(blocks, starts[idx], ends[idx], threshold[idx])
+
+        # Otherwise skip whole blocks whose maximum is below the threshold
+        idx = idx[result[idx] < 0]
+        if len(idx) == 0:
+            return result
+        pos = starts[idx] // self.block_size + 1
+        last = last_blocks[idx]
+        thr = threshold[idx]
+        n_blocks = len(self.block_table[0])
+        for level in range(len(self.block_table) - 1, -1, -1):
+            step = 1 << level
+            can_skip = pos + step - 1 <= last
+            table_max = self.block_table[level][np.minimum(pos, n_blocks - 1)]
+            skip = can_skip & (table_max < thr)
+            pos = np.where(skip, pos + step, pos)
+
+        in_ticker = pos <= last
+        pos_clipped = np.minimum(pos, n_blocks - 1)
+        found = in_ticker & (self.block_table[0][pos_clipped] >= thr)
+        if found.any():
+            hit = idx[found]
+            result[hit] = self._first_in_block(pos[found], starts[hit], ends[hit], threshold[hit])
+        return result
+
+    def _windows(self, events, ticker_list, single_day_padding):
+        """Rows of the known tickers and the [lo, hi) range of every event window in each (tickers x events)"""
+        ticker_list = self.tickers if ticker_list is None else ticker_list
+        ticker_pos = {ticker: i for i, ticker in enumerate(self.tickers)}
+        rows = np.asarray([ticker_pos[t] for t in ticker_list if t in ticker_pos], dtype=np.int64)
+
+        start_dates = pd.to_datetime(events['Start Date'])
+        end_dates = pd.to_datetime(events['End Date'])
+        single_day = (start_dates == end_dates).to_numpy()
+        window_start = _epoch_days(start_dates.to_numpy())
+        window_end = _epoch_days(end_dates.to_numpy())
+        pad_days = int(single_day_padding / pd.Timedelta(days=1))
+        window_start = np.where(single_day, window_start - pad_days, window_start)
+        window_end = np.where(single_day, window_end + pad_days, window_end)
+
+        # Locate every window in every ticker's date index
+        lo = np.empty((len(rows), len(events)), dtype=np.int64)
+        hi = np.empty((len(rows), len(events)), dtype=np.int64)
+        for r, t in enumerate(rows):
+            ticker_days = self.days[self.offsets[t]:self.ends[t]]
+            lo[r] = self.offsets[t] + np.searchsorted(ticker_days, window_start, side='left')
+            hi[r] = self.offsets[t] + np.searchsorted(ticker_days, window_end, side='right')
+        return rows, lo, hi
+
+    def pct_changes(self, events, ticker_list=None, single_day_padding=SINGLE_DAY_PADDING):
+        """Only the pct_change column of analyze(), as an events x tickers DataFrame"""
+        rows, lo, hi = self._windows(events, ticker_list, single_day_padding)
+        valid = hi - lo >= 2
+        start_price = np.where(valid, self.close[np.minimum(lo, len(self.close) - 1)], np.nan)
+        end_price = np.where(valid, self.close[np.maximum(hi - 1, 0)], np.nan)
+        return pd.DataFrame(((end_price - start_price) / start_price * 100).T, index=list(events['Event']),
+                            columns=[self.tickers[t] for t in rows])
+
+    def analyze(self, events, ticker_list=None, single_day_padding=SINGLE_DAY_PADDING):
+        """Return one row per ticker x event with drawdown and recovery statistics.
+
+        events is a DataFrame with 'Event', 'Start Date' and 'End Date' columns
+        (the layout of stock_market_events_with_dates.xlsx). pct_change is the
+        start-to-end change visual4's impact table reports. Inside each event
+        window the peak is the highest close up to the trough, and
+        max_drawdown_pct is the fall from that in-window peak to the trough.
+        days_to_trough counts from the first trading day in the window.
+        Recovery is back to the pre-event high, the highest close at or
+        before the event start: days_to_recover counts from the trough to
+        the first close at or above pre_event_high, searching forward
+        through the rest of the ticker's history (0 if the trough stayed at
+        or above it, NaN if never).
+        """
+        rows, lo, hi = self._windows(events, ticker_list, single_day_padding)
+        n_events = len(events)
+
+        pair_ticker = np.repeat(rows, n_events)
+        pair_event = np.tile(np.arange(n_events), len(rows))
+        lo, hi = lo.ravel(), hi.ravel()
+        lengths = hi - lo
+        valid = lengths >= 2
+
+        n_pairs = len(pair_ticker)
+        start_price = np.full(n_pairs, np.nan)
+        end_price = np.full(n_pairs, np.nan)
+        peak_price = np.full(n_pairs, np.nan)
+        trough_price = np.full(n_pairs, np.nan)
+        max_drawdown = np.full(n_pairs, np.nan)
+        trough_idx = np.full(n_pairs, -1, dtype=np.int64)
+        pre_event_high = np.full(n_pairs, np.nan)
+
+        v = np.flatnonzero(valid)
+        if len(v):
+            idx = _segment_aranges(lo[v], lengths[v])
+            segment = np.repeat(np.arange(len(v)), lengths[v])
+            values = self.close[idx]
+            running_max = pd.Series(values).groupby(segment).cummax().to_numpy()
+            drawdown = values / running_max - 1
+
+            seg_starts = np.concatenate([[0], np.cumsum(lengths[v])[:-1]])
+            seg_min = np.minimum.reduceat(drawdown, seg_starts)
+            is_min = np.flatnonzero(drawdown == seg_min[segment])
+            _, first = np.unique(segment[is_min], return_index=True)
+            at_trough = is_min[first]
+
+            start_price[v] = values[seg_starts]
+            end_price[v] = values[seg_starts + lengths[v] - 1]
+            peak_price[v] = running_max[at_trough]
+            trough_price[v] = values[at_trough]
+            max_drawdown[v] = seg_min * 100
+            trough_idx[v] = idx[at_trough]
+            pre_event_high[v] = self.high_to_date[lo[v]]
+
+        # Search forward from the trough for the first close back at the pre-event high
+        recovery_idx = np.full(n_pairs, -1, dtype=np.int64)
+        if len(v):
+            above_high = trough_price[v] >= pre_event_high[v]
+            recovery_idx[v[above_high]] = trough_idx[v[above_high]]
+            q = v[~above_high]
+            recovery_idx[q] = self.first_at_least(
+                trough_idx[q] + 1,
+                self.ends[pair_ticker[q]],
+                self.last_blocks[pair_ticker[q]],
+                pre_event_high[q]
+            )
+
+        first_day = np.where(valid, self.days[np.minimum(lo, len(self.days) - 1)], _NO_DATE)
+        trough_day = np.where(trough_idx >= 0, self.days[trough_idx], _NO_DATE)
+        recovery_day = np.where(recovery_idx >= 0, self.days[recovery_idx], _NO_DATE)
+
+        def to_dates(days):
+            return pd.to_datetime(np.where(days == _NO_DATE, np.datetime64('NaT'), days.astype('datetime64[D]')))
+
+        def day_delta(later, earlier):
+            delta = (later - earlier).astype(np.float64)
+            delta[(later == _NO_DATE) | (earlier == _NO_DATE)] = np.nan
+            return delta
+
+        return pd.DataFrame({
+            'ticker': np.asarray(self.tickers, dtype=object)[pair_ticker],
+            'event': events['Event'].to_numpy()[pair_event],
+            'start_date': to_dates(first_day),
+            'start_price': start_price,
+            'end_price': end_price,
+            'pct_change': (end_price - start_price) / start_price * 100,
+            'pre_event_high': pre_event_high,
+            'peak_price': peak_price,
+            'trough_date': to_dates(trough_day),
+            'trough_price': trough_price,
+            'max_drawdown_pct': max_drawdown,
+            'days_to_trough': day_delta(trough_day, first_day),
+            'recovery_date': to_dates(recovery_day),
+            'days_to_recover': day_delta(recovery_day, trough_day)
+        })
+
+
+if __name__ == "__main__":
+    import time
+    from stock_store import load_stock_data, load_market_events
+
+    stock_data = load_stock_data()
+    events = load_market_events()
+    start = time.perf_counter()
+    analyzer = EventAnalyzer(stock_data)
+    results = analyzer.analyze(events)
+    print(results.to_string(max_rows=40))
+    print(f"{len(results)} ticker x event pairs in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,240 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from event_analysis import EventAnalyzer
+from event_study import EventStudy
+
+# Per-event features a ticker can be described by: 'impact' is the change
+# over the event window (visual4's impact table), 'car' the cumulative
+# abnormal return against the market around the event start (visual4's
+# significance shading)
+FEATURES = ('impact', 'car')
+
+# Distances between tickers' standardized feature vectors. euclidean
+# compares the size of the responses, correlation only their pattern
+METRICS = ('euclidean', 'correlation')
+
+# Clusterings and feature tables kept, least recently used dropped first, keyed by event set and options
+CLUSTER_CACHE_SIZE = 32
+
+
+def pairwise_distances(features, metric='euclidean'):
+    """All-pairs distances between the rows of features, from one matrix product"""
+    if metric == 'correlation':
+        centered = features - features.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(centered, axis=1, keepdims=True)
+        unit = centered / np.where(norms > 0, norms, 1)
+        return np.clip(1 - unit @ unit.T, 0, 2)
+    squared = (features * features).sum(axis=1)
+    return np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2 * features @ features.T, 0))
+
+
+def average_linkage(distances):
+    """Agglomerative clustering with average linkage, merging the closest pair each step.
+
+    Returns an (n - 1, 4) array in SciPy's linkage layout: the two merged
+    nodes (leaves are 0..n-1, the cluster made at step s is n + s), the
+    distance between them and the size of the new cluster. After each merge
+    the merged row is updated with the Lance-Williams formula.
+    """
+    n = len(distances)
+    d = np.array(distances, dtype=np.float64)
+    np.fill_diagonal(d, np.inf)
+    size = np.ones(n)
+    node = np.arange(n)
+    linkage = np.empty((max(n - 1, 0), 4))
+    for step in range(n - 1):
+        i, j = divmod(int(np.argmin(d)), n)
+        if i > j:
+            i, j = j, i
+        linkage[step] = (node[i], node[j], d[i, j], size[i] + size[j])
+
+        # The merged cluster takes row i; row j is retired
+        merged = (size[i] * d[i] + size[j] * d[j]) / (size[i] + size[j])
+        d[i, :] = merged
+        d[:, i] = merged
+        d[i, i] = np.inf
+        d[j, :] = np.inf
+        d[:, j] = np.inf
+        size[i] += size[j]
+        node[i] = n + step
+    return linkage
+
+
+def leaf_order(linkage, n):
+    """Leaves left to right as the dendrogram draws them"""
+    order = []
+    stack = [2 * n - 2] if n > 1 else list(range(n))
+    while stack:
+        node = stack.pop()
+        if node < n:
+            order.append(node)
+        else:
+            left, right = linkage[node - n, :2].astype(np.int64)
+            stack.extend((right, left))
+    return np.asarray(order, dtype=np.int64)
+
+
+class ResponseClusters:
+    """A hierarchical clustering of tickers by their responses to a set of events.
+
+    tickers and impact (events x tickers, % change) are in the order they
+    were given; order is the dendrogram's leaf order over them.
+    """
+
+    def __init__(self, tickers, events, impact, linkage):
+        self.tickers = list(tickers)
+        self.events = list(events)
+        self.impact = impact
+        self.linkage = linkage
+        self.order = leaf_order(linkage, len(self.tickers))
+
+    @property
+    def ordered_tickers(self):
+        return [self.tickers[i] for i in self.order]
+
+    def ordered_impact(self):
+        """The impact table with tickers reordered so similar responders sit side by side"""
+        return self.impact[self.ordered_tickers]
+
+    def labels(self, k):
+        """Cluster number of each ticker (in the given order) after cutting the tree into k clusters.
+
+        Clusters are numbered left to right along the dendrogram.
+        """
+        n = len(self.tickers)
+        parent = np.arange(2 * n - 1)
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for step in range(max(n - max(k, 1), 0)):
+            left, right = self.linkage[step, :2].astype(np.int64)
+            parent[find(left)] = n + step
+            parent[find(right)] = n + step
+
+        roots = np.array([find(i) for i in range(n)])
+        labels = np.empty(n, dtype=np.int64)
+        numbers = {}
+        for leaf in self.order:
+            labels[leaf] = numbers.setdefault(roots[leaf], len(numbers))
+        return labels
+
+    def dendrogram(self):
+        """Segments of every merge as (xs, ys) arrays of shape (n - 1, 4), leaves at x = 0..n-1"""
+        n = len(self.tickers)
+        x = np.zeros(2 * n - 1)
+        height = np.zeros(2 * n - 1)
+        x[self.order] = np.arange(n)
+        xs = np.empty((n - 1, 4))
+        ys = np.empty((n - 1, 4))
+        for step, (left, right, distance, _) in enumerate(self.linkage):
+            left, right = int(left), int(right)
+            x[n + step] = (x[left] + x[right]) / 2
+            height[n + step] = distance
+            xs[step] = (x[left], x[left], x[right], x[right])
+            ys[step] = (height[left], distance, distance, height[right])
+        return xs, ys
+
+
+class EventClusters:
+    """Clusters tickers by their event response profiles, caching each event set's result.
+
+    Each ticker is a vector of the chosen FEATURES over the events. Every
+    feature column is standardized across tickers, with a ticker that did
+    not trade through an event set to the mean, so no single event or
+    feature dominates the distances.
+    """
+
+    def __init__(self, stock_data, event_study=None):
+        self.analyzer = EventAnalyzer(stock_data)
+        self._event_study = event_study
+        self._stock_data = stock_data
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def event_study(self):
+        if self._event_study is None:
+            self._event_study = EventStudy(self._stock_data)
+        return self._event_study
+
+    def feature_table(self, events, tickers, features=FEATURES):
+        """(impact as events x tickers, feature matrix as tickers x columns)"""
+        names = list(events['Event'])
+        impact = self.analyzer.pct_changes(events, tickers).reindex(index=names, columns=tickers)
+        blocks = []
+        if 'impact' in features:
+            blocks.append(impact.to_numpy(dtype=np.float64).T)
+        if 'car' in features:
+            summary, _, _ = self.event_study.abnormal_returns(events, tickers=tickers, keep_residuals=False)
+            car = (summary.pivot(index='event', columns='ticker', values='car_pct')
+                   .reindex(index=names, columns=tickers))
+            blocks.append(car.to_numpy(dtype=np.float64).T)
+        matrix = np.hstack(blocks) if blocks else np.empty((len(tickers), 0))
+
+        # Standardize each column over the tickers that have it; the others sit at its mean
+        finite = np.isfinite(matrix)
+        count = np.maximum(finite.sum(axis=0), 1)
+        mean = np.where(finite, matrix, 0).sum(axis=0) / count
+        deviation = np.where(finite, matrix - mean, 0)
+        std = np.sqrt((deviation ** 2).sum(axis=0) / count)
+        usable = (finite.sum(axis=0) >= 2) & (std > 0)
+        return impact, deviation[:, usable] / std[usable]
+
+    def _cached(self, key, build):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        value = build()
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > CLUSTER_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return value
+
+    def cluster(self, events, tickers=None, features=FEATURES, metric='euclidean'):
+        """ResponseClusters of tickers (default: all) over events, served from the cache for a repeated event set.
+
+        The feature table is cached on its own, so changing only the
+        distance skips straight to the (fast) distances and linkage.
+        """
+        known = set(self.analyzer.tickers)
+        tickers = [t for t in (tickers or self.analyzer.tickers) if t in known]
+        if metric not in METRICS:
+            raise ValueError(f"Unknown distance: {metric}")
+        key = (tuple(events['Event']), tuple(tickers), tuple(features))
+
+        def build():
+            impact, matrix = self._cached(('features',) + key, lambda: self.feature_table(events, tickers, features))
+            return ResponseClusters(tickers, impact.index, impact, average_linkage(pairwise_distances(matrix, metric)))
+        return self._cached(('clusters', metric) + key, build)
+
+
+if __name__ == "__main__":
+    import time
+    from stock_store import load_stock_data, load_market_events
+
+    stock_data = load_stock_data(quality='drop')
+    events = load_market_events()
+    clusters = EventClusters(stock_data)
+    for attempt in ("first", "cached"):
+        start = time.perf_counter()
+        result = clusters.cluster(events)
+        print(f"{len(result.tickers)} tickers x {len(result.events)} events ({attempt}): "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+    labels = result.labels(4)
+    for number in range(labels.max() + 1):
+        print(f"Cluster {number + 1}: {', '.join(t for t, label in zip(result.tickers, labels) if label == number)}")
+
+    # Distances and linkage alone at a larger universe
+    rng = np.random.default_rng(0)
+    synthetic = rng.standard_normal((500, 200))
+    start = time.perf_counter()
+    average_linkage(pairwise_distances(synthetic))
+    print(f"500 tickers x 100 events x 2 features, distances and linkage: "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
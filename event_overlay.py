@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+import matplotlib.dates as mdates
+from matplotlib import colors as mcolors
+from matplotlib.collections import PolyCollection, LineCollection
+
+# Distance in pixels within which hovering picks up an event
+PICK_PX = 5
+
+# Events listed in one hover box before the rest are summarized
+MAX_HOVER_EVENTS = 5
+
+
+class IntervalIndex:
+    """Stabbing queries over [start, end] intervals.
+
+    Intervals are sorted by start alongside a running maximum of their
+    ends, so the candidates for a query lie between two binary searches:
+    every interval before the first running max >= lo ends too early, and
+    every one after the last start <= hi starts too late.
+    """
+
+    def __init__(self, starts, ends):
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        self.order = np.argsort(starts, kind='stable')
+        self.starts = starts[self.order]
+        self.ends = ends[self.order]
+        self.max_end = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def query(self, lo, hi=None):
+        """Input positions of the intervals overlapping [lo, hi], in input order"""
+        hi = lo if hi is None else hi
+        stop = np.searchsorted(self.starts, hi, side='right')
+        first = np.searchsorted(self.max_end, lo, side='left')
+        if first >= stop:
+            return np.empty(0, dtype=np.int64)
+        hits = first + np.flatnonzero(self.ends[first:stop] >= lo)
+        return np.sort(self.order[hits])
+
+
+def describe_event(name, start, end):
+    if start == end:
+        return f"Event: {name}\nDate: {start.strftime('%Y-%m-%d')}"
+    return f"Event: {name}\nPeriod: {start.strftime('%Y-%m-%d')} to\n        {end.strftime('%Y-%m-%d')}"
+
+
+class EventOverlay:
+    """Market events drawn as one PolyCollection of periods and one LineCollection of single days.
+
+    Both collections span the full height of the axes whatever the y-limits.
+    They are rebuilt at the pixel resolution of the current view whenever
+    it is zoomed, panned or resized: periods become runs of pixel columns
+    covered by the same number of events, shaded by stacking the alpha that
+    many times, and single days become at most one line per pixel column.
+    Drawing thousands of events therefore fills no more pixels than drawing
+    ten. Hovering looks the cursor's date up in an IntervalIndex over the
+    event dates and shows every event under it in one annotation, redrawing
+    only when that set of events changes.
+    """
+
+    def __init__(self, ax, events, span_color='red', span_alpha=0.2, line_color='red', line_alpha=0.3,
+                 line_width=1.5, line_style='--', span_label=None, line_label=None, describe=describe_event):
+        self.ax = ax
+        self.describe = describe
+        self.enabled = True
+        self.names = events['Event'].tolist()
+        self.start_dates = pd.to_datetime(events['Start Date']).tolist()
+        self.end_dates = pd.to_datetime(events['End Date']).tolist()
+        starts = mdates.date2num(pd.to_datetime(events['Start Date']).to_numpy())
+        ends = mdates.date2num(pd.to_datetime(events['End Date']).to_numpy())
+        single = starts == ends
+        self.index = IntervalIndex(starts, ends)
+        self.span_starts, self.span_ends = starts[~single], ends[~single]
+        self.line_x = starts[single]
+        self.span_rgba = np.array(mcolors.to_rgba(span_color))
+        self.span_alpha = span_alpha
+        self.line_rgba = np.array(mcolors.to_rgba(line_color))
+        self.line_alpha = line_alpha
+
+        # x in data coordinates, y in axes coordinates, as axvspan and axvline draw
+        transform = ax.get_xaxis_transform()
+        self.spans = PolyCollection([], transform=transform, edgecolor='none',
+                                    label=span_label if len(self.span_starts) else None)
+        self.lines = LineCollection([], transform=transform, linewidths=line_width, linestyles=line_style,
+                                    label=line_label if len(self.line_x) else None)
+        # Legend entries show the base colors
+        self.spans.set_facecolor(mcolors.to_rgba(span_color, span_alpha))
+        self.lines.set_color(mcolors.to_rgba(line_color, line_alpha))
+        ax.add_collection(self.spans, autolim=False)
+        ax.add_collection(self.lines, autolim=False)
+        self.layout()
+
+        self.annotation = None
+        self.hovered = ()
+        self._cids = [ax.figure.canvas.mpl_connect('motion_notify_event', self._on_move),
+                      ax.figure.canvas.mpl_connect('resize_event', self._on_limits_changed)]
+        ax.callbacks.connect('xlim_changed', self._on_limits_changed)
+
+    def _on_limits_changed(self, *args):
+        self.layout()
+
+    def layout(self):
+        """Rebuild both collections for the current x-range and axes width"""
+        xmin, xmax = sorted(self.ax.get_xlim())
+        columns = max(int(round(self.ax.bbox.width)), 1)
+        if not xmax > xmin:
+            return
+        scale = columns / (xmax - xmin)
+        edges = xmin + np.arange(columns + 1) / scale
+
+        # Coverage depth of each pixel column by the periods in view
+        visible = (self.span_ends >= xmin) & (self.span_starts <= xmax)
+        first = np.clip(np.floor((self.span_starts[visible] - xmin) * scale), 0, columns - 1).astype(np.int64)
+        last = np.clip(np.ceil((self.span_ends[visible] - xmin) * scale), 1, columns).astype(np.int64)
+        last = np.maximum(last, first + 1)
+        depth = np.cumsum(np.bincount(first, minlength=columns + 1) - np.bincount(last, minlength=columns + 1))
+        depth = depth[:columns]
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(depth)) + 1, [columns]])
+        run_depth = depth[bounds[:-1]]
+        covered = run_depth > 0
+        x0, x1 = edges[bounds[:-1][covered]], edges[bounds[1:][covered]]
+        verts = np.empty((len(x0), 4, 2))
+        verts[:, :, 0] = np.column_stack([x0, x0, x1, x1])
+        verts[:, :, 1] = [0, 1, 1, 0]
+        self.spans.set_verts(verts)
+        self.spans.set_facecolor(self._stacked(self.span_rgba, self.span_alpha, run_depth[covered]))
+
+        # One line per pixel column holding single-day events
+        x = self.line_x[(self.line_x >= xmin) & (self.line_x <= xmax)]
+        counts = np.bincount(np.minimum(((x - xmin) * scale).astype(np.int64), columns - 1), minlength=columns)
+        used = np.flatnonzero(counts)
+        segments = np.empty((len(used), 2, 2))
+        segments[:, :, 0] = (edges[used] + 0.5 / scale)[:, None]
+        segments[:, :, 1] = [0, 1]
+        self.lines.set_segments(segments)
+        self.lines.set_color(self._stacked(self.line_rgba, self.line_alpha, counts[used]))
+
+    def _stacked(self, rgba, alpha, depth):
+        """rgba with the alpha of depth layers of the color drawn over each other"""
+        colors = np.tile(rgba, (len(depth), 1))
+        colors[:, 3] = 1 - (1 - alpha) ** depth
+        return colors
+
+    def __len__(self):
+        return len(self.names)
+
+    def events_at(self, x, tolerance=0.0):
+        return self.index.query(x - tolerance, x + tolerance)
+
+    def _on_move(self, event):
+        if not self.enabled:
+            return
+        if event.inaxes is not self.ax or event.xdata is None:
+            self._show(())
+            return
+        xmin, xmax = self.ax.get_xlim()
+        tolerance = PICK_PX * abs(xmax - xmin) / max(self.ax.bbox.width, 1)
+        hits = tuple(self.events_at(event.xdata, tolerance))
+        self._show(hits, event.xdata, event.ydata)
+
+    def _show(self, hits, x=None, y=None):
+        if not hits:
+            if self.hovered:
+                self.hovered = ()
+                self.annotation.set_visible(False)
+                self.ax.figure.canvas.draw_idle()
+            return
+        if self.annotation is None:
+            self.annotation = self.ax.annotate("", xy=(0, 0), xytext=(15, 15), textcoords='offset points',
+                                               bbox=dict(boxstyle="round", fc="white", alpha=0.9), zorder=100)
+        if hits == self.hovered:
+            return
+        lines = [self.describe(self.names[i], self.start_dates[i], self.end_dates[i])
+                 for i in hits[:MAX_HOVER_EVENTS]]
+        if len(hits) > MAX_HOVER_EVENTS:
+            lines.append(f"... and {len(hits) - MAX_HOVER_EVENTS} more")
+        self.annotation.set_text("\n\n".join(lines))
+        self.hovered = hits
+        self.annotation.xy = (x, y)
+        self.annotation.set_visible(True)
+        self.ax.figure.canvas.draw_idle()
+
+    def remove(self):
+        for cid in self._cids:
+            self.ax.figure.canvas.mpl_disconnect(cid)
+        for artist in (self.spans, self.lines, self.annotation):
+            if artist is not None and artist.axes is not None:
+                artist.remove()
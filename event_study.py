@@ -0,0 +1,192 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Trading days on each side of day 0 included in the event window
+DEFAULT_WINDOW = 10
+
+# Trading days before the event window used to fit the market model
+ESTIMATION_DAYS = 250
+
+# Pairs with fewer usable estimation days get no market model or p-value
+MIN_ESTIMATION_DAYS = 60
+
+DEFAULT_BOOTSTRAPS = 2000
+
+# Pairs per bootstrap shard; also bounds the (pairs, bootstraps, window) draw array
+SHARD_PAIRS = 64
+
+# Below this many pairs the bootstrap runs in-process instead of in a pool
+POOL_MIN_PAIRS = 256
+
+
+def build_return_panel(stock_data):
+    """Daily close-to-close returns aligned on the union of trading dates (dates x tickers)"""
+    closes = {}
+    for ticker, df in stock_data.items():
+        dates = df['date'] if 'date' in df.columns else df.index
+        closes[ticker] = pd.Series(df['close'].to_numpy(), index=pd.DatetimeIndex(dates))
+    panel = pd.DataFrame(closes).sort_index()
+    return panel.pct_change(fill_method=None)
+
+
+def _bootstrap_shard(residuals, counts, observed, window_len, n_boot, seed):
+    """Two-sided bootstrap p-values of observed CARs for one shard of pairs.
+
+    residuals is (pairs, days) with each row's usable residuals first. Under
+    the null the CAR is a sum of window_len residuals drawn with replacement
+    from the pair's own (demeaned) estimation residuals.
+    """
+    rng = np.random.default_rng(seed)
+    n_pairs = len(counts)
+    centered = residuals - np.nanmean(residuals, axis=1, keepdims=True)
+    draws = (rng.random((n_pairs, n_boot, window_len)) * counts[:, None, None]).astype(np.int64)
+    rows = np.arange(n_pairs)[:, None, None]
+    null_cars = centered[rows, draws].sum(axis=2)
+    exceed = (np.abs(null_cars) >= np.abs(observed)[:, None]).sum(axis=1)
+    return (exceed + 1) / (n_boot + 1)
+
+
+def bootstrap_p_values(residuals, counts, observed, window_len, n_boot=DEFAULT_BOOTSTRAPS, seed=0, workers=None,
+                       executor=None):
+    """Bootstrap p-values for every pair, sharded across a process pool when large.
+
+    An existing executor (e.g. the dashboard host's shared pool) is used
+    instead of starting a new pool.
+    """
+    n_pairs = len(counts)
+    p_values = np.full(n_pairs, np.nan)
+    testable = np.flatnonzero((counts >= MIN_ESTIMATION_DAYS) & np.isfinite(observed))
+    if len(testable) == 0:
+        return p_values
+
+    shards = [testable[i:i + SHARD_PAIRS] for i in range(0, len(testable), SHARD_PAIRS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    args = [(residuals[s], counts[s], observed[s], window_len, n_boot, seeds[i]) for i, s in enumerate(shards)]
+
+    workers = workers or os.cpu_count() or 1
+    if executor is not None and len(testable) >= POOL_MIN_PAIRS:
+        results = list(executor.map(_bootstrap_shard, *zip(*args)))
+    elif workers > 1 and len(testable) >= POOL_MIN_PAIRS:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_bootstrap_shard, *zip(*args)))
+    else:
+        results = [_bootstrap_shard(*a) for a in args]
+
+    for shard, result in zip(shards, results):
+        p_values[shard] = result
+    return p_values
+
+
+class EventStudy:
+    """Abnormal and cumulative abnormal returns around market events.
+
+    The market proxy is the equal-weight average daily return of the loaded
+    universe. For each ticker x event a market model (alpha, beta) is fitted
+    over ESTIMATION_DAYS trading days ending just before the [-k, +k] window
+    around day 0, the first trading day on or after the event start.
+    """
+
+    def __init__(self, stock_data):
+        self.returns = build_return_panel(stock_data)
+        self.market = self.returns.mean(axis=1, skipna=True)
+        self.tickers = list(self.returns.columns)
+
+    def abnormal_returns(self, events, k=DEFAULT_WINDOW, estimation_days=ESTIMATION_DAYS, tickers=None,
+                         keep_residuals=True):
+        """Return (summary, residuals, counts) for every ticker x event pair.
+
+        summary has ticker, event, alpha, beta, car_pct and estimation_days;
+        residuals/counts hold each pair's estimation residuals for the bootstrap.
+        With keep_residuals=False the residuals are skipped and have no columns.
+        """
+        tickers = [t for t in (tickers or self.tickers) if t in self.returns.columns]
+        columns = [self.returns.columns.get_loc(t) for t in tickers]
+        returns = self.returns.to_numpy()[:, columns]
+        market = self.market.to_numpy()
+        dates = self.returns.index
+        window_len = 2 * k + 1
+
+        summaries = []
+        residual_blocks = []
+        count_blocks = []
+        for _, event in events.iterrows():
+            day0 = dates.searchsorted(pd.Timestamp(event['Start Date']))
+            win_lo, win_hi = day0 - k, day0 + k + 1
+            est_lo, est_hi = max(0, win_lo - estimation_days), max(0, win_lo)
+
+            n_tickers = len(tickers)
+            alpha = np.full(n_tickers, np.nan)
+            beta = np.full(n_tickers, np.nan)
+            car = np.full(n_tickers, np.nan)
+            residuals = np.full((n_tickers, estimation_days if keep_residuals else 0), np.nan)
+            counts = np.zeros(n_tickers, dtype=np.int64)
+
+            if win_lo >= 0 and win_hi <= len(dates):
+                r_est = returns[est_lo:est_hi]
+                m_est = market[est_lo:est_hi, None]
+                valid = np.isfinite(r_est) & np.isfinite(m_est)
+                counts = valid.sum(axis=0)
+                n = np.maximum(counts, 1)
+                m_mean = np.where(valid, m_est, 0).sum(axis=0) / n
+                r_mean = np.where(valid, r_est, 0).sum(axis=0) / n
+                m_dev = np.where(valid, m_est - m_mean, 0)
+                r_dev = np.where(valid, r_est - r_mean, 0)
+                var_m = (m_dev ** 2).sum(axis=0)
+                fitted = (counts >= MIN_ESTIMATION_DAYS) & (var_m > 0)
+                beta = np.where(fitted, (m_dev * r_dev).sum(axis=0) / np.where(var_m > 0, var_m, 1), np.nan)
+                alpha = np.where(fitted, r_mean - beta * m_mean, np.nan)
+
+                r_win = returns[win_lo:win_hi]
+                m_win = market[win_lo:win_hi, None]
+                abnormal = r_win - (alpha + beta * m_win)
+                car = np.where(np.isfinite(abnormal).all(axis=0), abnormal.sum(axis=0), np.nan)
+
+                if keep_residuals:
+                    est_resid = np.where(valid, r_est - (alpha + beta * m_est), np.nan).T
+                    # Move each pair's usable residuals to the front of its row
+                    order = np.argsort(~np.isfinite(est_resid), axis=1, kind='stable')
+                    est_resid = np.take_along_axis(est_resid, order, axis=1)
+                    residuals[:, :est_resid.shape[1]] = est_resid
+                counts = np.where(fitted, counts, 0)
+
+            summaries.append(pd.DataFrame({
+                'ticker': tickers,
+                'event': event['Event'],
+                'alpha': alpha,
+                'beta': beta,
+                'car_pct': car * 100,
+                'estimation_days': counts
+            }))
+            residual_blocks.append(residuals)
+            count_blocks.append(counts)
+
+        summary = pd.concat(summaries, ignore_index=True) if summaries else pd.DataFrame()
+        residuals = np.concatenate(residual_blocks) if residual_blocks else np.empty((0, estimation_days))
+        counts = np.concatenate(count_blocks) if count_blocks else np.empty(0, dtype=np.int64)
+        return summary, residuals, counts
+
+    def run(self, events, k=DEFAULT_WINDOW, estimation_days=ESTIMATION_DAYS, tickers=None,
+            n_boot=DEFAULT_BOOTSTRAPS, seed=0, workers=None, executor=None):
+        """Cumulative abnormal returns with bootstrap p-values for every ticker x event"""
+        summary, residuals, counts = self.abnormal_returns(events, k, estimation_days, tickers)
+        if summary.empty:
+            summary['p_value'] = []
+            return summary
+        summary['p_value'] = bootstrap_p_values(
+            residuals, counts, summary['car_pct'].to_numpy() / 100, 2 * k + 1, n_boot, seed, workers, executor
+        )
+        return summary
+
+
+if __name__ == "__main__":
+    import time
+    from stock_store import load_stock_data, load_market_events
+
+    stock_data = load_stock_data()
+    events = load_market_events()
+    start = time.perf_counter()
+    results = EventStudy(stock_data).run(events)
+    print(results.to_string(max_rows=40))
+    print(f"{len(results)} ticker x event pairs in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,249 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# pyarrow is optional; Arrow IPC and Parquet files need it, CSV is written
+# by pandas without it.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from stock_store import shared_data, calculate_yearly_percentage_change, format_bytes
+from event_analysis import SINGLE_DAY_PADDING, EventAnalyzer, _epoch_days
+from screener import STATS
+
+# Output format of each file extension
+FORMATS = {'.arrow': 'arrow', '.ipc': 'arrow', '.feather': 'arrow', '.parquet': 'parquet', '.csv': 'csv'}
+EXTENSIONS = {'arrow': '.arrow', 'parquet': '.parquet', 'csv': '.csv'}
+
+# Small per-ticker frames are gathered into record batches of about this many rows
+BATCH_ROWS = 65_536
+
+# Events per batch of the event tables, and periods per batch of the screener table
+EVENTS_PER_BATCH = 4
+PERIODS_PER_BATCH = 16
+
+
+def _rebatch(frames, rows=BATCH_ROWS):
+    """Concatenate a stream of small frames into batches of at least rows rows"""
+    pending, pending_rows = [], 0
+    for frame in frames:
+        pending.append(frame)
+        pending_rows += len(frame)
+        if pending_rows >= rows:
+            yield pd.concat(pending, ignore_index=True)
+            pending, pending_rows = [], 0
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def _event_chunks(events, size=EVENTS_PER_BATCH):
+    for start in range(0, len(events), size):
+        yield events.iloc[start:start + size]
+
+
+def impact_batches(shared, tickers, events):
+    """Drawdown, recovery and volume statistics of every (event, ticker) window, a few events per batch"""
+    analyzer = EventAnalyzer(shared.stock_data)
+    for chunk in _event_chunks(events):
+        impacts = analyzer.analyze(chunk, tickers)
+        metrics = shared.volume_analytics.event_metrics(chunk, tickers)
+        batch = impacts.merge(metrics, on=['event', 'ticker'], how='left')
+        yield batch[['event'] + [column for column in batch.columns if column != 'event']]
+
+
+def impact_matrix_batches(shared, tickers, events):
+    """visual4's impact table: one row per event with each ticker's percentage change"""
+    analyzer = EventAnalyzer(shared.stock_data)
+    for chunk in _event_chunks(events):
+        matrix = analyzer.analyze(chunk, tickers).pivot(index='event', columns='ticker', values='pct_change')
+        matrix = matrix.reindex(index=chunk['Event'], columns=tickers).astype(np.float64)
+        matrix.index.name = 'Event'
+        matrix.columns.name = None
+        yield matrix.reset_index()
+
+
+def yearly_batches(shared, tickers, events):
+    """visual3's year-end closes with yearly and cumulative change"""
+    def frames():
+        for ticker in tickers:
+            df = calculate_yearly_percentage_change(shared.stock_data[ticker])
+            yield pd.DataFrame({
+                'ticker': ticker,
+                'year': df.index.year.astype(np.int32),
+                'close': df['close'].to_numpy(),
+                'yearly_pct_change': df['yearly_pct_change'].to_numpy(),
+                'cumulative_return': df['cumulative_return'].to_numpy()
+            })
+    return _rebatch(frames())
+
+
+def normalized_batches(shared, tickers, events):
+    """visual4's overlay lines: each ticker's closes over each event window as % change from its first close"""
+    pad_days = int(SINGLE_DAY_PADDING / pd.Timedelta(days=1))
+    days = {ticker: _epoch_days(shared.stock_data[ticker]['date']) for ticker in tickers}
+
+    def frames():
+        for event in events.itertuples(index=False):
+            pad = pad_days if event[1] == event[2] else 0
+            window_start = _epoch_days([event[1]])[0] - pad
+            window_end = _epoch_days([event[2]])[0] + pad
+            for ticker in tickers:
+                lo = np.searchsorted(days[ticker], window_start, side='left')
+                hi = np.searchsorted(days[ticker], window_end, side='right')
+                if hi - lo < 1:
+                    continue
+                df = shared.stock_data[ticker]
+                close = df['close'].to_numpy()[lo:hi]
+                yield pd.DataFrame({
+                    'event': event[0],
+                    'ticker': ticker,
+                    'date': df['date'].to_numpy()[lo:hi],
+                    'close': close,
+                    'pct_from_start': (close / close[0] - 1) * 100
+                })
+    return _rebatch(frames())
+
+
+def screener_batches(shared, tickers, events):
+    """Every screener statistic of every ticker over every calendar year and market event"""
+    screener = shared.screener
+    positions = {ticker: i for i, ticker in enumerate(screener.tickers)}
+    columns = np.asarray([positions[ticker] for ticker in tickers if ticker in positions], dtype=np.int64)
+    names = np.asarray(screener.tickers, dtype=object)[columns]
+    for start in range(0, len(screener.periods), PERIODS_PER_BATCH):
+        periods = screener.periods[start:start + PERIODS_PER_BATCH]
+        rows = np.arange(start, start + len(periods))
+        yield pd.DataFrame({
+            'period': np.repeat(np.asarray([str(period) for period in periods], dtype=object), len(columns)),
+            'kind': np.repeat(np.where(rows < len(screener.years), 'year', 'event').astype(object), len(columns)),
+            'ticker': np.tile(names, len(periods)),
+            **{stat: screener.values[stat][rows][:, columns].ravel() for stat in STATS}
+        })
+
+
+def volume_batches(shared, tickers, events):
+    """Daily VWAP, ATR, abnormal volume and overnight/intraday returns of every ticker"""
+    analytics = shared.volume_analytics
+
+    def frames():
+        for ticker in tickers:
+            df = analytics.frame(ticker)
+            df.insert(0, 'ticker', ticker)
+            yield df
+    return _rebatch(frames())
+
+
+# Tables the CLI can export, each a function(shared, tickers, events) yielding DataFrame batches
+TABLES = {
+    'impact': impact_batches,
+    'impact_matrix': impact_matrix_batches,
+    'yearly': yearly_batches,
+    'normalized': normalized_batches,
+    'screener': screener_batches,
+    'volume': volume_batches
+}
+
+
+def format_for(path):
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown export format for {path}; use one of {', '.join(sorted(FORMATS))}")
+    return fmt
+
+
+def write_batches(batches, path, fmt=None):
+    """Write a stream of DataFrame batches to path, one batch in memory at a time.
+
+    Every batch is cast to the schema of the first, so the columns must
+    match. The file is written beside path and moved into place when
+    complete, or removed if a batch fails. Returns (rows, batches) written.
+    """
+    fmt = fmt or format_for(path)
+    if fmt != 'csv' and pa is None:
+        raise ImportError(f"Writing {fmt} files requires pyarrow; export to .csv instead")
+
+    tmp_path = path + ".tmp"
+    writer = None
+    schema = None
+    rows = n_batches = 0
+    try:
+        for batch in batches:
+            if fmt == 'csv':
+                batch.to_csv(tmp_path, mode='a' if n_batches else 'w', header=not n_batches, index=False)
+            else:
+                table = pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    if fmt == 'arrow':
+                        writer = pa.ipc.new_file(tmp_path, schema)
+                    else:
+                        writer = pq.ParquetWriter(tmp_path, schema)
+                writer.write_table(table)
+            rows += len(batch)
+            n_batches += 1
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if writer is not None:
+        writer.close()
+    if n_batches:
+        os.replace(tmp_path, path)
+    return rows, n_batches
+
+
+def export(table, path, tickers=None, events=None, fmt=None, shared=None):
+    """Export one of TABLES for tickers and events (by default every stock and every event) to path"""
+    shared = shared or shared_data()
+    tickers = [ticker for ticker in (tickers or shared.stock_data) if ticker in shared.stock_data]
+    market_events = shared.market_events
+    if events:
+        market_events = market_events[market_events['Event'].isin(events)]
+    market_events = market_events[['Event', 'Start Date', 'End Date']]
+    return write_batches(TABLES[table](shared, tickers, market_events), path, fmt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export computed tables for the whole universe")
+    parser.add_argument("table", choices=sorted(TABLES) + ['all'])
+    parser.add_argument("output", help="Output file (.arrow, .parquet or .csv), or a directory for 'all'")
+    parser.add_argument("--format", choices=sorted(EXTENSIONS), default=None,
+                        help="Output format when it isn't given by the extension")
+    parser.add_argument("--tickers", nargs='+', default=None)
+    parser.add_argument("--events", nargs='+', default=None)
+    args = parser.parse_args()
+
+    if args.table == 'all':
+        fmt = args.format or ('parquet' if pa is not None else 'csv')
+        os.makedirs(args.output, exist_ok=True)
+        targets = [(table, os.path.join(args.output, table + EXTENSIONS[fmt])) for table in TABLES]
+    else:
+        fmt = args.format
+        targets = [(args.table, args.output)]
+
+    shared = shared_data()
+    for table, path in targets:
+        start = time.perf_counter()
+        try:
+            rows, n_batches = export(table, path, args.tickers, args.events, fmt, shared)
+        except (ImportError, ValueError, OSError) as e:
+            print(f"Error exporting {table}: {e}")
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        if not n_batches:
+            print(f"{table}: nothing to export")
+            continue
+        print(f"{table}: {rows} rows in {n_batches} batches to {path} "
+              f"({format_bytes(os.path.getsize(path))}) in {elapsed:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+from backtest import build_price_panel
+
+WEIGHTINGS = ('cap', 'equal')
+
+# Metadata columns that define group indices
+GROUP_FIELDS = {'Sector': "Sector", 'Headquarters State': "State"}
+
+# Hand-picked baskets offered alongside the metadata groups
+DEFAULT_BASKETS = {
+    "Mega Tech": ["AAPL", "MSFT", "NVDA", "GOOGL", "META"],
+    "Banks": ["BAC", "JPM"],
+    "Payments": ["MA", "V"]
+}
+
+BASE_LEVEL = 100.0
+
+
+def index_ticker(kind, name, weighting='cap'):
+    """Pseudo-ticker for an index, e.g. 'Sector:Technology Cap' or 'Basket:Banks EW'"""
+    return f"{kind}:{name} {'Cap' if weighting == 'cap' else 'EW'}"
+
+
+class IndexBuilder:
+    """Cap-weighted and equal-weight composite series over the aligned close panel.
+
+    Each day's index return is the weighted mean of its constituents' daily
+    returns, over the constituents priced on both days; a ticker joins the
+    day after it lists. Equal weight rebalances daily. Cap weight uses each
+    ticker's metadata Market Cap scaled back through its price history
+    (cap x close / last close), i.e. assuming a constant share count.
+    Levels start at BASE_LEVEL on the first day any constituent trades.
+    Results are cached per (weighting, constituent set).
+    """
+
+    def __init__(self, stock_data, stock_metadata):
+        metadata = stock_metadata.drop_duplicates('Ticker').set_index('Ticker')
+        known = [ticker for ticker in metadata.index if ticker in stock_data]
+        self.metadata = metadata.loc[known]
+        self.prices = build_price_panel(stock_data, known)
+        self.tickers = list(self.prices.columns)
+        self.dates = self.prices.index
+
+        volumes = {}
+        for ticker in self.tickers:
+            df = stock_data[ticker]
+            dates = df['date'] if 'date' in df.columns else df.index
+            volumes[ticker] = pd.Series(df['volume'].to_numpy(), index=pd.DatetimeIndex(dates))
+        volume = pd.DataFrame(volumes).reindex(index=self.dates, columns=self.tickers)
+        self.volume = volume.fillna(0).to_numpy(dtype=np.int64)
+
+        prices = self.prices.to_numpy(dtype=np.float64)
+        self.available = np.isfinite(prices)
+        valid = self.available[1:] & self.available[:-1]
+        self.returns = np.where(valid, prices[1:] / np.where(valid, prices[:-1], 1) - 1, 0.0)
+        last_close = self.prices.ffill().iloc[-1].to_numpy(dtype=np.float64)
+        caps = self.metadata['Market Cap'].to_numpy(dtype=np.float64)
+        implied_caps = caps * prices[:-1] / last_close
+        self.weights = {
+            'cap': np.where(valid, implied_caps, 0.0),
+            'equal': valid.astype(np.float64)
+        }
+        self._cache = {}
+
+    def _key(self, tickers, weighting):
+        return weighting, tuple(sorted(set(tickers) & set(self.tickers)))
+
+    def build(self, baskets, weighting='cap'):
+        """Return {name: DataFrame} for {name: tickers}, computing uncached baskets in one pass"""
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting: {weighting}")
+        pending = {}
+        for name, tickers in baskets.items():
+            key = self._key(tickers, weighting)
+            if key not in self._cache and key[1]:
+                pending[key] = key[1]
+
+        if pending:
+            keys = list(pending)
+            membership = np.zeros((len(keys), len(self.tickers)))
+            column = {ticker: i for i, ticker in enumerate(self.tickers)}
+            for b, key in enumerate(keys):
+                membership[b, [column[ticker] for ticker in key[1]]] = 1.0
+
+            weights = self.weights[weighting]
+            numerator = (weights * self.returns) @ membership.T
+            denominator = weights @ membership.T
+            daily = np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+            growth = np.vstack([np.ones((1, len(keys))), np.cumprod(1 + daily, axis=0)])
+
+            # Rebase each level to BASE_LEVEL on its first trading day
+            started = np.logical_or.accumulate(self.available.astype(np.float64) @ membership.T > 0, axis=0)
+            first = np.where(started.any(axis=0), started.argmax(axis=0), 0)
+            levels = np.where(started, BASE_LEVEL * growth / growth[first, np.arange(len(keys))], np.nan)
+            volume = self.volume @ membership.T.astype(np.int64)
+
+            for b, key in enumerate(keys):
+                self._cache[key] = pd.DataFrame({
+                    'date': self.dates,
+                    'open': levels[:, b],
+                    'high': levels[:, b],
+                    'low': levels[:, b],
+                    'close': levels[:, b],
+                    'volume': volume[:, b]
+                })[started[:, b]].reset_index(drop=True)
+
+        results = {}
+        for name, tickers in baskets.items():
+            key = self._key(tickers, weighting)
+            if key in self._cache:
+                results[name] = self._cache[key]
+        return results
+
+    def group_baskets(self, field, ticker_list=None):
+        """{group value: tickers} for a metadata column, optionally restricted to ticker_list"""
+        metadata = self.metadata
+        if ticker_list is not None:
+            metadata = metadata[metadata.index.isin(ticker_list)]
+        return {value: list(group.index) for value, group in metadata.groupby(field, sort=True)}
+
+    def group_frames(self, field, weighting='cap', ticker_list=None, index_by_date=False):
+        """{pseudo-ticker: frame} for every group of field among ticker_list"""
+        kind = GROUP_FIELDS.get(field, field)
+        baskets = {index_ticker(kind, value, weighting): tickers
+                   for value, tickers in self.group_baskets(field, ticker_list).items()}
+        return self._frames(self.build(baskets, weighting), index_by_date)
+
+    def basket_frames(self, baskets=DEFAULT_BASKETS, weighting='cap', index_by_date=False):
+        named = {index_ticker("Basket", name, weighting): tickers for name, tickers in baskets.items()}
+        return self._frames(self.build(named, weighting), index_by_date)
+
+    def pseudo_tickers(self, fields=tuple(GROUP_FIELDS), weightings=WEIGHTINGS, baskets=DEFAULT_BASKETS,
+                       index_by_date=False):
+        """Every group and basket index as {pseudo-ticker: frame}, ready to merge into stock_data"""
+        frames = {}
+        for weighting in weightings:
+            named = {}
+            for field in fields:
+                kind = GROUP_FIELDS.get(field, field)
+                for value, tickers in self.group_baskets(field).items():
+                    named[index_ticker(kind, value, weighting)] = tickers
+            for name, tickers in (baskets or {}).items():
+                named[index_ticker("Basket", name, weighting)] = tickers
+            frames.update(self._frames(self.build(named, weighting), index_by_date))
+        return frames
+
+    def _frames(self, frames, index_by_date):
+        if index_by_date:
+            return {name: df.set_index('date') for name, df in frames.items()}
+        return frames
+
+
+if __name__ == "__main__":
+    import time
+    from stock_store import load_stock_data, load_stock_metadata
+
+    stock_data = load_stock_data()
+    start = time.perf_counter()
+    builder = IndexBuilder(stock_data, load_stock_metadata())
+    frames = builder.pseudo_tickers()
+    elapsed = time.perf_counter() - start
+    for name, df in frames.items():
+        print(f"{name:45s} {df['date'].iloc[0].date()} -> {df['date'].iloc[-1].date()}  {df['close'].iloc[-1]:14,.1f}")
+    print(f"{len(frames)} indices in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import atexit
+import functools
+from collections import defaultdict, deque
+
+# Tracing is off unless STOCK_TRACE is set; when off every helper below
+# returns a shared no-op object so the dashboards pay a single flag check.
+_enabled = os.environ.get("STOCK_TRACE", "") not in ("", "0")
+
+# Optional JSON-lines file the trace records are dumped to at exit
+_trace_path = os.environ.get("STOCK_TRACE_FILE") or None
+
+# Optional on-screen HUD listing last/avg/p95 per stage
+_hud_enabled = os.environ.get("STOCK_HUD", "") not in ("", "0")
+
+# Number of recent durations kept per stage for the avg/p95 statistics
+HISTORY_SIZE = 500
+
+# Maximum number of trace records held in memory before the oldest are dropped
+MAX_RECORDS = 10000
+
+_stage_history = defaultdict(lambda: deque(maxlen=HISTORY_SIZE))
+_counters = defaultdict(int)
+_records = deque(maxlen=MAX_RECORDS)
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(trace_path=None, hud=False):
+    """Turn tracing on at runtime, optionally dumping to trace_path at exit"""
+    global _enabled, _trace_path, _hud_enabled
+    _enabled = True
+    _hud_enabled = _hud_enabled or hud
+    if trace_path:
+        _trace_path = trace_path
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Forget all collected stage timings, counters and records"""
+    _stage_history.clear()
+    _counters.clear()
+    _records.clear()
+
+
+class _NullPipeline:
+    """Stand-in returned while tracing is disabled; every call is a no-op"""
+
+    def stage(self, name):
+        pass
+
+    def count(self, key, n=1):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_PIPELINE = _NullPipeline()
+
+
+class Pipeline:
+    """Times the consecutive stages of one plot or update call.
+
+    Calling stage() closes the running stage and opens the next one, so a
+    method can be instrumented by dropping stage() calls between its steps.
+    Stages entered more than once (e.g. inside a per-ticker loop) accumulate.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self._current = None
+        self._stage_start = self.started
+        self._ended = False
+
+    def stage(self, name):
+        now = time.perf_counter()
+        if self._current is not None:
+            self.stages[self._current] = self.stages.get(self._current, 0.0) + (now - self._stage_start) * 1000
+        self._current = name
+        self._stage_start = now
+
+    def count(self, key, n=1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def end(self):
+        if self._ended:
+            return
+        self._ended = True
+        self.stage(None)
+        total_ms = (time.perf_counter() - self.started) * 1000
+
+        for stage_name, duration in self.stages.items():
+            _stage_history[f"{self.name}.{stage_name}"].append(duration)
+        _stage_history[self.name].append(total_ms)
+        for key, n in self.counts.items():
+            _counters[f"{self.name}.{key}"] += n
+
+        _records.append({
+            'pipeline': self.name,
+            'time': time.time(),
+            'total_ms': round(total_ms, 3),
+            'stages': {k: round(v, 3) for k, v in self.stages.items()},
+            'counts': self.counts
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end()
+        return False
+
+
+def pipeline(name):
+    """Start timing a named pipeline; returns a no-op object when disabled"""
+    if not _enabled:
+        return _NULL_PIPELINE
+    return Pipeline(name)
+
+
+def traced(name):
+    """Decorator timing every call of the wrapped function under name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Pipeline(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage_stats():
+    """Return {stage: {'last_ms', 'avg_ms', 'p95_ms', 'calls'}} for every recorded stage"""
+    stats = {}
+    for name, history in _stage_history.items():
+        if not history:
+            continue
+        ordered = sorted(history)
+        p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+        stats[name] = {
+            'last_ms': history[-1],
+            'avg_ms': sum(history) / len(history),
+            'p95_ms': ordered[p95_index],
+            'calls': len(history)
+        }
+    return stats
+
+
+def counters():
+    return dict(_counters)
+
+
+def dump_trace(path=None):
+    """Write every buffered trace record to path as JSON lines"""
+    path = path or _trace_path
+    if not path or not _records:
+        return
+    try:
+        with open(path, "a") as f:
+            for record in _records:
+                f.write(json.dumps(record) + "\n")
+        _records.clear()
+    except Exception as e:
+        print(f"Error writing trace to {path}: {e}")
+
+
+@atexit.register
+def _dump_at_exit():
+    if _enabled and _trace_path:
+        dump_trace()
+
+
+def format_stats():
+    """Format the stage statistics as a fixed-width text block"""
+    lines = [f"{'stage':<48}{'last':>9}{'avg':>9}{'p95':>9}"]
+    for name, s in sorted(stage_stats().items()):
+        lines.append(f"{name:<48}{s['last_ms']:>9.1f}{s['avg_ms']:>9.1f}{s['p95_ms']:>9.1f}")
+    return "\n".join(lines)
+
+
+def attach_hud(widget, interval_ms=500):
+    """Overlay a label with per-stage timings on widget when the HUD is enabled"""
+    if not (_enabled and _hud_enabled):
+        return None
+
+    from PyQt6.QtWidgets import QLabel
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtGui import QFont
+
+    hud = QLabel(widget)
+    hud.setFont(QFont("Monospace", 8))
+    hud.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: white; padding: 4px;")
+    hud.move(8, 8)
+
+    def refresh():
+        hud.setText(format_stats())
+        hud.adjustSize()
+        hud.raise_()
+
+    timer = QTimer(hud)
+    timer.timeout.connect(refresh)
+    timer.start(interval_ms)
+    refresh()
+    hud.show()
+    return hud
@@ -0,0 +1,306 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+from stock_store import DATA_DIR, PRICE_COLUMNS, format_bytes
+
+# Directory holding one folder per ticker with one compressed file per month, plus the catalog
+INTRADAY_DIR = os.path.join(DATA_DIR, "intraday")
+CATALOG_NAME = "catalog.json"
+CATALOG_VERSION = 1
+
+# Rows per compressed chunk. A month of minute bars is a few chunks, and a
+# read decompresses only the chunks overlapping its time range.
+CHUNK_ROWS = 4096
+
+# Rows read from a CSV at a time while ingesting
+CSV_CHUNK_ROWS = 200_000
+
+# Points kept per series when minute bars are downsampled for plotting
+MAX_PLOT_POINTS = 4000
+
+COLUMNS = PRICE_COLUMNS + ['volume']
+
+SECONDS_PER_DAY = 86400
+
+
+def _to_seconds(value):
+    if value is None:
+        return None
+    return int(pd.Timestamp(value).value // 10 ** 9)
+
+
+def _seconds(times):
+    """Datetime-like values as int64 seconds since the epoch"""
+    return np.asarray(times, dtype='datetime64[s]').astype(np.int64)
+
+
+def combine_bars(keys, open_, high, low, close, volume):
+    """Merge consecutive bars with the same key (e.g. day) into one OHLCV bar each.
+
+    Bars must be sorted by time; the result has one row per run of equal keys.
+    """
+    if not len(keys):
+        return keys, open_, high, low, close, volume
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    ends = np.concatenate([starts[1:], [len(keys)]])
+    return (keys[starts], open_[starts], np.maximum.reduceat(high, starts), np.minimum.reduceat(low, starts),
+            close[ends - 1], np.add.reduceat(volume, starts))
+
+
+def bucket_extremes(buckets, values):
+    """Positions of the lowest and highest value in each run of equal (sorted) buckets, in order"""
+    if not len(buckets):
+        return np.empty(0, dtype=np.int64)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(buckets)) + 1])
+    ends = np.concatenate([starts[1:], [len(buckets)]])
+    order = np.lexsort((values, buckets))
+    return np.unique(np.concatenate([order[starts], order[ends - 1]]))
+
+
+class IntradayStore:
+    """Minute (or any intraday) bars in chunked, compressed, month-partitioned files.
+
+    Each ticker's bars live in <root>/<ticker>/<YYYY-MM>.npz, split into
+    chunks of CHUNK_ROWS rows stored as separately compressed arrays. The
+    catalog lists every chunk's first and last timestamp, so a query opens
+    only the months and decompresses only the chunks overlapping its range.
+    iter_chunks() streams a range one chunk at a time, and daily() and
+    downsample() aggregate as they stream, so memory stays bounded by a
+    chunk plus the (small) result however long the range is.
+
+    Timestamps are naive exchange-local times, stored as int64 seconds.
+    Ranges are half-open, [start, end).
+    """
+
+    def __init__(self, root=INTRADAY_DIR):
+        self.root = root
+        self.chunks_read = 0
+        self._lock = threading.Lock()
+        self.catalog = self._load_catalog()
+
+    def _load_catalog(self):
+        path = os.path.join(self.root, CATALOG_NAME)
+        try:
+            with open(path) as f:
+                catalog = json.load(f)
+            if catalog.get('version') == CATALOG_VERSION:
+                return catalog
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading intraday catalog {path}: {e}")
+        return {'version': CATALOG_VERSION, 'tickers': {}}
+
+    def save_catalog(self):
+        path = os.path.join(self.root, CATALOG_NAME)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.catalog, f)
+        os.replace(tmp_path, path)
+
+    def __contains__(self, ticker):
+        return ticker in self.catalog['tickers']
+
+    def __iter__(self):
+        return iter(self.catalog['tickers'])
+
+    def __len__(self):
+        return len(self.catalog['tickers'])
+
+    def month_path(self, ticker, month):
+        return os.path.join(self.root, ticker, f"{month}.npz")
+
+    def _read_month(self, ticker, month):
+        """Every bar of one stored month, as a dict of column arrays"""
+        chunks = self.catalog['tickers'].get(ticker, {}).get(month, [])
+        if not chunks:
+            return None
+        with np.load(self.month_path(ticker, month)) as archive:
+            return {column: np.concatenate([archive[f"{column}_{k}"] for k in range(len(chunks))])
+                    for column in ['time'] + COLUMNS}
+
+    def _write_month(self, ticker, month, bars):
+        path = self.month_path(ticker, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {}
+        chunks = []
+        for k, start in enumerate(range(0, len(bars['time']), CHUNK_ROWS)):
+            end = min(start + CHUNK_ROWS, len(bars['time']))
+            for column in ['time'] + COLUMNS:
+                arrays[f"{column}_{k}"] = bars[column][start:end]
+            chunks.append([int(bars['time'][start]), int(bars['time'][end - 1]), end - start])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+        self.catalog['tickers'].setdefault(ticker, {})[month] = chunks
+
+    def append(self, ticker, df):
+        """Add bars (a datetime column or index plus open/high/low/close/volume) to ticker's store.
+
+        Only the months df touches are rewritten; bars at timestamps already
+        stored replace the old ones. Call save_catalog() when done.
+        """
+        times = df['datetime'] if 'datetime' in df.columns else df.index
+        new = {'time': _seconds(times)}
+        for column in PRICE_COLUMNS:
+            new[column] = df[column].to_numpy(dtype=np.float64)
+        new['volume'] = df['volume'].to_numpy(dtype=np.int64)
+
+        months = new['time'].astype('datetime64[s]').astype('datetime64[M]')
+        for month in np.unique(months):
+            rows = months == month
+            month = str(month)
+            old = self._read_month(ticker, month)
+            bars = {column: values[rows] for column, values in new.items()}
+            if old is not None:
+                bars = {column: np.concatenate([old[column], bars[column]]) for column in bars}
+
+            # Sort by time, keeping the last bar written for each timestamp
+            order = np.argsort(bars['time'], kind='stable')
+            times = bars['time'][order]
+            keep = np.concatenate([times[1:] != times[:-1], [True]])
+            bars = {column: values[order][keep] for column, values in bars.items()}
+            self._write_month(ticker, month, bars)
+
+    def ingest_csv(self, ticker, path, chunksize=CSV_CHUNK_ROWS):
+        """Append a CSV of bars (datetime,open,high,low,close,volume) a block of rows at a time"""
+        for block in pd.read_csv(path, chunksize=chunksize):
+            block.columns = [column.strip().lower() for column in block.columns]
+            block['datetime'] = pd.to_datetime(block['datetime'])
+            self.append(ticker, block)
+        self.save_catalog()
+
+    def _chunks(self, ticker, start, end):
+        """(month, chunk number) of ticker's chunks overlapping [start, end) in seconds, in time order"""
+        months = self.catalog['tickers'].get(ticker, {})
+        for month in sorted(months):
+            for k, (first, last, _) in enumerate(months[month]):
+                if (start is None or last >= start) and (end is None or first < end):
+                    yield month, k
+
+    def iter_chunks(self, ticker, start=None, end=None):
+        """Yield ticker's bars in [start, end) one chunk at a time, as dicts of column arrays"""
+        lo, hi = _to_seconds(start), _to_seconds(end)
+        archive, open_month = None, None
+        try:
+            for month, k in self._chunks(ticker, lo, hi):
+                if month != open_month:
+                    if archive is not None:
+                        archive.close()
+                    archive, open_month = np.load(self.month_path(ticker, month)), month
+                bars = {column: archive[f"{column}_{k}"] for column in ['time'] + COLUMNS}
+                with self._lock:
+                    self.chunks_read += 1
+                first = np.searchsorted(bars['time'], lo, side='left') if lo is not None else 0
+                last = np.searchsorted(bars['time'], hi, side='left') if hi is not None else len(bars['time'])
+                if last > first:
+                    yield {column: values[first:last] for column, values in bars.items()}
+        finally:
+            if archive is not None:
+                archive.close()
+
+    def read(self, ticker, start=None, end=None):
+        """Bars of ticker in [start, end) as a datetime/open/high/low/close/volume DataFrame"""
+        chunks = list(self.iter_chunks(ticker, start, end))
+        columns = {column: np.concatenate([chunk[column] for chunk in chunks]) if chunks else
+                   np.empty(0, dtype=np.int64 if column in ('time', 'volume') else np.float64)
+                   for column in ['time'] + COLUMNS}
+        return pd.DataFrame({'datetime': columns.pop('time').astype('datetime64[s]').astype('datetime64[ns]'),
+                             **columns})
+
+    def daily(self, ticker, start=None, end=None):
+        """Bars of ticker in [start, end) aggregated to daily date/open/high/low/close/volume bars"""
+        partials = []
+        for chunk in self.iter_chunks(ticker, start, end):
+            days = chunk['time'] // SECONDS_PER_DAY
+            partials.append(combine_bars(days, *(chunk[column] for column in COLUMNS)))
+
+        # A day split across two chunks leaves two partial bars to merge
+        if partials:
+            merged = combine_bars(*(np.concatenate(parts) for parts in zip(*partials)))
+        else:
+            merged = [np.empty(0, dtype=np.int64)] + [np.empty(0)] * 4 + [np.empty(0, dtype=np.int64)]
+        days, *values = merged
+        return pd.DataFrame({'date': days.astype('datetime64[D]').astype('datetime64[ns]'),
+                             **dict(zip(COLUMNS, values))})
+
+    def daily_frames(self, ticker_list=None):
+        """Daily bars of every stored ticker (or of ticker_list), shaped like load_stock_data's frames"""
+        return {ticker: self.daily(ticker) for ticker in (ticker_list or self) if ticker in self}
+
+    def downsample(self, ticker, start=None, end=None, max_points=MAX_PLOT_POINTS):
+        """Close prices in [start, end) reduced to at most max_points for plotting.
+
+        The range is cut into max_points / 2 equal time buckets and each keeps
+        its lowest and highest close in time order, so spikes survive.
+        """
+        if start is None or end is None:
+            first, last = self.time_range(ticker) or (pd.Timestamp(0), pd.Timestamp(0))
+            start = first if start is None else start
+            end = last + pd.Timedelta(seconds=1) if end is None else end
+        lo, hi = _to_seconds(start), _to_seconds(end)
+        width = max(1, -(-(hi - lo) // max(1, max_points // 2)))
+
+        # Candidates from each chunk, then one more pass for buckets split across chunks
+        times, closes = [], []
+        for chunk in self.iter_chunks(ticker, start, end):
+            picked = bucket_extremes((chunk['time'] - lo) // width, chunk['close'])
+            times.append(chunk['time'][picked])
+            closes.append(chunk['close'][picked])
+        times = np.concatenate(times) if times else np.empty(0, dtype=np.int64)
+        closes = np.concatenate(closes) if closes else np.empty(0)
+        picked = bucket_extremes((times - lo) // width, closes)
+        return pd.DataFrame({'datetime': times[picked].astype('datetime64[s]').astype('datetime64[ns]'),
+                             'close': closes[picked]})
+
+    def time_range(self, ticker):
+        """First and last stored timestamps of ticker"""
+        months = self.catalog['tickers'].get(ticker, {})
+        if not months:
+            return None
+        first = months[min(months)][0][0]
+        last = months[max(months)][-1][1]
+        return (pd.Timestamp(first, unit='s'), pd.Timestamp(last, unit='s'))
+
+    def nbytes(self):
+        """Size of the compressed files on disk"""
+        total = 0
+        for ticker, months in self.catalog['tickers'].items():
+            for month in months:
+                try:
+                    total += os.path.getsize(self.month_path(ticker, month))
+                except OSError:
+                    pass
+        return total
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Ingest and inspect intraday bars")
+    parser.add_argument("ticker")
+    parser.add_argument("--ingest", metavar="CSV", help="CSV of datetime,open,high,low,close,volume bars to add")
+    parser.add_argument("--start", help="Start of the range to show (inclusive)")
+    parser.add_argument("--end", help="End of the range to show (exclusive)")
+    args = parser.parse_args()
+
+    store = IntradayStore()
+    if args.ingest:
+        start = time.perf_counter()
+        store.ingest_csv(args.ticker, args.ingest)
+        print(f"Ingested {args.ingest} in {(time.perf_counter() - start) * 1000:.0f} ms")
+    if args.ticker not in store:
+        print(f"No intraday bars stored for {args.ticker}")
+    else:
+        first, last = store.time_range(args.ticker)
+        print(f"{args.ticker}: {first} to {last}, {format_bytes(store.nbytes())} on disk for all tickers")
+        start = time.perf_counter()
+        daily = store.daily(args.ticker, args.start, args.end)
+        print(daily.to_string(index=False, max_rows=20))
+        print(f"Aggregated {len(daily)} days from {store.chunks_read} chunks in "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
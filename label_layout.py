@@ -0,0 +1,108 @@
+import heapq
+import numpy as np
+from matplotlib.transforms import blended_transform_factory
+
+# Approximate advance of one character, as a fraction of the font size
+CHAR_WIDTH = 0.6
+
+# Distance between label rows, as a multiple of the font size
+ROW_SPACING = 1.5
+
+# Gap kept between neighbouring labels in a row, in pixels
+PADDING_PX = 6
+
+# Share of the axes height, from the top, that label rows may fill
+MAX_ROWS_FRACTION = 0.5
+
+
+def assign_lanes(starts, ends):
+    """Lowest free lane for each [start, end) interval so intervals sharing a lane never overlap.
+
+    A sweep in start order keeps heaps of the busy lanes' ends and of the
+    free lane numbers, so it runs in O(n log n) and uses as many lanes as
+    the deepest overlap, the fewest possible.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    lanes = np.empty(len(starts), dtype=np.int64)
+    busy = []
+    free = []
+    n_lanes = 0
+    for i in np.argsort(starts, kind='stable'):
+        while busy and busy[0][0] <= starts[i]:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+        if free:
+            lane = heapq.heappop(free)
+        else:
+            lane = n_lanes
+            n_lanes += 1
+        lanes[i] = lane
+        heapq.heappush(busy, (ends[i], lane))
+    return lanes
+
+
+class LabelLayout:
+    """Horizontal labels at data x positions, stacked in non-overlapping rows from the top of an axes.
+
+    Only labels inside the visible x-range are laid out, so the layout is
+    redone whenever the axes are zoomed, panned or resized. Labels that
+    would need more rows than fit in MAX_ROWS_FRACTION of the axes are
+    hidden until zooming in gives them room. Text artists are pooled and
+    reused between layouts.
+    """
+
+    def __init__(self, ax, fontsize=8, max_rows=None, **text_kwargs):
+        self.ax = ax
+        self.fontsize = fontsize
+        self.max_rows = max_rows
+        self.text_kwargs = text_kwargs
+        self.x = np.empty(0)
+        self.labels = []
+        self.texts = []
+        self.shown = 0
+        self.culled = 0
+        self.overflow = 0
+        self.transform = blended_transform_factory(ax.transData, ax.transAxes)
+        ax.callbacks.connect('xlim_changed', self._on_limits_changed)
+        ax.figure.canvas.mpl_connect('resize_event', self._on_limits_changed)
+
+    def _on_limits_changed(self, *args):
+        self.layout()
+
+    def set_labels(self, x, labels):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.labels = list(labels)
+        self.layout()
+
+    def layout(self):
+        xmin, xmax = sorted(self.ax.get_xlim())
+        in_view = np.flatnonzero((self.x >= xmin) & (self.x <= xmax))
+        self.culled = len(self.x) - len(in_view)
+
+        # Extents in pixels, so a row fills up the same way at any zoom
+        bbox = self.ax.bbox
+        dpi = self.ax.figure.dpi
+        px_per_unit = bbox.width / (xmax - xmin) if xmax > xmin else 0.0
+        char_px = self.fontsize * CHAR_WIDTH * dpi / 72
+        starts = (self.x[in_view] - xmin) * px_per_unit
+        widths = np.array([len(self.labels[i]) for i in in_view], dtype=np.float64) * char_px + PADDING_PX
+        lanes = assign_lanes(starts, starts + widths)
+
+        row_px = self.fontsize * ROW_SPACING * dpi / 72
+        max_rows = self.max_rows or max(1, int(bbox.height * MAX_ROWS_FRACTION // row_px))
+        fits = lanes < max_rows
+        shown, lanes = in_view[fits], lanes[fits]
+        self.overflow = len(in_view) - len(shown)
+        self.shown = len(shown)
+
+        while len(self.texts) < len(shown):
+            self.texts.append(self.ax.text(0, 0, "", transform=self.transform, fontsize=self.fontsize,
+                                           verticalalignment='top', horizontalalignment='left', clip_on=True,
+                                           **self.text_kwargs))
+        row_frac = row_px / bbox.height if bbox.height else 0.0
+        for text, i, lane in zip(self.texts, shown, lanes):
+            text.set_position((self.x[i], 1 - (lane + 0.25) * row_frac))
+            text.set_text(self.labels[i])
+            text.set_visible(True)
+        for text in self.texts[len(shown):]:
+            text.set_visible(False)
@@ -0,0 +1,109 @@
+import time
+import numpy as np
+import pandas as pd
+
+# pyarrow is optional; when it is installed its streaming CSV reader parses
+# the dates natively, otherwise pandas reads the file in chunks.
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+# MacroTrends downloads always use this header and an M/D/YYYY date
+EXPECTED_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+DATE_FORMAT = '%m/%d/%Y'
+
+COLUMN_DTYPES = {
+    'date': str,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.int64
+}
+
+# Rows parsed per chunk; bounds the size of the temporary date strings
+CHUNK_ROWS = 100_000
+
+
+def validate_header(path):
+    """Raise ValueError unless path starts with the MacroTrends header"""
+    with open(path, encoding='utf-8-sig') as f:
+        header = f.readline()
+    columns = [column.strip().lower() for column in header.strip().split(',')]
+    if columns != EXPECTED_COLUMNS:
+        raise ValueError(f"Unexpected MacroTrends header in {path}: {columns}, expected {EXPECTED_COLUMNS}")
+
+
+def _iter_pandas_chunks(path, chunksize):
+    reader = pd.read_csv(path, dtype=COLUMN_DTYPES, chunksize=chunksize, encoding='utf-8-sig')
+    for chunk in reader:
+        chunk['date'] = pd.to_datetime(chunk['date'], format=DATE_FORMAT)
+        yield chunk
+
+
+def _iter_arrow_chunks(path, chunksize):
+    column_types = {
+        'date': pa.timestamp('ns'),
+        'open': pa.float64(),
+        'high': pa.float64(),
+        'low': pa.float64(),
+        'close': pa.float64(),
+        'volume': pa.int64()
+    }
+    # Roughly 40 bytes per MacroTrends row
+    read_options = pa_csv.ReadOptions(block_size=max(1 << 16, chunksize * 40))
+    convert_options = pa_csv.ConvertOptions(column_types=column_types, timestamp_parsers=[DATE_FORMAT])
+    with pa_csv.open_csv(path, read_options=read_options, convert_options=convert_options) as reader:
+        for batch in reader:
+            yield batch.to_pandas()
+
+
+def iter_macrotrends_chunks(path, chunksize=CHUNK_ROWS, engine=None):
+    """Yield the rows of a MacroTrends CSV as DataFrames with parsed dates.
+
+    engine is 'arrow' or 'pandas'; by default arrow is used when available.
+    Only one chunk's raw text is held at a time.
+    """
+    validate_header(path)
+    if engine is None:
+        engine = 'arrow' if pa_csv is not None else 'pandas'
+    if engine == 'arrow':
+        if pa_csv is None:
+            raise ImportError("The arrow engine requires pyarrow")
+        return _iter_arrow_chunks(path, chunksize)
+    return _iter_pandas_chunks(path, chunksize)
+
+
+def read_macrotrends(path, chunksize=CHUNK_ROWS, engine=None, stats=None):
+    """Read a MacroTrends CSV into a date/open/high/low/close/volume DataFrame.
+
+    If a stats dict is passed it is filled with rows, seconds and rows_per_sec.
+    """
+    start = time.perf_counter()
+    chunks = list(iter_macrotrends_chunks(path, chunksize, engine))
+    if len(chunks) == 1:
+        df = chunks[0]
+    elif chunks:
+        df = pd.concat(chunks, ignore_index=True)
+    else:
+        df = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in COLUMN_DTYPES.items()})
+        df['date'] = pd.to_datetime(df['date'])
+    elapsed = time.perf_counter() - start
+
+    if stats is not None:
+        stats['rows'] = len(df)
+        stats['seconds'] = elapsed
+        stats['rows_per_sec'] = len(df) / elapsed if elapsed > 0 else float('inf')
+    return df
+
+
+if __name__ == "__main__":
+    import sys
+    for path in sys.argv[1:]:
+        stats = {}
+        read_macrotrends(path, stats=stats)
+        print(f"{path}: {stats['rows']} rows in {stats['seconds'] * 1000:.1f} ms "
+              f"({stats['rows_per_sec']:,.0f} rows/sec)")
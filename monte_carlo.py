@@ -0,0 +1,156 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Trading days simulated forward
+HORIZON_DAYS = 252
+
+DEFAULT_PATHS = 100_000
+
+# Consecutive historical days drawn together, keeping short-range volatility
+# clustering; 1 is the plain (iid) bootstrap
+BLOCK_DAYS = 20
+
+# Percentiles of the fan, outermost first
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Paths per shard; also bounds the (paths, horizon) array a shard holds
+SHARD_PATHS = 10_000
+
+# Below this many paths the simulation runs in-process instead of in a pool
+POOL_MIN_PATHS = 20_000
+
+# Each day's cumulative log returns are counted into this many bins spanning
+# HISTOGRAM_SIGMAS standard deviations of the horizon's log return either
+# side of its mean; shards return only these counts, which add up exactly
+HISTOGRAM_BINS = 4096
+HISTOGRAM_SIGMAS = 8
+
+
+def _simulate_shard(log_returns, n_paths, horizon, block, seed, lo, width, n_bins):
+    """Histogram of every day's cumulative log return over n_paths block-bootstrapped paths"""
+    rng = np.random.default_rng(seed)
+    n_blocks = -(-horizon // block)
+    starts = rng.integers(0, len(log_returns) - block + 1, size=(n_paths, n_blocks))
+    draws = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :horizon]
+    paths = np.cumsum(log_returns[draws], axis=1)
+
+    bins = np.clip(((paths - lo) / width).astype(np.int64), 0, n_bins - 1)
+    bins += np.arange(horizon) * n_bins
+    return np.bincount(bins.ravel(), minlength=horizon * n_bins).reshape(horizon, n_bins)
+
+
+def _histogram_percentiles(counts, lo, width, percentiles):
+    """Percentiles of each row's distribution, interpolated inside the bin they fall in"""
+    cdf = np.cumsum(counts, axis=1)
+    total = cdf[:, -1:]
+    rows = np.arange(len(counts))
+    values = {}
+    for q in percentiles:
+        target = total * q / 100
+        idx = np.argmax(cdf >= target, axis=1)
+        below = np.where(idx > 0, cdf[rows, np.maximum(idx - 1, 0)], 0)
+        frac = (target[:, 0] - below) / np.maximum(counts[rows, idx], 1)
+        values[q] = lo + (idx + frac) * width
+    return values
+
+
+class MonteCarlo:
+    """Forward return distributions bootstrapped from each ticker's historical daily returns.
+
+    Paths are built from blocks of consecutive historical daily log returns
+    drawn with replacement. A portfolio is simulated from its daily
+    rebalanced return series over the dates all its tickers share, so the
+    draws keep the tickers' co-movement. Paths are split into seeded shards
+    that each return a histogram of every day's cumulative return; the fan
+    percentiles are read from the summed histograms.
+    """
+
+    def __init__(self, stock_data):
+        self.stock_data = stock_data
+
+    def __contains__(self, ticker):
+        return ticker in self.stock_data
+
+    def history(self, tickers, weights=None, end=None):
+        """Daily log returns of a ticker, or of a portfolio of tickers, up to end, and their last date"""
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        closes = {}
+        for ticker in tickers:
+            df = self.stock_data[ticker]
+            dates = df['date'] if 'date' in df.columns else df.index
+            closes[ticker] = pd.Series(df['close'].to_numpy(), index=pd.DatetimeIndex(dates))
+        panel = pd.DataFrame(closes).dropna()
+        if end is not None:
+            panel = panel[panel.index <= pd.Timestamp(end)]
+        returns = panel.pct_change().iloc[1:].to_numpy()
+        weights = np.full(len(tickers), 1 / len(tickers)) if weights is None else np.asarray(weights, dtype=np.float64)
+        portfolio = returns @ (weights / weights.sum())
+        return np.log1p(portfolio[np.isfinite(portfolio)]), (panel.index[-1] if len(panel) else None)
+
+    def simulate(self, tickers, weights=None, end=None, n_paths=DEFAULT_PATHS, horizon=HORIZON_DAYS, block=BLOCK_DAYS,
+                 percentiles=PERCENTILES, seed=0, workers=None, executor=None):
+        """Fan of forward growth multiples, one row per simulated trading day after end.
+
+        Columns are 'day', 'date' (business days after the last historical
+        date), one 'p<q>' column per percentile as a multiple of the starting
+        value, and 'prob_loss', the share of paths below the starting value.
+        An existing executor (e.g. the dashboard host's shared pool) is used
+        instead of starting a new pool.
+        """
+        log_returns, last_date = self.history(tickers, weights, end)
+        block = max(1, min(block, len(log_returns)))
+        if len(log_returns) < 2 * block:
+            raise ValueError(f"Not enough history to simulate {tickers} ({len(log_returns)} daily returns)")
+
+        # Histogram range around the horizon's expected log return
+        mean, sd = log_returns.mean(), log_returns.std()
+        half_range = HISTOGRAM_SIGMAS * max(sd, 1e-6) * np.sqrt(horizon) + abs(mean) * horizon
+        lo, width = -half_range, 2 * half_range / HISTOGRAM_BINS
+
+        shard_paths = [min(SHARD_PATHS, n_paths - i) for i in range(0, n_paths, SHARD_PATHS)]
+        seeds = np.random.SeedSequence(seed).spawn(len(shard_paths))
+        args = [(log_returns, n, horizon, block, seeds[i], lo, width, HISTOGRAM_BINS)
+                for i, n in enumerate(shard_paths)]
+
+        workers = workers or os.cpu_count() or 1
+        if executor is not None and n_paths >= POOL_MIN_PATHS:
+            results = executor.map(_simulate_shard, *zip(*args))
+        elif workers > 1 and n_paths >= POOL_MIN_PATHS:
+            with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+                results = list(pool.map(_simulate_shard, *zip(*args)))
+        else:
+            results = [_simulate_shard(*a) for a in args]
+        counts = sum(results)
+
+        fan = _histogram_percentiles(counts, lo, width, percentiles)
+        zero_bin = int((0 - lo) / width)
+        start = last_date + pd.offsets.BDay(1) if last_date is not None else pd.Timestamp.today().normalize()
+        return pd.DataFrame({
+            'day': np.arange(1, horizon + 1),
+            'date': pd.bdate_range(start, periods=horizon),
+            **{f"p{q}": np.exp(fan[q]) for q in percentiles},
+            'prob_loss': counts[:, :zero_bin].sum(axis=1) / n_paths
+        })
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from stock_store import load_stock_data
+
+    tickers = sys.argv[1:] or ["AAPL"]
+    stock_data = load_stock_data(tickers, quality='drop')
+    simulator = MonteCarlo(stock_data)
+    for workers in (1, None):
+        start = time.perf_counter()
+        fan = simulator.simulate(tickers, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"{' + '.join(tickers)}: {DEFAULT_PATHS:,} paths x {HORIZON_DAYS} days in {elapsed:.2f} s "
+              f"({workers or os.cpu_count()} workers)")
+    final = fan.iloc[-1]
+    print(f"Growth of 1 after {HORIZON_DAYS} trading days: " +
+          ", ".join(f"p{q} {final[f'p{q}']:.2f}" for q in PERCENTILES) +
+          f"; chance of a loss {final['prob_loss'] * 100:.1f}%")
@@ -0,0 +1,266 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from stock_store import (DATA_DIR, PRICE_COLUMNS, PRICE_ATOL, tickers, csv_path, load_stock_data,
+                         price_precision_error, to_epoch_days, from_epoch_days, format_bytes)
+
+# Directory holding one folder per year with one .npy file per ticker, plus the catalog
+PARTITION_DIR = os.path.join(DATA_DIR, "partitions")
+CATALOG_NAME = "catalog.json"
+
+# A catalog of another version is ignored, so every partition is rewritten
+# (2: float32 prices only within PRICE_ATOL)
+CATALOG_VERSION = 2
+
+# Memory the most recently read partitions may hold, on top of the files on disk
+HOT_TIER_MAX_BYTES = 64 * 1024 ** 2
+
+
+def source_signature(path, quality=None):
+    """Size, mtime and quality mode of a source CSV; a partition is rewritten when this changes"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, quality]
+
+
+def _to_days(value):
+    if value is None:
+        return None
+    return int(np.datetime64(pd.Timestamp(value), 'D').astype(np.int64))
+
+
+def _empty_bars():
+    return np.empty(0, dtype=[('date', np.int32)] + [(column, np.float64) for column in PRICE_COLUMNS] +
+                    [('volume', np.int64)])
+
+
+class PartitionStore:
+    """Daily bars on disk, partitioned by calendar year and ticker.
+
+    Each partition is a structured .npy file (int32 epoch-day dates, prices
+    as float32 where PRICE_ATOL allows, int64 volume) at
+    <root>/<year>/<ticker>.npy. The catalog records every partition's row
+    count, first and last date and year-end close, so a query is pruned to
+    the overlapping partitions before any file is opened, and yearly
+    figures need no file at all. Partitions are memory-mapped and only the
+    rows a query asks for are copied out; the most recently used maps are
+    kept open, up to hot_max_bytes of mapped data.
+    """
+
+    def __init__(self, root=PARTITION_DIR, hot_max_bytes=HOT_TIER_MAX_BYTES):
+        self.root = root
+        self.hot_max_bytes = hot_max_bytes
+        self.hot = OrderedDict()
+        self.hot_bytes = 0
+        self.hot_hits = 0
+        self.partitions_read = 0
+        self._lock = threading.Lock()
+        self.catalog = self._load_catalog()
+
+    def _load_catalog(self):
+        path = os.path.join(self.root, CATALOG_NAME)
+        try:
+            with open(path) as f:
+                catalog = json.load(f)
+            if catalog.get('version') == CATALOG_VERSION:
+                return catalog
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading partition catalog {path}: {e}")
+        return {'version': CATALOG_VERSION, 'tickers': {}}
+
+    def save_catalog(self):
+        path = os.path.join(self.root, CATALOG_NAME)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.catalog, f)
+        os.replace(tmp_path, path)
+
+    def __contains__(self, ticker):
+        return ticker in self.catalog['tickers']
+
+    def __iter__(self):
+        return iter(self.catalog['tickers'])
+
+    def __len__(self):
+        return len(self.catalog['tickers'])
+
+    def partition_path(self, ticker, year):
+        return os.path.join(self.root, str(year), f"{ticker}.npy")
+
+    def write(self, ticker, df, source=None):
+        """Store ticker's daily bars as one partition per calendar year, replacing what was stored before"""
+        dates = df['date'] if 'date' in df.columns else df.index
+        fields = [('date', np.int32)]
+        for column in PRICE_COLUMNS:
+            narrow = price_precision_error(df[column].to_numpy()) < PRICE_ATOL
+            fields.append((column, np.float32 if narrow else np.float64))
+        fields.append(('volume', np.int64))
+
+        bars = np.empty(len(df), dtype=fields)
+        bars['date'] = to_epoch_days(dates)
+        for column in PRICE_COLUMNS:
+            bars[column] = df[column].to_numpy()
+        bars['volume'] = df['volume'].to_numpy()
+        bars = bars[np.argsort(bars['date'], kind='stable')]
+
+        # Rows of each year are contiguous once sorted by date
+        years = bars['date'].astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+        bounds = np.flatnonzero(np.diff(years)) + 1
+        partitions = {}
+        for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(bars)]])):
+            if start == end:
+                continue
+            year = int(years[start])
+            path = self.partition_path(ticker, year)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, bars[start:end])
+            os.replace(tmp_path, path)
+            partitions[str(year)] = {
+                'rows': int(end - start),
+                'first': int(bars['date'][start]),
+                'last': int(bars['date'][end - 1]),
+                'last_close': float(bars['close'][end - 1])
+            }
+
+        # Years the ticker no longer has data for
+        old = self.catalog['tickers'].get(ticker, {}).get('partitions', {})
+        for year in old.keys() - partitions.keys():
+            try:
+                os.remove(self.partition_path(ticker, year))
+            except FileNotFoundError:
+                pass
+
+        self.catalog['tickers'][ticker] = {'source': source, 'partitions': partitions}
+        with self._lock:
+            for key in [key for key in self.hot if key[0] == ticker]:
+                self.hot_bytes -= self.hot.pop(key).nbytes
+
+    def sync(self, ticker_list=None, data_dir=DATA_DIR, quality='drop'):
+        """Partition each ticker's CSV that changed since it was last stored, one ticker at a time.
+
+        Returns the tickers that were (re)written.
+        """
+        written = []
+        for ticker in ticker_list or tickers:
+            path = csv_path(ticker, data_dir)
+            try:
+                source = source_signature(path, quality)
+            except OSError as e:
+                print(f"Error reading {path}: {e}")
+                continue
+            entry = self.catalog['tickers'].get(ticker)
+            if entry is not None and entry['source'] == source:
+                continue
+            frames = load_stock_data([ticker], data_dir=data_dir, quality=quality)
+            if ticker in frames:
+                self.write(ticker, frames[ticker], source)
+                written.append(ticker)
+        if written:
+            self.save_catalog()
+        return written
+
+    def prune(self, ticker, start=None, end=None):
+        """Years of ticker's partitions overlapping [start, end], from the catalog alone"""
+        lo, hi = _to_days(start), _to_days(end)
+        partitions = self.catalog['tickers'][ticker]['partitions']
+        return sorted(int(year) for year, part in partitions.items()
+                      if (lo is None or part['last'] >= lo) and (hi is None or part['first'] <= hi))
+
+    def _partition(self, ticker, year):
+        key = (ticker, year)
+        with self._lock:
+            bars = self.hot.get(key)
+            if bars is not None:
+                self.hot.move_to_end(key)
+                self.hot_hits += 1
+                return bars
+
+        bars = np.load(self.partition_path(ticker, year), mmap_mode='r')
+        with self._lock:
+            self.partitions_read += 1
+            if key not in self.hot and bars.nbytes <= self.hot_max_bytes:
+                self.hot[key] = bars
+                self.hot_bytes += bars.nbytes
+                while self.hot_bytes > self.hot_max_bytes:
+                    _, evicted = self.hot.popitem(last=False)
+                    self.hot_bytes -= evicted.nbytes
+        return bars
+
+    def clear_hot(self):
+        with self._lock:
+            self.hot.clear()
+            self.hot_bytes = 0
+
+    def read(self, ticker, start=None, end=None):
+        """Daily bars of ticker from start to end (inclusive) as a date/open/high/low/close/volume DataFrame"""
+        lo, hi = _to_days(start), _to_days(end)
+        pieces = []
+        for year in self.prune(ticker, start, end):
+            bars = self._partition(ticker, year)
+            first = np.searchsorted(bars['date'], lo, side='left') if lo is not None else 0
+            last = np.searchsorted(bars['date'], hi, side='right') if hi is not None else len(bars)
+            pieces.append(bars[first:last])
+        bars = np.concatenate(pieces) if pieces else _empty_bars()
+        return pd.DataFrame({
+            'date': from_epoch_days(bars['date']),
+            **{column: bars[column].astype(np.float64) for column in PRICE_COLUMNS},
+            'volume': bars['volume']
+        })
+
+    def read_years(self, ticker, start_year, end_year):
+        return self.read(ticker, f"{start_year}-01-01", f"{end_year}-12-31")
+
+    def first_date(self, ticker):
+        partitions = self.catalog['tickers'][ticker]['partitions']
+        if not partitions:
+            return None
+        return pd.Timestamp(from_epoch_days([min(part['first'] for part in partitions.values())])[0])
+
+    def year_end_closes(self, ticker):
+        """Last close of every stored year, indexed by its date, read from the catalog"""
+        partitions = self.catalog['tickers'][ticker]['partitions']
+        years = sorted(partitions, key=int)
+        return pd.DataFrame({'close': [partitions[year]['last_close'] for year in years]},
+                            index=pd.DatetimeIndex(from_epoch_days([partitions[year]['last'] for year in years]),
+                                                   name='date'))
+
+    def nbytes(self):
+        """Size of the partition files on disk"""
+        total = 0
+        for ticker, entry in self.catalog['tickers'].items():
+            for year in entry['partitions']:
+                try:
+                    total += os.path.getsize(self.partition_path(ticker, year))
+                except OSError:
+                    pass
+        return total
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    store = PartitionStore()
+    start = time.perf_counter()
+    written = store.sync()
+    synced = time.perf_counter()
+    n_partitions = sum(len(entry['partitions']) for entry in store.catalog['tickers'].values())
+    print(f"{len(store)} tickers in {n_partitions} partitions, {format_bytes(store.nbytes())} on disk "
+          f"({len(written)} written in {(synced - start) * 1000:.0f} ms)")
+
+    ticker = sys.argv[1] if len(sys.argv) > 1 else "AAPL"
+    first_year, last_year = (int(year) for year in sys.argv[2:4]) if len(sys.argv) > 3 else (2007, 2009)
+    for attempt in ("cold", "hot"):
+        start = time.perf_counter()
+        df = store.read_years(ticker, first_year, last_year)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{ticker} {first_year}-{last_year} ({attempt}): {len(df)} rows from "
+              f"{len(store.prune(ticker, f'{first_year}-01-01', f'{last_year}-12-31'))} partitions "
+              f"in {elapsed:.2f} ms (read {store.partitions_read}, hot hits {store.hot_hits})")
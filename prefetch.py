@@ -0,0 +1,154 @@
+import time
+import weakref
+import itertools
+import threading
+from collections import OrderedDict
+
+# Quiet time after the last user action before background work starts
+IDLE_DELAY = 0.25
+
+# Computed results kept, least recently used dropped first
+RESULT_CACHE_SIZE = 512
+
+
+_generations = itertools.count(1)
+_generation_refs = {}
+_generation_lock = threading.RLock()
+
+
+def _forget_generation(key, ref):
+    with _generation_lock:
+        entry = _generation_refs.get(key)
+        if entry is not None and entry[0] is ref:
+            del _generation_refs[key]
+
+
+def generation(obj):
+    """A number naming obj (e.g. a ticker's frame) in cache keys for as long as it lives.
+
+    Unlike id(), a number is never given to another object, so results
+    computed from a replaced frame are never served for its successor.
+    None is 0.
+    """
+    if obj is None:
+        return 0
+    key = id(obj)
+    with _generation_lock:
+        entry = _generation_refs.get(key)
+        if entry is None or entry[0]() is not obj:
+            ref = weakref.ref(obj, lambda ref, key=key: _forget_generation(key, ref))
+            entry = (ref, next(_generations))
+            _generation_refs[key] = entry
+        return entry[1]
+
+
+class ResultCache:
+    """Thread-safe LRU of computed view data, filled by the views and by the prefetcher.
+
+    A key being built on one thread is waited for, not built again, by
+    another thread asking for it.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, build):
+        """The cached value of key, built with build() on a miss"""
+        while True:
+            with self._lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return self.entries[key]
+                pending = self._building.get(key)
+                if pending is None:
+                    self._building[key] = threading.Event()
+                    self.misses += 1
+                    break
+            pending.wait()
+
+        try:
+            value = build()
+            with self._lock:
+                self.entries[key] = value
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._building.pop(key).set()
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+class Prefetcher:
+    """Builds the data of likely next views on one background thread while the UI is idle.
+
+    schedule() replaces the queued work with a list of (key, build) tasks,
+    most likely first; each task fills cache[key] unless it is already
+    there. cancel() drops the queue when the user acts. Work only starts
+    after IDLE_DELAY without a schedule() or cancel(), and the delay is
+    checked again before every task, so a burst of input keeps the worker
+    waiting; a task already running is finished and kept.
+    """
+
+    def __init__(self, cache=None, idle_delay=IDLE_DELAY):
+        self.cache = cache if cache is not None else ResultCache()
+        self.idle_delay = idle_delay
+        self.completed = 0
+        self._pending = []
+        self._last_action = time.monotonic()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def cancel(self):
+        with self._cond:
+            self._pending = []
+            self._last_action = time.monotonic()
+            self._cond.notify()
+
+    def schedule(self, tasks):
+        with self._cond:
+            self._pending = [(key, build) for key, build in tasks if key not in self.cache]
+            self._last_action = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _next_task(self):
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                quiet = time.monotonic() - self._last_action
+                if quiet < self.idle_delay:
+                    self._cond.wait(self.idle_delay - quiet)
+                    continue
+                return self._pending.pop(0)
+
+    def _run(self):
+        while True:
+            key, build = self._next_task()
+            if key in self.cache:
+                continue
+            try:
+                self.cache.get(key, build)
+                self.completed += 1
+            except Exception as e:
+                print(f"Error prefetching {key}: {e}")
@@ -0,0 +1,319 @@
+import io
+import json
+import socket
+import struct
+import asyncio
+import argparse
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# pyarrow is optional; frames are sent as Arrow IPC when it is installed
+# and as an .npz archive of column arrays otherwise.
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+import stock_store
+from event_analysis import EventAnalyzer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Requests arriving within this many seconds of each other are run as one batch
+BATCH_WINDOW = 0.002
+
+# Query results kept, least recently used dropped first
+QUERY_CACHE_SIZE = 256
+
+# Every frame is: header length, payload length, JSON header, binary payload
+_FRAME_PREFIX = struct.Struct('>II')
+
+
+class QueryEngine:
+    """Answers dashboard queries from one loaded store with a shared result cache.
+
+    This is also the in-process stand-in for the server: QueryClient and
+    QueryEngine expose the same query methods.
+    """
+
+    def __init__(self, stock_data=None, stock_metadata=None, market_events=None):
+        self.stock_data = stock_data if stock_data is not None else stock_store.load_stock_data()
+        self.stock_metadata = stock_metadata if stock_metadata is not None else stock_store.load_stock_metadata()
+        self.market_events = market_events if market_events is not None else stock_store.load_market_events()
+        self._analyzer = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, query, params):
+        """Run a named query, serving repeats from the cache"""
+        if query not in QUERIES:
+            raise ValueError(f"Unknown query: {query}")
+        key = _request_key({'query': query, 'params': params})
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        result = getattr(self, query)(**params)
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > QUERY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+
+    def analyzer(self):
+        if self._analyzer is None:
+            self._analyzer = EventAnalyzer(self.stock_data)
+        return self._analyzer
+
+    def window(self, ticker, start_year, end_year):
+        df = self.stock_data[ticker]
+        years = df['date'].dt.year
+        return df[(years >= start_year) & (years <= end_year)].reset_index(drop=True)
+
+    def yearly_table(self, tickers, start_year, end_year):
+        frames = []
+        for ticker in tickers:
+            if ticker in self.stock_data:
+                df = stock_store.calculate_yearly_percentage_change(self.stock_data[ticker])
+                df = df[(df.index.year >= start_year) & (df.index.year <= end_year)]
+                frames.append(pd.DataFrame({
+                    'ticker': ticker,
+                    'year': df.index.year,
+                    'close': df['close'].to_numpy(),
+                    'yearly_pct_change': df['yearly_pct_change'].to_numpy(),
+                    'cumulative_return': df['cumulative_return'].to_numpy()
+                }))
+        if not frames:
+            return pd.DataFrame(columns=['ticker', 'year', 'close', 'yearly_pct_change', 'cumulative_return'])
+        return pd.concat(frames, ignore_index=True)
+
+    def impact_matrix(self, tickers, events):
+        """Events x tickers percentage change over each event window"""
+        selected = self.market_events[self.market_events['Event'].isin(events)]
+        known = [ticker for ticker in tickers if ticker in self.stock_data]
+        impacts = self.analyzer().analyze(selected, known)
+        matrix = impacts.pivot(index='event', columns='ticker', values='pct_change')
+        matrix = matrix.reindex(index=events, columns=tickers)
+        matrix.index.name = 'Event'
+        return matrix.reset_index()
+
+    def filtered_tickers(self, sector="All", state="All", location="All", min_cap=None, max_cap=None):
+        filtered_data = self.stock_metadata
+        if sector != "All":
+            filtered_data = filtered_data[filtered_data['Sector'] == sector]
+        if state != "All":
+            filtered_data = filtered_data[filtered_data['Headquarters State'] == state]
+        if location != "All":
+            filtered_data = filtered_data[filtered_data['Headquarters Location'] == location]
+        if min_cap is not None:
+            filtered_data = filtered_data[filtered_data['Market Cap'] >= min_cap]
+        if max_cap is not None:
+            filtered_data = filtered_data[filtered_data['Market Cap'] <= max_cap]
+        return filtered_data['Ticker'].tolist()
+
+
+QUERIES = {'window', 'yearly_table', 'impact_matrix', 'filtered_tickers'}
+
+
+def encode_result(result):
+    """Return (header fields, payload bytes) for a query result"""
+    if not isinstance(result, pd.DataFrame):
+        return {'format': 'json', 'data': result}, b''
+
+    if pa is not None:
+        table = pa.Table.from_pandas(result, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return {'format': 'arrow'}, sink.getvalue().to_pybytes()
+
+    arrays = {}
+    for i, column in enumerate(result.columns):
+        values = result[column].to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        arrays[f"c{i}"] = values
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return {'format': 'npz', 'columns': [str(c) for c in result.columns]}, buffer.getvalue()
+
+
+def decode_result(header, payload):
+    if header['format'] == 'json':
+        return header['data']
+    if header['format'] == 'arrow':
+        if pa is None:
+            raise ImportError("Decoding Arrow payloads requires pyarrow")
+        return pa.ipc.open_stream(payload).read_all().to_pandas()
+    with np.load(io.BytesIO(payload), allow_pickle=False) as archive:
+        return pd.DataFrame({column: archive[f"c{i}"] for i, column in enumerate(header['columns'])})
+
+
+def pack_frame(header, payload=b''):
+    header_bytes = json.dumps(header).encode()
+    return _FRAME_PREFIX.pack(len(header_bytes), len(payload)) + header_bytes + payload
+
+
+async def read_frame(reader):
+    prefix = await reader.readexactly(_FRAME_PREFIX.size)
+    header_len, payload_len = _FRAME_PREFIX.unpack(prefix)
+    header = json.loads(await reader.readexactly(header_len))
+    payload = await reader.readexactly(payload_len) if payload_len else b''
+    return header, payload
+
+
+def _request_key(request):
+    return request.get('query'), json.dumps(request.get('params', {}), sort_keys=True)
+
+
+class QueryServer:
+    """asyncio server that owns a QueryEngine and batches concurrent requests.
+
+    Requests that arrive within BATCH_WINDOW of each other are deduplicated
+    and run together in one worker thread call, so several dashboards asking
+    for the same view share one computation.
+    """
+
+    def __init__(self, engine, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self._queue = None
+        self._server = None
+        self._batcher = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        if self.unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request, _ = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                future = asyncio.get_running_loop().create_future()
+                await self._queue.put((request, future))
+                header, payload = await future
+                header['id'] = request.get('id')
+                writer.write(pack_frame(header, payload))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(BATCH_WINDOW)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            unique = {}
+            for request, _ in batch:
+                unique.setdefault(_request_key(request), request)
+
+            responses = await loop.run_in_executor(None, self._run_unique, unique)
+            for request, future in batch:
+                header, payload = responses[_request_key(request)]
+                future.set_result((dict(header), payload))
+
+    def _run_unique(self, unique):
+        responses = {}
+        for key, request in unique.items():
+            try:
+                result = self.engine.run(request['query'], request.get('params', {}))
+                header, payload = encode_result(result)
+                header['ok'] = True
+            except Exception as e:
+                header, payload = {'ok': False, 'error': f"{type(e).__name__}: {e}"}, b''
+            responses[key] = (header, payload)
+        return responses
+
+
+class QueryClient:
+    """Blocking client for QueryServer with the same query methods as QueryEngine"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, timeout=30):
+        if unix_path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(unix_path)
+        else:
+            self.sock = socket.create_connection((host, port), timeout=timeout)
+        self._next_id = 0
+
+    def close(self):
+        self.sock.close()
+
+    def _recv_exactly(self, n):
+        chunks = []
+        while n:
+            chunk = self.sock.recv(min(n, 1 << 20))
+            if not chunk:
+                raise ConnectionError("Query server closed the connection")
+            chunks.append(chunk)
+            n -= len(chunk)
+        return b''.join(chunks)
+
+    def run(self, query, params):
+        self._next_id += 1
+        self.sock.sendall(pack_frame({'id': self._next_id, 'query': query, 'params': params}))
+        header_len, payload_len = _FRAME_PREFIX.unpack(self._recv_exactly(_FRAME_PREFIX.size))
+        header = json.loads(self._recv_exactly(header_len))
+        payload = self._recv_exactly(payload_len) if payload_len else b''
+        if not header.get('ok'):
+            raise RuntimeError(f"Query {query} failed: {header.get('error')}")
+        return decode_result(header, payload)
+
+    def window(self, ticker, start_year, end_year):
+        return self.run('window', {'ticker': ticker, 'start_year': start_year, 'end_year': end_year})
+
+    def yearly_table(self, tickers, start_year, end_year):
+        return self.run('yearly_table', {'tickers': list(tickers), 'start_year': start_year, 'end_year': end_year})
+
+    def impact_matrix(self, tickers, events):
+        return self.run('impact_matrix', {'tickers': list(tickers), 'events': list(events)})
+
+    def filtered_tickers(self, sector="All", state="All", location="All", min_cap=None, max_cap=None):
+        return self.run('filtered_tickers', {'sector': sector, 'state': state, 'location': location,
+                                             'min_cap': min_cap, 'max_cap': max_cap})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the loaded price store to the dashboards")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket path instead of TCP")
+    args = parser.parse_args()
+
+    engine = QueryEngine()
+    server = QueryServer(engine, args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Serving {len(engine.stock_data)} tickers on {where}")
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import copy
+from collections import OrderedDict
+import numpy as np
+
+# Memory the cached views of every canvas in the process may use together
+CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# Rough cost of one artist beyond its data points, for the byte budget
+ARTIST_BYTES = 1024
+POINT_BYTES = 16
+
+
+def normalize(value):
+    """Hashable, order-stable form of a view-state value"""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), normalize(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(normalize(v) for v in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def _artist_bytes(axes):
+    total = 0
+    for ax in axes:
+        for line in ax.lines:
+            total += ARTIST_BYTES + len(line.get_xdata(orig=False)) * POINT_BYTES
+        total += (len(ax.patches) + len(ax.texts) + len(ax.collections) + len(ax.tables)) * ARTIST_BYTES
+    return total
+
+
+def _cursors(state):
+    """mplcursors cursors held in a canvas's plot state"""
+    for value in state.values():
+        for item in value if isinstance(value, list) else [value]:
+            if hasattr(item, 'enabled') and hasattr(item, 'remove'):
+                yield item
+
+
+class RenderCache:
+    """LRU of stashed canvas views under a byte budget, shared by every canvas"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def pop(self, owner, key):
+        entry = self.entries.pop((owner, key), None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.nbytes -= entry['nbytes']
+        return entry
+
+    def put(self, owner, key, entry):
+        if entry['nbytes'] > self.max_bytes:
+            _discard(entry)
+            return
+        self.entries[(owner, key)] = entry
+        self.nbytes += entry['nbytes']
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted['nbytes']
+            _discard(evicted)
+
+    def clear(self):
+        for entry in self.entries.values():
+            _discard(entry)
+        self.entries.clear()
+        self.nbytes = 0
+
+
+def _discard(entry):
+    for cursor in _cursors(entry['state']):
+        cursor.remove()
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = RenderCache()
+    return _default_cache
+
+
+class CanvasCache:
+    """Keeps recently shown views of one canvas so revisiting one is a blit, not a replot.
+
+    A view is the canvas's Axes (named by axes) plus its plot state
+    attributes (state maps each name to its empty value), keyed by the
+    normalized view state passed to restore() and the canvas's pixel size
+    and DPI. Pixels are captured after every draw of the canvas, and only
+    views that have been drawn are kept.
+
+    Call restore(**view) at the start of a plot method: it stashes the view
+    on screen, and either brings back the cached one for this state (the
+    Axes go back into the figure and the saved pixels are blitted, with
+    cursors and hover data intact) and returns True, or gives the canvas
+    fresh Axes and state to plot into and returns False.
+    """
+
+    def __init__(self, canvas, axes=('ax',), state=None, cache=None):
+        self.canvas = canvas
+        self.axes_attrs = axes
+        self.state_template = state or {}
+        self.cache = cache or default_cache()
+        self.key = None
+        self.pixels = None
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        if self.key is not None:
+            self.pixels = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+
+    def view_key(self, **view):
+        width, height = self.canvas.get_width_height(physical=True)
+        return normalize(view), width, height, self.canvas.figure.dpi
+
+    def restore(self, **view):
+        key = self.view_key(**view)
+        if key == self.key and self.pixels is not None:
+            return True
+        entry = self.cache.pop(self, key)
+        self._stash()
+        self.key = key
+        if entry is None:
+            self._fresh()
+            return False
+        self._install(entry)
+        return True
+
+    def _stash(self):
+        if self.key is None:
+            return
+        figure = self.canvas.figure
+        pars = figure.subplotpars
+        state = {name: getattr(self.canvas, name) for name in self.state_template}
+        key, pixels = self.key, self.pixels
+        self.key = None
+        self.pixels = None
+
+        # A view that never finished drawing (e.g. its plot raised) is not kept
+        if pixels is None:
+            _discard({'state': state})
+            return
+        for cursor in _cursors(state):
+            cursor.enabled = False
+        axes = list(figure.axes)
+        entry = {
+            'axes': axes,
+            'attrs': {name: getattr(self.canvas, name) for name in self.axes_attrs},
+            'subplotpars': {name: getattr(pars, name) for name in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')},
+            'state': state,
+            'pixels': pixels,
+            'nbytes': _artist_bytes(axes) + memoryview(pixels).nbytes
+        }
+        self.cache.put(self, key, entry)
+
+    def _fresh(self):
+        """Replace the Axes with empty ones on the same grid, and reset the plot state"""
+        figure = self.canvas.figure
+        for name in self.axes_attrs:
+            old = getattr(self.canvas, name)
+            figure.delaxes(old)
+            ax = figure.add_subplot(old.get_subplotspec())
+            if not old.axison:
+                ax.set_axis_off()
+            setattr(self.canvas, name, ax)
+        for ax in list(figure.axes):
+            if ax not in [getattr(self.canvas, name) for name in self.axes_attrs]:
+                figure.delaxes(ax)
+        for name, empty in self.state_template.items():
+            setattr(self.canvas, name, copy.copy(empty))
+
+    def _install(self, entry):
+        figure = self.canvas.figure
+        for ax in list(figure.axes):
+            figure.delaxes(ax)
+        for ax in entry['axes']:
+            figure.add_axes(ax)
+        figure.subplots_adjust(**entry['subplotpars'])
+        for name, value in {**entry['attrs'], **entry['state']}.items():
+            setattr(self.canvas, name, value)
+        for cursor in _cursors(entry['state']):
+            cursor.enabled = True
+
+        self.pixels = entry['pixels']
+        self.canvas.restore_region(self.pixels)
+        figure.stale = False
+        self.canvas.update()
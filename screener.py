@@ -0,0 +1,264 @@
+import re
+import numpy as np
+import pandas as pd
+from event_analysis import SINGLE_DAY_PADDING, _epoch_days, _segment_aranges
+
+# Statistics kept for every ticker over every calendar year and market event.
+# change is year-end to year-end for years (as in visual3) and first to last
+# close for events (as in visual4); drawdown is the depth of the worst
+# peak-to-trough fall inside the period as a positive percentage, so
+# "drawdown < 30" reads naturally; volatility is annualized from daily log
+# returns; low and high are the lowest and highest closes.
+STATS = ('change', 'volatility', 'drawdown', 'low', 'high')
+
+# Words accepted for each statistic in a query
+STAT_ALIASES = {
+    'change': 'change', 'yearly change': 'change', 'return': 'change', 'pct change': 'change',
+    'volatility': 'volatility', 'vol': 'volatility',
+    'drawdown': 'drawdown', 'max drawdown': 'drawdown',
+    'low': 'low', 'min': 'low',
+    'high': 'high', 'max': 'high'
+}
+
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '=': np.equal
+}
+
+TRADING_DAYS = 252
+
+_CLAUSE = re.compile(r"^(?P<stat>[a-z ]+?)\s*(?P<op>>=|<=|==|=|>|<)\s*(?P<value>[-+]?\d+(?:\.\d+)?)\s*%?"
+                     r"\s+(?P<kind>in|during)\s+(?P<period>.+?)$", re.IGNORECASE)
+
+# Clauses are split at an 'and' only when a '<stat> <op>' follows it, so
+# event names containing 'and' stay whole
+_STAT_WORDS = "|".join(r"\s+".join(map(re.escape, alias.split()))
+                       for alias in sorted(STAT_ALIASES, key=len, reverse=True))
+_CLAUSE_SPLIT = re.compile(rf"\s+and\s+(?=(?:{_STAT_WORDS})\s*(?:>=|<=|==|=|>|<))", re.IGNORECASE)
+
+QUERY_HELP = "e.g. 'change > 50 in 2020 and drawdown < 30 during COVID-19'"
+
+
+def parse_query(text):
+    """Parse 'stat op value in year|during event' clauses joined by 'and' into (stat, op, value, period) tuples"""
+    conditions = []
+    for clause in _CLAUSE_SPLIT.split(text.strip()):
+        if not clause:
+            continue
+        match = _CLAUSE.match(clause.strip())
+        if not match:
+            raise ValueError(f"Cannot parse '{clause}', {QUERY_HELP}")
+        stat = STAT_ALIASES.get(" ".join(match['stat'].lower().split()))
+        if stat is None:
+            raise ValueError(f"Unknown statistic '{match['stat'].strip()}', expected one of {', '.join(STATS)}")
+        op = '=' if match['op'] == '==' else match['op']
+        period = match['period'].strip()
+        if match['kind'].lower() == 'in' and period.isdigit():
+            period = int(period)
+        conditions.append((stat, op, float(match['value']), period))
+    return conditions
+
+
+class Screener:
+    """Per-ticker statistics for every calendar year and market event, queried by range predicates.
+
+    Each statistic is a (period x ticker) table computed once in a segmented
+    pass over the daily closes. Every row is also kept argsorted, so a
+    predicate's matches are a contiguous slice found with searchsorted. A
+    query estimates each condition's match count that way, starts from the
+    most selective one and checks the rest only on the surviving
+    candidates, stopping as soon as none are left.
+    """
+
+    def __init__(self, stock_data, events=None, single_day_padding=SINGLE_DAY_PADDING):
+        self.tickers = list(stock_data)
+        self._ticker_pos = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        days, closes = [], []
+        for ticker in self.tickers:
+            df = stock_data[ticker]
+            dates = df['date'] if 'date' in df.columns else df.index
+            days.append(_epoch_days(dates))
+            closes.append(df['close'].ffill().to_numpy(dtype=np.float64))
+        lengths = np.array([len(d) for d in days], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        self.close = np.concatenate(closes) if closes else np.empty(0)
+        all_days = np.concatenate(days) if days else np.empty(0, dtype=np.int64)
+
+        # Calendar years, then events, as [start, end] day windows
+        if len(all_days):
+            first_year = int(all_days.min().astype('datetime64[D]').astype('datetime64[Y]').astype(int)) + 1970
+            last_year = int(all_days.max().astype('datetime64[D]').astype('datetime64[Y]').astype(int)) + 1970
+            self.years = list(range(first_year, last_year + 1))
+        else:
+            self.years = []
+        year_start = np.array([f"{year}-01-01" for year in self.years], dtype='datetime64[D]').astype(np.int64)
+        year_end = np.array([f"{year}-12-31" for year in self.years], dtype='datetime64[D]').astype(np.int64)
+
+        self.events = [] if events is None or events.empty else list(events['Event'])
+        if self.events:
+            start_dates = pd.to_datetime(events['Start Date'])
+            end_dates = pd.to_datetime(events['End Date'])
+            single_day = (start_dates == end_dates).to_numpy()
+            pad_days = int(single_day_padding / pd.Timedelta(days=1))
+            event_start = np.where(single_day, _epoch_days(start_dates.to_numpy()) - pad_days,
+                                   _epoch_days(start_dates.to_numpy()))
+            event_end = np.where(single_day, _epoch_days(end_dates.to_numpy()) + pad_days,
+                                 _epoch_days(end_dates.to_numpy()))
+        else:
+            event_start = event_end = np.empty(0, dtype=np.int64)
+
+        self.periods = self.years + self.events
+        self._period_pos = {period: i for i, period in enumerate(self.periods)}
+        window_start = np.concatenate([year_start, event_start])
+        window_end = np.concatenate([year_end, event_end])
+        is_year = np.arange(len(self.periods)) < len(self.years)
+
+        # Locate every period in every ticker's dates; lo/hi are (period x ticker)
+        n_periods, n_tickers = len(self.periods), len(self.tickers)
+        lo = np.empty((n_periods, n_tickers), dtype=np.int64)
+        hi = np.empty((n_periods, n_tickers), dtype=np.int64)
+        for t in range(n_tickers):
+            lo[:, t] = offsets[t] + np.searchsorted(days[t], window_start, side='left')
+            hi[:, t] = offsets[t] + np.searchsorted(days[t], window_end, side='right')
+        self.values = self._window_stats(lo.ravel(), hi.ravel(), np.repeat(is_year, n_tickers),
+                                         np.tile(offsets, n_periods), (n_periods, n_tickers))
+
+        # Sorted copy of each row of each table, missing values last
+        self.order = {}
+        self.sorted_values = {}
+        self.n_valid = {}
+        for stat, table in self.values.items():
+            order = np.argsort(table, axis=1, kind='stable')
+            self.order[stat] = order
+            self.sorted_values[stat] = np.take_along_axis(table, order, axis=1)
+            self.n_valid[stat] = np.isfinite(table).sum(axis=1)
+
+    def _window_stats(self, lo, hi, is_year, ticker_offset, shape):
+        lengths = hi - lo
+        valid = lengths >= 2
+        stats = {stat: np.full(len(lo), np.nan) for stat in STATS}
+        v = np.flatnonzero(valid)
+        if len(v):
+            idx = _segment_aranges(lo[v], lengths[v])
+            segment = np.repeat(np.arange(len(v)), lengths[v])
+            seg_starts = np.concatenate([[0], np.cumsum(lengths[v])[:-1]])
+            values = self.close[idx]
+            last = values[seg_starts + lengths[v] - 1]
+
+            # Years compare to the previous year-end close, events to their first close
+            prev = lo[v] - 1
+            has_prev = prev >= ticker_offset[v]
+            base = np.where(is_year[v], np.where(has_prev, self.close[np.maximum(prev, 0)], np.nan),
+                            values[seg_starts])
+            stats['change'][v] = (last / base - 1) * 100
+
+            stats['low'][v] = np.minimum.reduceat(values, seg_starts)
+            stats['high'][v] = np.maximum.reduceat(values, seg_starts)
+
+            running_max = pd.Series(values).groupby(segment).cummax().to_numpy()
+            stats['drawdown'][v] = -np.minimum.reduceat(values / running_max - 1, seg_starts) * 100
+
+            returns = np.diff(np.log(values), prepend=np.nan)
+            returns[seg_starts] = 0.0
+            returns = np.nan_to_num(returns)
+            count = lengths[v] - 1
+            total = np.add.reduceat(returns, seg_starts)
+            squares = np.add.reduceat(returns * returns, seg_starts)
+            variance = np.divide(squares - total * total / count, count - 1,
+                                 out=np.full(len(v), np.nan), where=count > 1)
+            stats['volatility'][v] = np.sqrt(np.maximum(variance, 0) * TRADING_DAYS) * 100
+        return {stat: values.reshape(shape) for stat, values in stats.items()}
+
+    def resolve_period(self, period):
+        """Row of a year, or of the one event whose name equals or contains period (case-insensitive)"""
+        if period in self._period_pos:
+            return self._period_pos[period]
+        if isinstance(period, (int, np.integer)):
+            raise ValueError(f"No data for {period}, years run {self.years[0]}-{self.years[-1]}")
+        text = str(period).lower()
+        exact = [event for event in self.events if event.lower() == text]
+        matches = exact or [event for event in self.events if text in event.lower()]
+        if len(matches) == 1:
+            return self._period_pos[matches[0]]
+        if not matches:
+            raise ValueError(f"Unknown event '{period}'")
+        raise ValueError(f"'{period}' matches several events: {', '.join(matches)}")
+
+    def _bounds(self, stat, row, op, value):
+        """Slice of the sorted row holding the tickers that satisfy the predicate"""
+        column = self.sorted_values[stat][row, :self.n_valid[stat][row]]
+        left = int(np.searchsorted(column, value, side='left'))
+        right = int(np.searchsorted(column, value, side='right'))
+        return {
+            '>': (right, len(column)),
+            '>=': (left, len(column)),
+            '<': (0, left),
+            '<=': (0, right),
+            '=': (left, right)
+        }[op]
+
+    def select(self, conditions, ticker_list=None):
+        """Tickers meeting every (stat, op, value, period) condition, in stock_data order"""
+        allowed = None
+        if ticker_list is not None:
+            allowed = np.zeros(len(self.tickers), dtype=bool)
+            allowed[[self._ticker_pos[t] for t in ticker_list if t in self._ticker_pos]] = True
+
+        plans = []
+        for stat, op, value, period in conditions:
+            if stat not in self.values:
+                raise ValueError(f"Unknown statistic '{stat}'")
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator '{op}'")
+            row = self.resolve_period(period)
+            lo, hi = self._bounds(stat, row, op, value)
+            plans.append((hi - lo, stat, op, value, row, lo, hi))
+        if not plans:
+            candidates = np.arange(len(self.tickers))
+            return [self.tickers[i] for i in candidates if allowed is None or allowed[i]]
+
+        # Start from the most selective condition and filter its matches by the rest
+        plans.sort(key=lambda plan: plan[0])
+        _, stat, _, _, row, lo, hi = plans[0]
+        candidates = self.order[stat][row, lo:hi]
+        if allowed is not None:
+            candidates = candidates[allowed[candidates]]
+        for _, stat, op, value, row, _, _ in plans[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = candidates[OPERATORS[op](self.values[stat][row, candidates], value)]
+        return [self.tickers[i] for i in np.sort(candidates)]
+
+    def query(self, text, ticker_list=None):
+        return self.select(parse_query(text), ticker_list)
+
+    def table(self, stat):
+        """A statistic as a DataFrame of periods x tickers"""
+        return pd.DataFrame(self.values[stat], index=self.periods, columns=self.tickers)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from stock_store import load_stock_data, load_market_events
+
+    text = " ".join(sys.argv[1:]) or "change > 50 in 2020 and drawdown < 30 during COVID-19"
+    stock_data = load_stock_data()
+    start = time.perf_counter()
+    screener = Screener(stock_data, load_market_events())
+    built = time.perf_counter()
+    matches = screener.query(text)
+    done = time.perf_counter()
+    print(f"{text}:\n  {', '.join(matches) or 'no matches'}")
+    print(f"Built {len(screener.periods)} periods x {len(screener.tickers)} tickers in "
+          f"{(built - start) * 1000:.1f} ms, queried in {(done - built) * 1000:.2f} ms")
+
+    # Every event in the sheet must be usable in a query, including names with 'and' in them
+    for event in screener.events:
+        conditions = parse_query(f"change > 0 during {event} and drawdown < 100 in 2020")
+        if conditions[0][3] != event or len(conditions) != 2:
+            print(f"Error parsing a query on event '{event}': {conditions}")
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory, resource_tracker
+
+# Where publishers write the manifest and attachers look for it by default
+DEFAULT_MANIFEST = os.path.join(tempfile.gettempdir(), "stock_store_manifest.json")
+
+COLUMN_DTYPES = {
+    'date': 'datetime64[ns]',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64'
+}
+
+# Column blocks start on 64-byte boundaries
+ALIGNMENT = 64
+
+# Stores attached by attach_or_load, kept mapped for as long as their frames are in use
+_attached = []
+
+
+def _aligned(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+class _AttachedMemory(shared_memory.SharedMemory):
+    """A segment attached by another process, left mapped when collected.
+
+    Frames handed out over it may outlive the store (they do at interpreter
+    exit), and closing the mapping under them fails; the OS unmaps it with
+    the process.
+    """
+
+    def __del__(self):
+        pass
+
+
+class SharedPriceStore:
+    """Price columns for every ticker laid out in one shared buffer.
+
+    Each column is a single array holding all tickers back to back; the
+    manifest records the byte offset and dtype of each column and the row
+    range of each ticker. Attached stores hand out read-only numpy views and
+    DataFrames over the shared buffer without copying.
+    """
+
+    def __init__(self, manifest, buffer, handle, owner):
+        self.manifest = manifest
+        self.tickers = list(manifest['tickers'])
+        self._handle = handle
+        self._owner = owner
+        self._columns = {}
+        for column, info in manifest['columns'].items():
+            array = np.frombuffer(buffer, dtype=np.dtype(info['dtype']), count=manifest['rows'],
+                                  offset=info['offset'])
+            if not owner:
+                array.flags.writeable = False
+            self._columns[column] = array
+
+    def __contains__(self, ticker):
+        return ticker in self.manifest['tickers']
+
+    def __iter__(self):
+        return iter(self.tickers)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def column(self, ticker, column):
+        start, count = self.manifest['tickers'][ticker]
+        return self._columns[column][start:start + count]
+
+    def frame(self, ticker, index_by_date=False):
+        """Return a DataFrame whose columns are views into the shared buffer"""
+        if index_by_date:
+            index = pd.DatetimeIndex(self.column(ticker, 'date'), name='date', copy=False)
+            values = {column: self.column(ticker, column) for column in self._columns if column != 'date'}
+            return pd.DataFrame(values, index=index, copy=False)
+        return pd.DataFrame({column: self.column(ticker, column) for column in self._columns}, copy=False)
+
+    def to_frames(self, index_by_date=False):
+        return {ticker: self.frame(ticker, index_by_date) for ticker in self.tickers}
+
+    def close(self):
+        """Release this process's mapping of the buffer"""
+        self._columns = {}
+        if isinstance(self._handle, shared_memory.SharedMemory):
+            try:
+                self._handle.close()
+            except BufferError:
+                # Frames handed out earlier still reference the buffer; keep
+                # the handle so the mapping outlives them.
+                return
+        self._handle = None
+
+    def unlink(self, manifest_path=DEFAULT_MANIFEST):
+        """Remove the shared buffer and manifest; only the publisher should call this"""
+        if self.manifest['backend'] == 'shm':
+            segment = shared_memory.SharedMemory(name=self.manifest['name'])
+            segment.close()
+            segment.unlink()
+        else:
+            os.remove(self.manifest['name'])
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+
+def publish(stock_data, manifest_path=DEFAULT_MANIFEST, backend='shm', data_path=None):
+    """Copy stock_data into a shared buffer and write its manifest.
+
+    backend is 'shm' for multiprocessing.shared_memory or 'mmap' for a
+    memory-mapped file at data_path (default: next to the manifest). The
+    returned store owns the buffer; keep it alive while others attach.
+    """
+    tickers = {}
+    rows = 0
+    for ticker, df in stock_data.items():
+        tickers[ticker] = [rows, len(df)]
+        rows += len(df)
+
+    columns = {}
+    nbytes = 0
+    for column, dtype in COLUMN_DTYPES.items():
+        columns[column] = {'dtype': dtype, 'offset': nbytes}
+        nbytes = _aligned(nbytes + rows * np.dtype(dtype).itemsize)
+
+    if backend == 'shm':
+        handle = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        buffer = handle.buf
+        name = handle.name
+    elif backend == 'mmap':
+        name = data_path or os.path.splitext(manifest_path)[0] + ".bin"
+        handle = np.memmap(name, dtype=np.uint8, mode='w+', shape=(max(nbytes, 1),))
+        buffer = handle
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    manifest = {
+        'backend': backend,
+        'name': name,
+        'nbytes': nbytes,
+        'rows': rows,
+        'created': time.time(),
+        'columns': columns,
+        'tickers': tickers
+    }
+    store = SharedPriceStore(manifest, buffer, handle, owner=True)
+
+    for ticker, df in stock_data.items():
+        dates = df['date'] if 'date' in df.columns else df.index
+        store.column(ticker, 'date')[:] = np.asarray(dates, dtype='datetime64[ns]')
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            store.column(ticker, column)[:] = df[column].to_numpy()
+    if backend == 'mmap':
+        handle.flush()
+
+    # Write the manifest last and atomically so attachers never see a partial store
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+    return store
+
+
+def attach(manifest_path=DEFAULT_MANIFEST):
+    """Attach read-only to a published store without copying any prices"""
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    if manifest['backend'] == 'shm':
+        handle = _AttachedMemory(name=manifest['name'])
+        # Attaching registers the segment with this process's resource
+        # tracker, which would unlink it at exit; only the publisher owns it.
+        try:
+            resource_tracker.unregister(handle._name, 'shared_memory')
+        except Exception:
+            pass
+        buffer = handle.buf
+    else:
+        handle = np.memmap(manifest['name'], dtype=np.uint8, mode='r', shape=(max(manifest['nbytes'], 1),))
+        buffer = handle
+    return SharedPriceStore(manifest, buffer, handle, owner=False)
+
+
+def attach_or_load(manifest_path=DEFAULT_MANIFEST, index_by_date=False, load=None):
+    """Return frames from a published store if one is available, else load them.
+
+    load() builds the frames when nothing is published; by default the CSVs
+    are read with bad rows dropped.
+    """
+    if os.path.exists(manifest_path):
+        try:
+            store = attach(manifest_path)
+            _attached.append(store)
+            return store.to_frames(index_by_date)
+        except Exception as e:
+            print(f"Error attaching to shared store: {e}")
+
+    if load is not None:
+        stock_data = load()
+    else:
+        from stock_store import load_stock_data
+        stock_data = load_stock_data(quality='drop')
+    if index_by_date:
+        stock_data = {ticker: df.set_index('date') for ticker, df in stock_data.items()}
+    return stock_data
+
+
+if __name__ == "__main__":
+    import argparse
+    from stock_store import shared_data
+
+    parser = argparse.ArgumentParser(description="Publish the price store for other processes to attach to")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--backend", choices=['shm', 'mmap'], default='shm')
+    args = parser.parse_args()
+
+    # The same frames SharedData loads when nothing is published
+    store = publish(shared_data().load_frames(), args.manifest, args.backend)
+    print(f"Published {len(store)} tickers ({store.manifest['nbytes'] / 1e6:.1f} MB) "
+          f"via {args.backend}; manifest at {args.manifest}. Ctrl-C to unpublish.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+        store.unlink(args.manifest)
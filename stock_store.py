@@ -0,0 +1,417 @@
+import os
+import atexit
+import threading
+import numpy as np
+import pandas as pd
+import data_quality
+from macrotrends_reader import read_macrotrends
+
+# Directory holding the MacroTrends CSV downloads
+DATA_DIR = "data"
+
+# List of stock tickers shipped in the data directory
+tickers = ["AAPL", "ABBV", "AVGO", "BAC", "BRK.A", "BRK.B", "COST", "GOOGL", "HD", "JNJ", "JPM", "LLY", "MA", "META",
+           "MSFT", "NFLX", "NVDA", "ORCL", "PG", "TSLA", "UNH", "V", "WMT", "XOM"]
+
+# Company names shown next to each ticker in the dashboards
+ticker_company_map = {
+    "AAPL": "Apple", "ABBV": "AbbVie", "AVGO": "Broadcom", "BAC": "Bank of America",
+    "BRK.A": "Berkshire Hathaway A", "BRK.B": "Berkshire Hathaway B", "COST": "Costco",
+    "GOOGL": "Alphabet", "HD": "Home Depot", "JNJ": "Johnson & Johnson", "JPM": "JPMorgan Chase",
+    "LLY": "Eli Lilly", "MA": "MasterCard", "META": "Meta Platforms", "MSFT": "Microsoft",
+    "NFLX": "Netflix", "NVDA": "NVIDIA", "ORCL": "Oracle", "PG": "Procter & Gamble",
+    "TSLA": "Tesla", "UNH": "UnitedHealth", "V": "Visa", "WMT": "Walmart", "XOM": "ExxonMobil"
+}
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# Precision check for float32 prices: a price column is only narrowed when
+# every value survives the float64 -> float32 round trip within half a cent.
+# float32 keeps ~7 significant digits, so this holds up to prices of about
+# $65,000; above that (BRK.A trades around $716,000, where float32 steps
+# are 1/16 of a dollar) the column stays float64.
+PRICE_ATOL = 0.005
+
+UINT32_MAX = np.iinfo(np.uint32).max
+
+
+def csv_path(ticker, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"MacroTrends_Data_Download_{ticker}.csv")
+
+
+def load_stock_data(ticker_list=None, data_dir=DATA_DIR, compact=False, quality=None):
+    """Load each ticker's CSV into a DataFrame keyed by ticker.
+
+    With compact=True the frames are packed into a CompactStore instead.
+    quality='drop' or 'mask' runs the data_quality scan (cached per CSV) and
+    drops the bad rows or sets their prices to NaN.
+    """
+    stock_data = {}
+    for ticker in ticker_list or tickers:
+        try:
+            stock_data[ticker] = read_macrotrends(csv_path(ticker, data_dir))
+        except Exception as e:
+            print(f"Error loading data for {ticker}: {e}")
+
+    if quality:
+        paths = {ticker: csv_path(ticker, data_dir) for ticker in stock_data}
+        report = data_quality.check(stock_data, paths, os.path.join(data_dir, ".cache"))
+        stock_data = report.clean_frames(stock_data, quality)
+
+    if compact:
+        return CompactStore.from_frames(stock_data)
+    return stock_data
+
+
+def read_excel_cached(excel_path, sheet_name=0, cache_dir=None):
+    """pd.read_excel, served from a pickle of the sheet after the first read.
+
+    Parsing the workbooks with openpyxl takes far longer than loading a
+    pickle, so the raw sheet is cached in the data directory's .cache folder
+    under the workbook's size and mtime; editing the workbook invalidates it.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(excel_path), ".cache")
+    stat = os.stat(excel_path)
+    prefix = f"{os.path.basename(excel_path)}.{sheet_name}."
+    cache_path = os.path.join(cache_dir, f"{prefix}{stat.st_size}-{stat.st_mtime_ns}.pkl")
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception as e:
+            print(f"Error reading cached copy of {excel_path}: {e}")
+
+    df = pd.read_excel(excel_path, sheet_name=sheet_name)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(cache_dir, name))
+        tmp_path = cache_path + ".tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Error caching {excel_path}: {e}")
+    return df
+
+
+def load_market_events(excel_path=os.path.join(DATA_DIR, 'stock_market_events_with_dates.xlsx')):
+    try:
+        events_df = read_excel_cached(excel_path, sheet_name='Sheet1')
+        events_df['Start Date'] = pd.to_datetime(events_df['Start Date'])
+        events_df['End Date'] = pd.to_datetime(events_df['End Date'])
+        return events_df
+    except Exception as e:
+        print(f"Error loading market events: {e}")
+        return pd.DataFrame()
+
+
+def load_stock_metadata(excel_path=os.path.join(DATA_DIR, 'top_25_us_stocks.xlsx')):
+    stock_metadata = read_excel_cached(excel_path)
+    # Convert market cap strings to numeric values
+    stock_metadata['Market Cap'] = stock_metadata['Market Cap'].str.extract(r'(\d+\.?\d*)').astype(float)
+    return stock_metadata
+
+
+def calculate_yearly_percentage_change(df):
+    """Year-end closes with yearly and cumulative percentage change, as in visual3"""
+    if 'date' in df.columns:
+        df = df.set_index('date')
+    df = df.resample('Y').last()
+    df['yearly_pct_change'] = df['close'].pct_change() * 100
+    df['cumulative_return'] = (1 + df['close'].pct_change()).cumprod() - 1
+    df['cumulative_return'] = df['cumulative_return'] * 100
+    return df
+
+
+def price_precision_error(values):
+    """Return the largest absolute error introduced by storing values as float32"""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return 0.0
+    narrowed = values[finite].astype(np.float32).astype(np.float64)
+    return float(np.max(np.abs(narrowed - values[finite])))
+
+
+def to_epoch_days(dates):
+    """Convert datetime-like values to int32 days since 1970-01-01"""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int32)
+
+
+def from_epoch_days(days):
+    return np.asarray(days, dtype=np.int32).astype('datetime64[D]').astype('datetime64[ns]')
+
+
+def compact_volume(volume):
+    """Pack volume into uint32, dividing by a power of ten when it would overflow.
+
+    Returns (packed, scale) where the original volume is packed * scale.
+    """
+    volume = np.asarray(volume, dtype=np.int64)
+    scale = 1
+    peak = int(volume.max()) if len(volume) else 0
+    while peak // scale > UINT32_MAX:
+        scale *= 10
+    if scale == 1:
+        return volume.astype(np.uint32), scale
+    return np.round(volume / scale).astype(np.uint32), scale
+
+
+class CompactStore:
+    """Columnar per-ticker store with narrowed dtypes.
+
+    Dates are int32 epoch days, prices float32 where PRICE_ATOL allows and
+    volume uint32 with a per-ticker scale. frame() rebuilds the regular
+    date/open/high/low/close/volume DataFrame the dashboards work with.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.volume_scale = {}
+
+    @classmethod
+    def from_frames(cls, stock_data):
+        store = cls()
+        for ticker, df in stock_data.items():
+            store.add(ticker, df)
+        return store
+
+    def add(self, ticker, df):
+        dates = df.index if 'date' not in df.columns else df['date']
+        columns = {'date': to_epoch_days(dates)}
+
+        for column in PRICE_COLUMNS:
+            values = df[column].to_numpy(dtype=np.float64)
+            if price_precision_error(values) < PRICE_ATOL:
+                columns[column] = values.astype(np.float32)
+            else:
+                columns[column] = values
+
+        columns['volume'], self.volume_scale[ticker] = compact_volume(df['volume'].to_numpy())
+        self.columns[ticker] = columns
+
+    def __contains__(self, ticker):
+        return ticker in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def frame(self, ticker, index_by_date=False):
+        """Rebuild a float64/int64 DataFrame for ticker"""
+        columns = self.columns[ticker]
+        df = pd.DataFrame({
+            'date': from_epoch_days(columns['date']),
+            **{column: columns[column].astype(np.float64) for column in PRICE_COLUMNS},
+            'volume': columns['volume'].astype(np.int64) * self.volume_scale[ticker]
+        })
+        if index_by_date:
+            df.set_index('date', inplace=True)
+        return df
+
+    def to_frames(self, index_by_date=False):
+        return {ticker: self.frame(ticker, index_by_date) for ticker in self.columns}
+
+    def nbytes(self):
+        return sum(array.nbytes for columns in self.columns.values() for array in columns.values())
+
+
+def memory_report(stock_data):
+    """Break down memory use in bytes per ticker and per column.
+
+    Accepts either a dict of DataFrames (index bytes reported under 'index')
+    or a CompactStore. The result has one row per ticker plus a 'total' row,
+    and a 'total' column.
+    """
+    rows = {}
+    if isinstance(stock_data, CompactStore):
+        for ticker, columns in stock_data.columns.items():
+            rows[ticker] = {column: array.nbytes for column, array in columns.items()}
+    else:
+        for ticker, df in stock_data.items():
+            usage = df.memory_usage(index=True, deep=True)
+            rows[ticker] = {('index' if column == 'Index' else column): int(n) for column, n in usage.items()}
+
+    report = pd.DataFrame.from_dict(rows, orient='index').fillna(0).astype(np.int64)
+    report['total'] = report.sum(axis=1)
+    report.loc['total'] = report.sum(axis=0)
+    return report
+
+
+def format_bytes(n):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024
+
+
+class SharedData:
+    """Everything the dashboards load, built on first use and then shared.
+
+    One instance per process (see shared_data()) lets visual1-visual5 run
+    side by side in dashboard.py while paying the loading cost once. Views
+    should take a shallow copy of the frame dicts (dict(shared.stock_data))
+    before adding pseudo-tickers of their own; the frames themselves are
+    shared and must not be modified in place.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._values = {}
+        self._lock = threading.RLock()
+        self._executor = None
+
+    def _get(self, name, build):
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = build()
+            return self._values[name]
+
+    def load_frames(self):
+        """Every stock's daily bars read back out of the partitions, which only re-parse the CSVs that changed.
+
+        Tickers with intraday bars but no daily CSV are included as daily
+        bars aggregated from the intraday store.
+        """
+        frames = {ticker: self.partitions.read(ticker) for ticker in self.partitions}
+        for ticker in self.intraday:
+            if ticker not in frames:
+                frames[ticker] = self.intraday.daily(ticker)
+        return frames
+
+    @property
+    def stock_data(self):
+        """Frames with a 'date' column, bad rows dropped by the data quality scan (see load_frames).
+
+        When shared_store.py has published the prices, they are attached
+        read-only from shared memory instead of loaded.
+        """
+        from shared_store import attach_or_load
+        return self._get('stock_data', lambda: attach_or_load(load=self.load_frames))
+
+    @property
+    def indexed_data(self):
+        """The same frames indexed by date, as visual3 uses them"""
+        return self._get('indexed_data', lambda: {ticker: df.set_index('date')
+                                                  for ticker, df in self.stock_data.items()})
+
+    @property
+    def stock_metadata(self):
+        return self._get('stock_metadata', lambda: load_stock_metadata(
+            os.path.join(self.data_dir, 'top_25_us_stocks.xlsx')))
+
+    @property
+    def market_events(self):
+        return self._get('market_events', lambda: load_market_events(
+            os.path.join(self.data_dir, 'stock_market_events_with_dates.xlsx')))
+
+    @property
+    def index_builder(self):
+        from indices import IndexBuilder
+        return self._get('index_builder', lambda: IndexBuilder(self.stock_data, self.stock_metadata))
+
+    @property
+    def index_data(self):
+        """Every sector, state and basket index as {pseudo-ticker: frame}"""
+        return self._get('index_data', lambda: self.index_builder.pseudo_tickers())
+
+    @property
+    def event_study(self):
+        from event_study import EventStudy
+        return self._get('event_study', lambda: EventStudy(self.stock_data))
+
+    @property
+    def backtester(self):
+        from backtest import Backtester
+        return self._get('backtester', lambda: Backtester(self.stock_data, self.stock_metadata))
+
+    @property
+    def intraday(self):
+        """Minute bars, where we have them, in chunked compressed storage"""
+        from intraday_store import IntradayStore
+        return self._get('intraday', lambda: IntradayStore(os.path.join(self.data_dir, "intraday")))
+
+    @property
+    def partitions(self):
+        """Prices partitioned by year and ticker on disk, brought up to date with the CSVs"""
+        from partition_store import PartitionStore
+
+        def build():
+            store = PartitionStore(os.path.join(self.data_dir, "partitions"))
+            store.sync(data_dir=self.data_dir, quality='drop')
+            return store
+        return self._get('partitions', build)
+
+    @property
+    def volume_analytics(self):
+        """VWAP, ATR, abnormal volume and overnight/intraday returns of every stock"""
+        from volume_analytics import VolumeAnalytics
+        return self._get('volume_analytics', lambda: VolumeAnalytics(self.stock_data))
+
+    @property
+    def event_clusters(self):
+        """Tickers clustered by their response to event sets, cached per event set"""
+        from event_clusters import EventClusters
+        return self._get('event_clusters', lambda: EventClusters(self.stock_data, self.event_study))
+
+    @property
+    def screener(self):
+        """Per-year and per-event statistics of every stock for screener queries"""
+        from screener import Screener
+        return self._get('screener', lambda: Screener(self.stock_data, self.market_events))
+
+    @property
+    def prefetcher(self):
+        """Background worker filling the result cache (prefetcher.cache) with the views' likely next data"""
+        from prefetch import Prefetcher
+        return self._get('prefetcher', Prefetcher)
+
+    def executor(self):
+        """The process pool shared by every view, started on first use"""
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+                atexit.register(self._executor.shutdown, cancel_futures=True)
+            return self._executor
+
+    def load_all(self, progress=None):
+        """Load everything the views read at startup.
+
+        progress, if given, is called as progress(step, done, total) before
+        each step and once more when all are loaded.
+        """
+        steps = ('partitions', 'stock_data', 'stock_metadata', 'market_events', 'index_data')
+        for done, name in enumerate(steps):
+            if progress:
+                progress(name, done, len(steps))
+            getattr(self, name)
+        if progress:
+            progress('done', len(steps), len(steps))
+
+
+_shared_data = None
+_shared_lock = threading.Lock()
+
+
+def shared_data():
+    """The process-wide SharedData"""
+    global _shared_data
+    with _shared_lock:
+        if _shared_data is None:
+            _shared_data = SharedData()
+        return _shared_data
+
+
+if __name__ == "__main__":
+    frames = load_stock_data()
+    compact = CompactStore.from_frames(frames)
+    full_report = memory_report(frames)
+    compact_report = memory_report(compact)
+    print(compact_report)
+    full_total = full_report.loc['total', 'total']
+    compact_total = compact_report.loc['total', 'total']
+    print(f"Full: {format_bytes(full_total)}  Compact: {format_bytes(compact_total)}  "
+          f"Reduction: {full_total / compact_total:.2f}x")
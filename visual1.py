@@ -1,55 +1,121 @@
 import sys
-import mplcursors
-import pandas as pd
 
 import matplotlib.pyplot as plt
-from PyQt6.QtWidgets import QApplication, QMainWindow, QComboBox, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QComboBox, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox,
+                             QCheckBox)
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import numpy as np
+import pandas as pd
 import matplotlib.dates as mdates
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+import instrumentation
+import render_cache
+from event_overlay import EventOverlay
+from volume_analytics import VWAP_WINDOW, ATR_WINDOW, VOLUME_BASELINE_WINDOW, VOLUME_SPIKE_RATIO
+from monte_carlo import MonteCarlo, PERCENTILES, HORIZON_DAYS
+from intraday_store import MAX_PLOT_POINTS, bucket_extremes
+from prefetch import generation
+from stock_store import shared_data, ticker_company_map
+
+# Prices, events and indices are loaded once per process and shared with the other views
+shared = shared_data()
+stock_data = dict(shared.stock_data)
+market_events = shared.market_events
 
-# Define a dictionary to store DataFrames for each stock
-stock_data = {}
+# Update tickers list to display both ticker and company names
+formatted_tickers = [f"{ticker} - {name}" for ticker, name in ticker_company_map.items() if ticker in stock_data]
 
+# Add sector, state and basket indices as pseudo-tickers
+index_data = shared.index_data
+stock_data.update(index_data)
+formatted_tickers += [f"{name} - Index" for name in index_data]
 
-# Define a dictionary mapping tickers to company names
-ticker_company_map = {
-    "AAPL": "Apple", "ABBV": "AbbVie", "AVGO": "Broadcom", "BAC": "Bank of America",
-    "BRK.A": "Berkshire Hathaway A", "BRK.B": "Berkshire Hathaway B", "COST": "Costco",
-    "GOOGL": "Alphabet", "HD": "Home Depot", "JNJ": "Johnson & Johnson", "JPM": "JPMorgan Chase",
-    "LLY": "Eli Lilly", "MA": "MasterCard", "META": "Meta Platforms", "MSFT": "Microsoft",
-    "NFLX": "Netflix", "NVDA": "NVIDIA", "ORCL": "Oracle", "PG": "Procter & Gamble",
-    "TSLA": "Tesla", "UNH": "UnitedHealth", "V": "Visa", "WMT": "Walmart", "XOM": "ExxonMobil"
-}
+# VWAP, ATR and abnormal volume of every stock, computed once for all of them
+analytics = shared.volume_analytics
+
+# Forward returns bootstrapped from any ticker's or index's history
+simulator = MonteCarlo(stock_data)
+
+# Analytics that can be drawn over the closing prices
+overlay_names = ["VWAP", "ATR band", "Volume spikes", "Forecast"]
+
+# Data behind each view, computed when shown or ahead of time for the likely next views
+prefetcher = shared.prefetcher
+results = prefetcher.cache
+
+# Quiet time before a neighbouring view whose data is ready is drawn ahead
+# into the render cache, and between two of them; drawing has to happen on
+# the UI thread, so it is done one view per idle moment
+PRERENDER_DELAY_MS = 300
+
+
+def decimate(dates, values, max_points=MAX_PLOT_POINTS):
+    """Lowest and highest value in each of max_points / 2 equal date buckets, which draws the same at screen size"""
+    if len(values) <= max_points:
+        return dates, values
+    days = dates.astype('datetime64[D]').astype(np.int64)
+    width = max(1, -(-(days[-1] - days[0] + 1) // (max_points // 2)))
+    picked = bucket_extremes((days - days[0]) // width, values)
+    return dates[picked], values[picked]
+
+
+def price_series(ticker):
+    """The whole closing price history, decimated for plotting"""
+    df = stock_data[ticker]
+    return decimate(df['date'].to_numpy(), df['close'].to_numpy())
+
+
+def select_years(ticker, start_year, end_year):
+    df = stock_data[ticker]
+    years = df['date'].dt.year
+    return df[(years >= start_year) & (years <= end_year)]
+
+
+def cumulative_gain(selected):
+    """Percentage change from the first to the last close of selected, None if it is empty"""
+    if selected.empty:
+        return None
+    start_price = selected['close'].iloc[0]
+    end_price = selected['close'].iloc[-1]
+    return ((end_price - start_price) / start_price) * 100
+
+
+def year_window(ticker, start_year, end_year):
+    """Closes of the highlighted years (decimated) and their cumulative gain"""
+    selected = select_years(ticker, start_year, end_year)
+    dates, closes = decimate(selected['date'].to_numpy(), selected['close'].to_numpy())
+    return {'dates': dates, 'closes': closes, 'cumulative_gain': cumulative_gain(selected),
+            'rows_scanned': len(stock_data[ticker])}
+
+
+def forecast(ticker, end_year):
+    """Simulated fan after end_year, bootstrapped from the history up to it, and the price it starts from"""
+    end = pd.Timestamp(f"{end_year}-12-31") if end_year else None
+    df = stock_data[ticker]
+    history = df[df['date'] <= end] if end is not None else df
+    closes = history['close'].dropna()
+    if closes.empty:
+        raise ValueError(f"No price history for {ticker} up to {end_year}")
+    return simulator.simulate(ticker, end=end, executor=shared.executor()), closes.iloc[-1]
+
+
+def view_tasks(ticker, start_year, end_year, overlays=()):
+    """Result cache key and builder of each piece of data a view needs.
+
+    Keys include the generation of the ticker's frame, so a swapped or
+    reloaded stock_data is never served results computed from the old one.
+    """
+    source = generation(stock_data.get(ticker))
+    tasks = {
+        'series': (('visual1', 'series', ticker, source), lambda: price_series(ticker)),
+        'window': (('visual1', 'window', ticker, source, start_year, end_year),
+                   lambda: year_window(ticker, start_year, end_year))
+    }
+    if "Forecast" in overlays:
+        tasks['forecast'] = (('visual1', 'forecast', ticker, source, end_year), lambda: forecast(ticker, end_year))
+    return tasks
 
-# Update tickers list to display both ticker and company names
-formatted_tickers = [f"{ticker} - {name}" for ticker, name in ticker_company_map.items()]
-
-def load_market_events(excel_path):
-    try:
-        # Read the Excel file
-        events_df = pd.read_excel(excel_path, sheet_name='Sheet1')
-        events_df['Start Date'] = pd.to_datetime(events_df['Start Date'])
-        events_df['End Date'] = pd.to_datetime(events_df['End Date'])
-        return events_df
-    except Exception as e:
-        print(f"Error loading market events: {e}")
-        return pd.DataFrame()
-
-# Load market events from Excel
-market_events = load_market_events('CS 439 final project data/stock_market_events_with_dates.xlsx')
-
-# List of stock tickers and their respective CSV file paths
-tickers = list(ticker_company_map.keys())
-file_paths = [
-    f"CS 439 final project data/MacroTrends_Data_Download_{ticker}.csv" for ticker in tickers
-]
-
-# Load each CSV file into a DataFrame and store it in the dictionary
-for ticker, file_path in zip(tickers, file_paths):
-    stock_data[ticker] = pd.read_csv(file_path)
-    stock_data[ticker]['date'] = pd.to_datetime(stock_data[ticker]['date'])
 
 class StockPlotCanvas(FigureCanvas):
     def __init__(self, parent=None, width=5, height=4, dpi=100):
@@ -57,50 +123,119 @@ class StockPlotCanvas(FigureCanvas):
         super().__init__(fig)
         self.setParent(parent)
         self.price_cursor = None
-        self.event_cursor = None
-        self.event_spans = []
-        self.event_lines = []
-        self.event_artists = []
-
-    def plot_stock(self, ticker, start_year=None, end_year=None, company_name=""):
+        self.event_overlay = None
+        self.render_cache = render_cache.CanvasCache(self, state={'price_cursor': None, 'event_overlay': None})
+
+    def plot_stock(self, ticker, start_year=None, end_year=None, company_name="", overlays=()):
+        trace = instrumentation.pipeline("visual1.plot_stock")
+        trace.stage("cache")
+        if self.render_cache.restore(ticker=ticker, start_year=start_year, end_year=end_year, overlays=overlays):
+            trace.count("cache_hits")
+            trace.end()
+            return
+        trace.stage("clear")
         self.ax.clear()
         if ticker in stock_data:
-            df = stock_data[ticker]
-            line, = self.ax.plot(df['date'], df['close'], label=ticker)
+            trace.stage("data")
+            tasks = view_tasks(ticker, start_year, end_year)
+            hits = results.hits
+            dates, closes = results.get(*tasks['series'])
+            trace.stage("artists")
+            line, = self.ax.plot(dates, closes, label=ticker)
+            trace.count("artists_created")
 
             if start_year and end_year:
-                highlight = df[(df['date'].dt.year >= start_year) & (df['date'].dt.year <= end_year)]
-                self.ax.plot(highlight['date'], highlight['close'], color='orange', linewidth=2, label='Highlighted Range')
-
+                trace.stage("filter")
+                highlight = results.get(*tasks['window'])
+                trace.count("rows_scanned", highlight['rows_scanned'])
+                trace.stage("artists")
+                self.ax.plot(highlight['dates'], highlight['closes'], color='orange', linewidth=2,
+                             label='Highlighted Range')
+                trace.count("artists_created")
+            trace.count("result_cache_hits", results.hits - hits)
+
+            spikes = None
+            if overlays and ticker in analytics:
+                trace.stage("overlays")
+                spikes = self.plot_overlays(ticker, overlays)
+                trace.count("artists_created", len(overlays))
+
+            if "Forecast" in overlays:
+                trace.stage("forecast")
+                self.plot_forecast(ticker, end_year)
+
+            trace.stage("events")
             self.plot_market_events(start_year, end_year)
+            trace.count("artists_created", 2 if self.event_overlay else 0)
+            trace.stage("labels")
             self.ax.set_xlabel("Date")
             self.ax.set_ylabel("Closing Price")
             self.ax.set_title(f"Closing Prices for {company_name} ({ticker})")
             self.ax.legend()
-            plt.tight_layout()
+            trace.stage("tight_layout")
+            self.figure.tight_layout()
 
+            trace.stage("cursor")
             if self.price_cursor is not None:
                 self.price_cursor.remove()
 
-            self.price_cursor = mplcursors.cursor(line, hover=True)
+            import mplcursors  # Imported on first plot, keeping it off the startup path
+            self.price_cursor = mplcursors.cursor([line] if spikes is None else [line, spikes[0]], hover=True)
             @self.price_cursor.connect("add")
             def on_add(sel):
                 date = mdates.num2date(sel.target[0])
                 price = sel.target[1]
-                sel.annotation.set_text(f'Date: {date.strftime("%Y-%m-%d")}\nPrice: ${price:.2f}')
+                text = f'Date: {date.strftime("%Y-%m-%d")}\nPrice: ${price:.2f}'
+                if spikes is not None and sel.artist is spikes[0]:
+                    text += f'\nVolume: {spikes[1][sel.index]:.1f}x its {VOLUME_BASELINE_WINDOW}-day baseline'
+                sel.annotation.set_text(text)
                 sel.annotation.get_bbox_patch().set(fc="yellow", alpha=0.8)
 
+            trace.stage("draw")
             self.draw()
+        trace.end()
+
+    def plot_overlays(self, ticker, overlays):
+        """Draw the chosen analytics over the closes; returns the volume spike markers and their ratios"""
+        daily = analytics.frame(ticker)
+        spikes = None
+        if "ATR band" in overlays:
+            self.ax.fill_between(daily['date'], daily['close'] - daily['atr'], daily['close'] + daily['atr'],
+                                 color='gray', alpha=0.25, linewidth=0, label=f"Close ± {ATR_WINDOW}-day ATR")
+        if "VWAP" in overlays:
+            self.ax.plot(daily['date'], daily['vwap'], color='purple', linewidth=1, linestyle='--',
+                         label=f"{VWAP_WINDOW}-day VWAP")
+        if "Volume spikes" in overlays:
+            days = daily[daily['abnormal_volume'] >= VOLUME_SPIKE_RATIO]
+            markers = self.ax.scatter(days['date'], days['close'], s=20, color='black', marker='^', zorder=3,
+                                      label=f"Volume ≥ {VOLUME_SPIKE_RATIO:g}x baseline")
+            spikes = (markers, days['abnormal_volume'].to_numpy())
+        return spikes
+
+    def plot_forecast(self, ticker, end_year=None):
+        """Percentile fan of simulated prices after the highlighted range, bootstrapped from the history before it"""
+        try:
+            fan, start_price = results.get(*view_tasks(ticker, None, end_year, ("Forecast",))['forecast'])
+        except ValueError as e:
+            print(f"Error simulating {ticker}: {e}")
+            return
 
-    def plot_market_events(self, start_year=None, end_year=None):
-        for span in self.event_spans:
-            span.remove()
-        self.event_spans = []
+        # Bands from the outermost percentiles in, darker towards the median
+        n_bands = len(PERCENTILES) // 2
+        for i in range(n_bands):
+            low, high = PERCENTILES[i], PERCENTILES[-1 - i]
+            self.ax.fill_between(fan['date'], fan[f'p{low}'] * start_price, fan[f'p{high}'] * start_price,
+                                 color='tab:blue', alpha=0.15 * (i + 1), linewidth=0,
+                                 label=f"{HORIZON_DAYS}-day forecast, p{low}-p{high}")
+        if len(PERCENTILES) % 2:
+            median = PERCENTILES[n_bands]
+            self.ax.plot(fan['date'], fan[f'p{median}'] * start_price, color='tab:blue', linestyle=':',
+                         label=f"Forecast p{median}")
 
-        for line in self.event_lines:
-            line.remove()
-        self.event_lines = []
-        self.event_artists = []
+    def plot_market_events(self, start_year=None, end_year=None):
+        if self.event_overlay is not None:
+            self.event_overlay.remove()
+            self.event_overlay = None
 
         if market_events.empty:
             return
@@ -112,40 +247,14 @@ class StockPlotCanvas(FigureCanvas):
                 (market_events['End Date'].dt.year >= start_year)
             ]
 
-        for _, event in filtered_events.iterrows():
-            if event['Start Date'] == event['End Date']:
-                line = self.ax.axvline(x=event['Start Date'], color='red', linestyle='--', alpha=0.3)
-                self.event_lines.append(line)
-                self.event_artists.append((line, event))
-            else:
-                span = self.ax.axvspan(event['Start Date'], event['End Date'], alpha=0.2, color='red')
-                self.event_spans.append(span)
-                self.event_artists.append((span, event))
-
-        if self.event_cursor is not None:
-            self.event_cursor.remove()
-
-        self.event_cursor = mplcursors.cursor([artist for artist, _ in self.event_artists], hover=True)
-        @self.event_cursor.connect("add")
-        def on_add(sel):
-            for artist, event in self.event_artists:
-                if artist == sel.artist:
-                    if event['Start Date'] == event['End Date']:
-                        sel.annotation.set_text(f"Event: {event['Event']}\nDate: {event['Start Date'].strftime('%Y-%m-%d')}")
-                    else:
-                        sel.annotation.set_text(f"Event: {event['Event']}\nPeriod: {event['Start Date'].strftime('%Y-%m-%d')} to\n        {event['End Date'].strftime('%Y-%m-%d')}")
-                    sel.annotation.get_bbox_patch().set(fc="white", alpha=0.9)
-                    break
+        # One collection per kind of event, hovered through an interval index on the dates
+        self.event_overlay = EventOverlay(self.ax, filtered_events, span_color='red', span_alpha=0.2,
+                                          line_color='red', line_alpha=0.3)
 
+    @instrumentation.traced("visual1.calculate_cumulative_gain")
     def calculate_cumulative_gain(self, ticker, start_year, end_year):
         if ticker in stock_data:
-            df = stock_data[ticker]
-            selected_data = df[(df['date'].dt.year >= start_year) & (df['date'].dt.year <= end_year)]
-            if not selected_data.empty:
-                start_price = selected_data['close'].iloc[0]
-                end_price = selected_data['close'].iloc[-1]
-                cumulative_gain = ((end_price - start_price) / start_price) * 100
-                return cumulative_gain
+            return results.get(*view_tasks(ticker, start_year, end_year)['window'])['cumulative_gain']
         return None
 
 class StockViewerApp(QMainWindow):
@@ -186,31 +295,104 @@ class StockViewerApp(QMainWindow):
         self.year_layout.addWidget(self.end_year_spinbox)
         self.year_layout.addWidget(self.cumulative_gain_label)
 
+        # Volume and range analytics drawn over the prices
+        self.overlay_layout = QHBoxLayout()
+        self.overlay_layout.addWidget(QLabel("Overlays:"))
+        self.overlay_checkboxes = []
+        for name in overlay_names:
+            checkbox = QCheckBox(name, self)
+            checkbox.toggled.connect(self.update_plot)
+            self.overlay_layout.addWidget(checkbox)
+            self.overlay_checkboxes.append(checkbox)
+        self.overlay_layout.addStretch()
+
         self.plot_canvas = StockPlotCanvas(self, width=8, height=6)
         self.toolbar = NavigationToolbar2QT(self.plot_canvas, self)
 
         self.layout.addLayout(self.ticker_layout)
         self.layout.addLayout(self.year_layout)
+        self.layout.addLayout(self.overlay_layout)
         self.layout.addWidget(self.toolbar)
         self.layout.addWidget(self.plot_canvas)
         self.main_widget.setLayout(self.layout)
         self.setCentralWidget(self.main_widget)
+        self.hud = instrumentation.attach_hud(self.plot_canvas)
+
+        self.current_view = None
+        self.prerender_queue = []
+        self.prerender_timer = QTimer(self)
+        self.prerender_timer.setSingleShot(True)
+        self.prerender_timer.timeout.connect(self.prerender_next)
         self.update_plot()
 
     def update_plot(self):
+        # The user acted; background work for the previous view's neighbours gives way
+        prefetcher.cancel()
+        self.prerender_timer.stop()
+        self.prerender_queue = []
         selected_text = self.ticker_dropdown.currentText()
         ticker, company_name = selected_text.split(" - ")
         start_year = self.start_year_spinbox.value()
         end_year = self.end_year_spinbox.value()
 
-        self.plot_canvas.plot_stock(ticker, start_year, end_year, company_name)
+        trace = instrumentation.pipeline("visual1.update_plot")
+        trace.stage("plot")
+        overlays = tuple(checkbox.text() for checkbox in self.overlay_checkboxes if checkbox.isChecked())
+        self.current_view = (ticker, start_year, end_year, company_name, overlays)
+        self.plot_canvas.plot_stock(*self.current_view)
 
+        trace.stage("cumulative_gain")
         cumulative_gain = self.plot_canvas.calculate_cumulative_gain(ticker, start_year, end_year)
         if cumulative_gain is not None:
             self.cumulative_gain_label.setText(f"Cumulative Gain: {cumulative_gain:.2f}%")
         else:
             self.cumulative_gain_label.setText("Cumulative Gain: N/A")
 
+        trace.stage("prefetch")
+        self.prefetch_neighbours(start_year, end_year, overlays)
+        trace.end()
+
+    def prefetch_neighbours(self, start_year, end_year, overlays):
+        """Queue the views most likely next: the adjacent tickers, then one year more or less.
+
+        Their data is built by the background prefetcher; once a view's data
+        is ready it is also drawn ahead into the render cache.
+        """
+        index = self.ticker_dropdown.currentIndex()
+        ticker, company_name = self.ticker_dropdown.currentText().split(" - ")
+        views = []
+        for i in (index + 1, index - 1):
+            if 0 <= i < self.ticker_dropdown.count():
+                neighbour, neighbour_name = self.ticker_dropdown.itemText(i).split(" - ")
+                views.append((neighbour, start_year, end_year, neighbour_name, overlays))
+        lowest, highest = self.start_year_spinbox.minimum(), self.end_year_spinbox.maximum()
+        for start, end in ((start_year, end_year - 1), (start_year, end_year + 1),
+                           (start_year + 1, end_year), (start_year - 1, end_year)):
+            if lowest <= start <= end <= highest:
+                views.append((ticker, start, end, company_name, overlays))
+        prefetcher.schedule([task for view in views
+                             for task in view_tasks(view[0], view[1], view[2], overlays).values()])
+        self.prerender_queue = views
+        self.prerender_timer.start(PRERENDER_DELAY_MS)
+
+    def prerender_next(self):
+        """Draw the next queued view whose data is ready, then put the current view back from the render cache.
+
+        Both happen before Qt repaints, so the neighbour never shows; a view
+        whose data is still being prefetched is retried on a later tick.
+        """
+        ready = [view for view in self.prerender_queue
+                 if all(key in results for key, _ in view_tasks(view[0], view[1], view[2], view[4]).values())]
+        if ready:
+            self.prerender_queue.remove(ready[0])
+            try:
+                self.plot_canvas.plot_stock(*ready[0])
+            except Exception as e:
+                print(f"Error drawing ahead {ready[0][0]}: {str(e)}")
+            self.plot_canvas.plot_stock(*self.current_view)
+        if self.prerender_queue:
+            self.prerender_timer.start(PRERENDER_DELAY_MS)
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     viewer = StockViewerApp()
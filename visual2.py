@@ -1,62 +1,30 @@
 import sys
-import mplcursors
-import pandas as pd
 import matplotlib.pyplot as plt
-from PyQt6.QtWidgets import QApplication, QMainWindow, QComboBox, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox
+from PyQt6.QtWidgets import QApplication, QMainWindow, QComboBox, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QLineEdit
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import numpy as np
 import matplotlib.dates as mdates
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+import instrumentation
+import render_cache
+from stock_store import shared_data, ticker_company_map
 
-# Define the ticker to company name mapping
-ticker_company_map = {
-    "AAPL": "Apple", "ABBV": "AbbVie", "AVGO": "Broadcom", "BAC": "Bank of America",
-    "BRK.A": "Berkshire Hathaway A", "BRK.B": "Berkshire Hathaway B", "COST": "Costco",
-    "GOOGL": "Alphabet", "HD": "Home Depot", "JNJ": "Johnson & Johnson", "JPM": "JPMorgan Chase",
-    "LLY": "Eli Lilly", "MA": "MasterCard", "META": "Meta Platforms", "MSFT": "Microsoft",
-    "NFLX": "Netflix", "NVDA": "NVIDIA", "ORCL": "Oracle", "PG": "Procter & Gamble",
-    "TSLA": "Tesla", "UNH": "UnitedHealth", "V": "Visa", "WMT": "Walmart", "XOM": "ExxonMobil"
-}
-
-# Define a dictionary to store DataFrames for each stock
-stock_data = {}
-
-stock_metadata = pd.read_excel("CS 439 final project data/top_25_us_stocks.xlsx")
-
-# List of stock tickers and their respective CSV file paths
-tickers = ["AAPL", "ABBV", "AVGO", "BAC", "BRK.A", "BRK.B", "COST", "GOOGL", "HD", "JNJ", "JPM", "LLY", "MA", "META",
-           "MSFT", "NFLX", "NVDA", "ORCL", "PG", "TSLA", "UNH", "V", "WMT", "XOM"]
-file_paths = [
-    "CS 439 final project data/MacroTrends_Data_Download_AAPL.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_ABBV.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_AVGO.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_BAC.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_BRK.A.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_BRK.B.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_COST.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_GOOGL.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_HD.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_JNJ.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_JPM.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_LLY.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_MA.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_META.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_MSFT.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_NFLX.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_NVDA.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_ORCL.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_PG.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_TSLA.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_UNH.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_V.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_WMT.csv",
-    "CS 439 final project data/MacroTrends_Data_Download_XOM.csv"
-]
-
-# Load each CSV file into a DataFrame and store it in the dictionary
-for ticker, file_path in zip(tickers, file_paths):
-    stock_data[ticker] = pd.read_csv(file_path)
-    stock_data[ticker]['date'] = pd.to_datetime(stock_data[ticker]['date'])
+# Prices and metadata are loaded once per process and shared with the other views
+shared = shared_data()
+stock_data = dict(shared.stock_data)
+stock_metadata = shared.stock_metadata
+
+# Builds sector and state composites of the filtered stocks on demand
+index_builder = shared.index_builder
+
+# Answers queries over per-year and per-event statistics without touching the daily data
+screener = shared.screener
+
+# Year-partitioned prices on disk; a year range opens only that range's partitions
+partitions = shared.partitions
+
+# Fields the filtered stocks can be grouped into composite indices by
+group_modes = {"Stocks": None, "Sector indices": 'Sector', "State indices": 'Headquarters State'}
 
 class StockPlotCanvas(FigureCanvas):
     def __init__(self, parent=None, width=10, height=8, dpi=100):
@@ -67,8 +35,17 @@ class StockPlotCanvas(FigureCanvas):
         self.setParent(parent)
         self.price_cursors = None
         self.line_data = {}
-
-    def plot_stocks(self, tickers, start_year=None, end_year=None):
+        self.render_cache = render_cache.CanvasCache(self, state={'price_cursors': None, 'line_data': {}})
+
+    def plot_stocks(self, tickers, start_year=None, end_year=None, filters=None):
+        trace = instrumentation.pipeline("visual2.plot_stocks")
+        trace.stage("cache")
+        # filters decide what index pseudo-tickers contain, so they are part of the view
+        if self.render_cache.restore(tickers=tickers, start_year=start_year, end_year=end_year, filters=filters):
+            trace.count("cache_hits")
+            trace.end()
+            return
+        trace.stage("clear")
         self.ax.clear()
         self.line_data.clear()
 
@@ -83,12 +60,21 @@ class StockPlotCanvas(FigureCanvas):
 
         for ticker in tickers:
             if ticker in stock_data:
-                df = stock_data[ticker]
-                selected_data = df[(df['date'].dt.year >= start_year) & (df['date'].dt.year <= end_year)]
+                trace.stage("filter")
+                if ticker in partitions:
+                    selected_data = partitions.read_years(ticker, start_year, end_year)
+                    trace.count("rows_scanned", len(selected_data))
+                else:
+                    df = stock_data[ticker]
+                    selected_data = df[(df['date'].dt.year >= start_year) & (df['date'].dt.year <= end_year)]
+                    trace.count("rows_scanned", len(df))
                 if not selected_data.empty:
                     data_plotted = True
+                    trace.stage("artists")
                     line, = self.ax.plot(selected_data['date'], selected_data['close'], label=ticker)
+                    trace.count("artists_created")
 
+                    trace.stage("compute")
                     initial_price = selected_data['close'].iloc[0]
                     final_price = selected_data['close'].iloc[-1]
                     cumulative_return = (final_price - initial_price) / initial_price * 100
@@ -115,6 +101,8 @@ class StockPlotCanvas(FigureCanvas):
                     lines.append(line)
 
         if data_plotted:
+            trace.stage("cursor")
+            import mplcursors  # Imported on first plot, keeping it off the startup path
             self.price_cursors = mplcursors.cursor(
                 lines,
                 hover=True,
@@ -139,6 +127,7 @@ class StockPlotCanvas(FigureCanvas):
                         f'Potential Gain: {data["potential_gain"]:.2f}% if bought low & sold high'
                     )
 
+            trace.stage("labels")
             self.ax.set_xlabel("Date")
             self.ax.set_ylabel("Closing Price")
             self.ax.set_title("Closing Prices for Selected Stocks")
@@ -146,7 +135,9 @@ class StockPlotCanvas(FigureCanvas):
         else:
             self.ax.set_title("No data available for selected criteria")
 
+        trace.stage("draw")
         self.draw()
+        trace.end()
 
 # Rest of the code remains the same...
 class StockViewerApp(QMainWindow):
@@ -161,8 +152,19 @@ class StockViewerApp(QMainWindow):
         self.filter_layout = QHBoxLayout()
         self.ticker_layout = QHBoxLayout()
         self.year_layout = QHBoxLayout()
+        self.screen_layout = QHBoxLayout()
         self.setMinimumSize(1000, 800)
 
+        # Plot the filtered stocks or their group indices
+        self.group_dropdown = QComboBox(self)
+        self.group_dropdown.addItems(group_modes)
+        self.weighting_dropdown = QComboBox(self)
+        self.weighting_dropdown.addItems(["cap", "equal"])
+        self.ticker_layout.addWidget(QLabel("Show:"))
+        self.ticker_layout.addWidget(self.group_dropdown)
+        self.ticker_layout.addWidget(QLabel("Index Weighting:"))
+        self.ticker_layout.addWidget(self.weighting_dropdown)
+
         # Dropdowns for filtering
         self.sector_dropdown = QComboBox(self)
         self.state_dropdown = QComboBox(self)
@@ -197,12 +199,24 @@ class StockViewerApp(QMainWindow):
         self.year_layout.addWidget(QLabel("End Year:"))
         self.year_layout.addWidget(self.end_year_spinbox)
 
+        # Screener query over precomputed per-year and per-event statistics
+        self.screen_edit = QLineEdit(self)
+        self.screen_edit.setPlaceholderText("e.g. change > 50 in 2020 and drawdown < 30 during COVID-19")
+        self.screen_status = QLabel("")
+        self.screen_query = ""
+        self.screen_layout.addWidget(QLabel("Screen:"))
+        self.screen_layout.addWidget(self.screen_edit)
+        self.screen_layout.addWidget(self.screen_status)
+
         # Connect dropdown changes to plot update
         self.sector_dropdown.currentTextChanged.connect(self.update_plot)
         self.state_dropdown.currentTextChanged.connect(self.update_plot)
         self.location_dropdown.currentTextChanged.connect(self.update_plot)
+        self.group_dropdown.currentTextChanged.connect(self.update_plot)
+        self.weighting_dropdown.currentTextChanged.connect(self.update_plot)
         self.start_year_spinbox.valueChanged.connect(self.update_plot)
         self.end_year_spinbox.valueChanged.connect(self.update_plot)
+        self.screen_edit.editingFinished.connect(self.on_screen_edited)
 
         # Matplotlib canvas and toolbar
         self.plot_canvas = StockPlotCanvas(self, width=10, height=8)
@@ -210,11 +224,14 @@ class StockViewerApp(QMainWindow):
 
         # Add layouts and widgets to the main layout
         self.layout.addLayout(self.filter_layout)
+        self.layout.addLayout(self.ticker_layout)
         self.layout.addLayout(self.year_layout)
+        self.layout.addLayout(self.screen_layout)
         self.layout.addWidget(self.toolbar)
         self.layout.addWidget(self.plot_canvas)
         self.main_widget.setLayout(self.layout)
         self.setCentralWidget(self.main_widget)
+        self.hud = instrumentation.attach_hud(self.plot_canvas)
 
         # Initial plot
         self.update_plot()
@@ -230,13 +247,51 @@ class StockViewerApp(QMainWindow):
             filtered_data = filtered_data[
                 filtered_data['Headquarters Location'] == self.location_dropdown.currentText()]
 
-        return filtered_data['Ticker'].tolist()
+        return self.apply_screen(filtered_data['Ticker'].tolist())
+
+    def filter_state(self):
+        return {
+            'sector': self.sector_dropdown.currentText(),
+            'state': self.state_dropdown.currentText(),
+            'location': self.location_dropdown.currentText(),
+            'group': self.group_dropdown.currentText(),
+            'weighting': self.weighting_dropdown.currentText(),
+            'screen': self.screen_query
+        }
+
+    def apply_screen(self, tickers):
+        """Narrow tickers to those matching the screener query, if one is entered"""
+        if not self.screen_query:
+            self.screen_status.setText("")
+            return tickers
+        try:
+            matches = screener.query(self.screen_query, tickers)
+        except ValueError as e:
+            self.screen_status.setText(f"Error: {e}")
+            return tickers
+        self.screen_status.setText(f"{len(matches)} of {len(tickers)} stocks match")
+        return matches
+
+    def on_screen_edited(self):
+        if self.screen_edit.text().strip() != self.screen_query:
+            self.screen_query = self.screen_edit.text().strip()
+            self.update_plot()
 
     def update_plot(self):
         start_year = self.start_year_spinbox.value()
         end_year = self.end_year_spinbox.value()
+        trace = instrumentation.pipeline("visual2.update_plot")
+        trace.stage("filter_tickers")
         tickers = self.get_filtered_tickers()
-        self.plot_canvas.plot_stocks(tickers, start_year, end_year)
+        field = group_modes[self.group_dropdown.currentText()]
+        if field:
+            trace.stage("indices")
+            index_data = index_builder.group_frames(field, self.weighting_dropdown.currentText(), tickers)
+            stock_data.update(index_data)
+            tickers = list(index_data)
+        trace.stage("plot")
+        self.plot_canvas.plot_stocks(tickers, start_year, end_year, self.filter_state())
+        trace.end()
 
 
 def main():
@@ -1,31 +1,46 @@
 import sys
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QComboBox, QWidget, QVBoxLayout,
-                             QHBoxLayout, QLabel, QSpinBox, QDoubleSpinBox, QToolTip)
+                             QHBoxLayout, QLabel, QSpinBox, QDoubleSpinBox, QToolTip, QLineEdit)
 from PyQt6.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
 from matplotlib import colors as mcolors
+from matplotlib.collections import PolyCollection
+from matplotlib.patches import Patch
+import instrumentation
+import render_cache
+from stock_store import shared_data
 
-# Define a dictionary to store DataFrames for each stock
-stock_data = {}
-stock_metadata = pd.read_excel("CS 439 final project data/top_25_us_stocks.xlsx")
+# Date-indexed prices and metadata are loaded once per process and shared with the other views
+shared = shared_data()
+stock_data = dict(shared.indexed_data)
+stock_metadata = shared.stock_metadata
 
-# Convert market cap strings to numeric values
-stock_metadata['Market Cap'] = stock_metadata['Market Cap'].str.extract(r'(\d+\.?\d*)').astype(float)
+# Builds sector and state composites of the filtered stocks on demand
+index_builder = shared.index_builder
 
-# Load each stock's data
-tickers = ["AAPL", "ABBV", "AVGO", "BAC", "BRK.A", "BRK.B", "COST", "GOOGL", "HD", "JNJ", "JPM", "LLY", "MA", "META",
-           "MSFT", "NFLX", "NVDA", "ORCL", "PG", "TSLA", "UNH", "V", "WMT", "XOM"]
-file_paths = [f"CS 439 final project data/MacroTrends_Data_Download_{ticker}.csv" for ticker in tickers]
-for ticker, file_path in zip(tickers, file_paths):
-    df = pd.read_csv(file_path)
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-    stock_data[ticker] = df
+# Answers queries over per-year and per-event statistics without touching the daily data
+screener = shared.screener
 
+# Year-partitioned prices on disk; the catalog holds every year-end close, so
+# yearly changes of stored tickers are computed without opening a partition
+partitions = shared.partitions
 
+# Fields the filtered stocks can be grouped into composite indices by
+group_modes = {"Stocks": None, "Sector indices": 'Sector', "State indices": 'Headquarters State'}
+
+# Chart types; Auto switches from grouped bars to a heatmap above HEATMAP_MIN_TICKERS
+chart_modes = ["Auto", "Grouped bars", "Heatmap"]
+HEATMAP_MIN_TICKERS = 40
+
+# Spacing of the heatmap's ticker labels as a multiple of their font size; when
+# the rows are closer than this only every nth ticker is labelled
+HEATMAP_LABEL_SPACING = 1.4
+
+
+@instrumentation.traced("visual3.calculate_yearly_percentage_change")
 def calculate_yearly_percentage_change(df):
     df = df.resample('Y').last()
     df['yearly_pct_change'] = df['close'].pct_change() * 100
@@ -61,6 +76,7 @@ class YearlyChangePlotCanvas(FigureCanvas):
             alpha=0.8,
             zorder=100
         )
+        self.render_cache = render_cache.CanvasCache(self, state={'bars_data': {}, 'current_annotation': None})
 
     def mouseMoveEvent(self, event):
         """Handle Qt mouse move events with custom annotation bubbles"""
@@ -80,34 +96,7 @@ class YearlyChangePlotCanvas(FigureCanvas):
             # Convert to data coordinates
             data_x, data_y = self.ax.transData.inverted().transform((x_rel, height - y_rel))
 
-            # Find the bar at the cursor position
-            found_bar = None
-            closest_distance = float('inf')
-
-            for bar in self.ax.patches:
-                if bar in self.bars_data:
-                    bar_x = bar.get_x()
-                    bar_width = bar.get_width()
-                    bar_height = bar.get_height()
-                    bar_y = bar.get_y()
-
-                    # Calculate center of the bar
-                    bar_center_x = bar_x + bar_width / 2
-
-                    # Check if cursor is within reasonable distance of the bar
-                    x_distance = abs(data_x - bar_center_x)
-
-                    if x_distance < bar_width / 2:  # Within bar width
-                        # For positive bars
-                        if bar_height >= 0 and data_y <= (bar_y + bar_height) and data_y >= bar_y:
-                            if x_distance < closest_distance:
-                                found_bar = bar
-                                closest_distance = x_distance
-                        # For negative bars
-                        elif bar_height < 0 and data_y >= (bar_y + bar_height) and data_y <= bar_y:
-                            if x_distance < closest_distance:
-                                found_bar = bar
-                                closest_distance = x_distance
+            found = self.find_hover(data_x, data_y)
 
             # Remove existing annotation if it exists
             if self.current_annotation:
@@ -115,9 +104,8 @@ class YearlyChangePlotCanvas(FigureCanvas):
                 self.current_annotation = None
                 self.draw_idle()
 
-            if found_bar:
-                # Get data for the found bar
-                ticker, year, yearly_change, cum_return = self.bars_data[found_bar]
+            if found is not None:
+                ticker, year, yearly_change, cum_return, xy, va = found
 
                 # Get company name from the mapping
                 company_name = self.ticker_company_map.get(ticker, "Unknown Company")
@@ -130,23 +118,7 @@ class YearlyChangePlotCanvas(FigureCanvas):
                     f"Yearly Change: {yearly_change:.1f}%\n"
                     f"Cumulative Return: {cum_return:.1f}%"
                 )
-
-                # Get bar properties for positioning
-                bar_x = found_bar.get_x()
-                bar_width = found_bar.get_width()
-                bar_y = found_bar.get_y()
-                bar_height = found_bar.get_height()
-                bar_center = bar_x + bar_width / 2
-
-                # Position tooltip close to cursor but ensure it's anchored to the bar
-                if bar_height >= 0:
-                    xy = (bar_center, bar_y + bar_height)
-                    xytext = (0, 10)  # Reduced vertical offset
-                    va = 'bottom'
-                else:
-                    xy = (bar_center, bar_y + bar_height)
-                    xytext = (0, -10)  # Reduced vertical offset
-                    va = 'top'
+                xytext = (0, 10) if va == 'bottom' else (0, -10)
 
                 # Create the annotation with arrow
                 self.current_annotation = self.ax.annotate(
@@ -172,6 +144,32 @@ class YearlyChangePlotCanvas(FigureCanvas):
         except Exception as e:
             print(f"Error in mouseMoveEvent: {e}")
 
+    def find_hover(self, data_x, data_y):
+        """Ticker, year, changes, anchor point and alignment of the bar or cell under data_x, data_y"""
+        hover = self.bars_data
+        if not hover:
+            return None
+        if hover['mode'] == "Heatmap":
+            row, col = int(round(data_y)), int(round(data_x))
+            if not (0 <= row < len(hover['tickers']) and 0 <= col < len(hover['years'])):
+                return None
+            if not np.isfinite(hover['change'][row, col]):
+                return None
+            return (hover['tickers'][row], hover['years'][col], hover['change'][row, col],
+                    hover['cumulative'][row, col], (col, row), 'bottom')
+
+        # Bars span [center - width/2, center + width/2] and [0, height] or [height, 0]
+        heights = hover['heights']
+        distance = np.abs(data_x - hover['centers'])
+        inside = np.flatnonzero((distance < hover['width'] / 2) &
+                                (data_y >= np.minimum(heights, 0)) & (data_y <= np.maximum(heights, 0)))
+        if not len(inside):
+            return None
+        i = inside[np.argmin(distance[inside])]
+        row, col = hover['rows'][i], hover['cols'][i]
+        return (hover['tickers'][row], hover['years'][col], heights[i], hover['cumulative'][row, col],
+                (hover['centers'][i], heights[i]), 'bottom' if heights[i] >= 0 else 'top')
+
     def leaveEvent(self, event):
         """Handle mouse leaving the widget"""
         if self.current_annotation:
@@ -180,10 +178,19 @@ class YearlyChangePlotCanvas(FigureCanvas):
             self.draw_idle()
         super().leaveEvent(event)
 
-    def plot_yearly_changes(self, tickers, start_year=None, end_year=None):
-        """Plot a grouped bar chart for yearly price changes with tooltips."""
+    def plot_yearly_changes(self, tickers, start_year=None, end_year=None, filters=None, mode="Auto"):
+        """Plot yearly price changes as grouped bars or a ticker x year heatmap, with tooltips."""
+        trace = instrumentation.pipeline("visual3.plot_yearly_changes")
+        trace.stage("cache")
+        # filters decide what index pseudo-tickers contain, so they are part of the view
+        if self.render_cache.restore(tickers=tickers, start_year=start_year, end_year=end_year, filters=filters,
+                                     mode=mode):
+            trace.count("cache_hits")
+            trace.end()
+            return
+        trace.stage("clear")
         self.ax.clear()
-        self.bars_data.clear()
+        self.bars_data = {}
 
         # Remove any existing annotation when replotting
         if self.current_annotation:
@@ -193,62 +200,118 @@ class YearlyChangePlotCanvas(FigureCanvas):
         yearly_changes = []
 
         # Collect yearly percentage changes for each ticker
+        trace.stage("compute")
         for ticker in tickers:
-            if ticker in stock_data:
+            if ticker in partitions:
+                df = calculate_yearly_percentage_change(partitions.year_end_closes(ticker))
+            elif ticker in stock_data:
+                trace.count("rows_scanned", len(stock_data[ticker]))
                 df = calculate_yearly_percentage_change(stock_data[ticker])
-                df = df[(df.index.year >= start_year) & (df.index.year <= end_year)]
-                if not df.empty:
-                    yearly_changes.append((ticker, df))
+            else:
+                continue
+            df = df[(df.index.year >= start_year) & (df.index.year <= end_year)]
+            if not df.empty:
+                yearly_changes.append((ticker, df))
 
         if yearly_changes:
-            # Prepare data for plotting
-            years = sorted(set(year for _, data in yearly_changes for year in data.index.year))
-            n_tickers = len(yearly_changes)
-            bar_width = 0.8 / n_tickers
-            offsets = [(i - n_tickers / 2) * bar_width for i in range(n_tickers)]
-
-            # Use a color cycle and hatch patterns
-            color_cycle = plt.cm.tab20.colors  # Choose a color map with many distinct colors
-            hatches = ['', '/', '\\', '|', '-', '+', 'x', 'o', 'O', '.', '*']  # List of hatch patterns
-            color_count = len(color_cycle)
-            hatch_count = len(hatches)
-
-            # Plot each ticker's yearly changes
-            for i, (offset, (ticker, data)) in enumerate(zip(offsets, yearly_changes)):
-                data = data.dropna()
-                x_positions = [years.index(year) + offset for year in data.index.year]
-
-                # Cycle through colors and patterns
-                color = color_cycle[i % color_count]
-                hatch = hatches[i % hatch_count] if i >= color_count else None
-
-                bars = self.ax.bar(x_positions, data['yearly_pct_change'].values,
-                                   width=bar_width, label=ticker, color=color, hatch=hatch)
-
-                # Store bar data for tooltips
-                for bar, year, yearly_change, cum_return in zip(bars, data.index.year,
-                                                                data['yearly_pct_change'],
-                                                                data['cumulative_return']):
-                    self.bars_data[bar] = (ticker, year, yearly_change, cum_return)
-
+            # Ticker x year matrices of the changes, missing years left as NaN
+            years = np.array(sorted(set(year for _, data in yearly_changes for year in data.index.year)))
+            change = np.full((len(yearly_changes), len(years)), np.nan)
+            cumulative = np.full_like(change, np.nan)
+            for row, (_, data) in enumerate(yearly_changes):
+                cols = np.searchsorted(years, data.index.year)
+                change[row, cols] = data['yearly_pct_change'].to_numpy()
+                cumulative[row, cols] = data['cumulative_return'].to_numpy()
+            names = [ticker for ticker, _ in yearly_changes]
+            if mode == "Auto":
+                mode = "Heatmap" if len(names) >= HEATMAP_MIN_TICKERS else "Grouped bars"
+
+            trace.stage("artists")
+            if mode == "Heatmap":
+                self.plot_heatmap(names, years, change)
+            else:
+                self.plot_grouped_bars(names, years, change, trace)
+            self.bars_data.update(mode=mode, tickers=names, years=years.tolist(), change=change,
+                                  cumulative=cumulative)
+
+            trace.stage("labels")
             self.ax.set_xticks(range(len(years)))
             self.ax.set_xticklabels(years, rotation=45)
             self.ax.set_xlabel("Year")
-            self.ax.set_ylabel("Yearly % Change")
             self.ax.set_title("Yearly Price Change by Ticker")
 
-            # Add grid for better readability
-            self.ax.grid(True, linestyle='--', alpha=0.7)
-
-            # Place legend outside the plot on the right
-            self.ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-
             # Adjust layout to prevent legend cutoff
-            plt.tight_layout()
+            trace.stage("tight_layout")
+            self.fig.tight_layout()
         else:
             self.ax.set_title("No data available for selected criteria")
 
+        trace.stage("draw")
         self.draw()
+        trace.end()
+
+    def plot_grouped_bars(self, names, years, change, trace):
+        """Every ticker-year bar in one PolyCollection per hatch pattern"""
+        n_tickers = len(names)
+        bar_width = 0.8 / n_tickers
+
+        # Use a color cycle and hatch patterns
+        color_cycle = plt.cm.tab20.colors  # Choose a color map with many distinct colors
+        hatches = ['', '/', '\\', '|', '-', '+', 'x', 'o', 'O', '.', '*']  # List of hatch patterns
+        color_count = len(color_cycle)
+        hatch_count = len(hatches)
+
+        # Bar positions: one group per year, one slot per ticker within it
+        rows, cols = np.nonzero(np.isfinite(change))
+        heights = change[rows, cols]
+        centers = cols + (rows - n_tickers / 2) * bar_width
+        verts = np.empty((len(rows), 4, 2))
+        verts[:, :, 0] = centers[:, None] + np.array([-0.5, -0.5, 0.5, 0.5]) * bar_width
+        verts[:, :, 1] = np.column_stack([np.zeros_like(heights), heights, heights, np.zeros_like(heights)])
+        colors = np.array(color_cycle)[rows % color_count]
+
+        # Tickers past the end of the color cycle are told apart by hatching
+        hatch_keys = np.where(rows >= color_count, rows % hatch_count, -1)
+        for key in np.unique(hatch_keys):
+            members = hatch_keys == key
+            bars = PolyCollection(verts[members], facecolors=colors[members], edgecolors='none',
+                                  hatch=hatches[key] if key >= 0 else None)
+            bars.sticky_edges.y.append(0)
+            self.ax.add_collection(bars)
+            trace.count("artists_created")
+        self.ax.autoscale_view()
+        self.bars_data.update(rows=rows, cols=cols, centers=centers, heights=heights, width=bar_width)
+
+        self.ax.set_ylabel("Yearly % Change")
+
+        # Add grid for better readability
+        self.ax.grid(True, linestyle='--', alpha=0.7)
+
+        # Place legend outside the plot on the right
+        handles = [Patch(facecolor=color_cycle[i % color_count], label=ticker,
+                         hatch=hatches[i % hatch_count] if i >= color_count else None)
+                   for i, ticker in enumerate(names)]
+        self.ax.legend(handles=handles, bbox_to_anchor=(1.05, 1), loc='upper left')
+
+    def plot_heatmap(self, names, years, change):
+        """Tickers as rows and years as columns, colored by yearly change around zero"""
+        # Color limits from the 2nd-98th percentiles so a few outliers don't wash out the rest
+        finite = change[np.isfinite(change)]
+        limit = max(np.percentile(np.abs(finite), 98), 1.0) if len(finite) else 1.0
+        cmap = plt.get_cmap('RdYlGn').copy()
+        cmap.set_bad('lightgray')
+        image = self.ax.imshow(np.ma.masked_invalid(change), cmap=cmap, aspect='auto', interpolation='nearest',
+                               norm=mcolors.TwoSlopeNorm(vmin=-limit, vcenter=0, vmax=limit))
+
+        fontsize = 8 if len(names) > 30 else 10
+        label_px = fontsize * HEATMAP_LABEL_SPACING * self.fig.dpi / 72
+        step = max(1, int(np.ceil(len(names) * label_px / max(self.ax.bbox.height, 1))))
+        self.ax.set_yticks(range(0, len(names), step))
+        self.ax.set_yticklabels(names[::step], fontsize=fontsize)
+        self.ax.set_ylabel("Ticker")
+
+        colorbar_ax = self.ax.inset_axes([1.02, 0, 0.02, 1])
+        self.fig.colorbar(image, cax=colorbar_ax, extend='both', label="Yearly % Change")
 
 
 class StockViewerApp(QMainWindow):
@@ -263,6 +326,7 @@ class StockViewerApp(QMainWindow):
         self.filter_layout = QHBoxLayout()
         self.market_cap_layout = QHBoxLayout()
         self.year_layout = QHBoxLayout()
+        self.screen_layout = QHBoxLayout()
 
         # Dropdowns for filtering
         self.sector_dropdown = QComboBox(self)
@@ -277,6 +341,14 @@ class StockViewerApp(QMainWindow):
         self.state_dropdown.addItems(sorted(stock_metadata['Headquarters State'].unique()))
         self.location_dropdown.addItems(sorted(stock_metadata['Headquarters Location'].unique()))
 
+        # Plot the filtered stocks or their group indices
+        self.group_dropdown = QComboBox(self)
+        self.group_dropdown.addItems(group_modes)
+        self.weighting_dropdown = QComboBox(self)
+        self.weighting_dropdown.addItems(["cap", "equal"])
+        self.chart_dropdown = QComboBox(self)
+        self.chart_dropdown.addItems(chart_modes)
+
         # Market Cap Range Filter with improved width
         self.min_market_cap = QDoubleSpinBox(self)
         self.max_market_cap = QDoubleSpinBox(self)
@@ -313,6 +385,12 @@ class StockViewerApp(QMainWindow):
         self.filter_layout.addWidget(self.state_dropdown)
         self.filter_layout.addWidget(QLabel("Location:"))
         self.filter_layout.addWidget(self.location_dropdown)
+        self.filter_layout.addWidget(QLabel("Show:"))
+        self.filter_layout.addWidget(self.group_dropdown)
+        self.filter_layout.addWidget(QLabel("Index Weighting:"))
+        self.filter_layout.addWidget(self.weighting_dropdown)
+        self.filter_layout.addWidget(QLabel("Chart:"))
+        self.filter_layout.addWidget(self.chart_dropdown)
 
         # Create a more organized market cap layout
         market_cap_label = QLabel("Market Cap Range ($B):")
@@ -338,14 +416,27 @@ class StockViewerApp(QMainWindow):
         self.year_layout.addWidget(QLabel("End Year:"))
         self.year_layout.addWidget(self.end_year_spinbox)
 
+        # Screener query over precomputed per-year and per-event statistics
+        self.screen_edit = QLineEdit(self)
+        self.screen_edit.setPlaceholderText("e.g. change > 50 in 2020 and drawdown < 30 during COVID-19")
+        self.screen_status = QLabel("")
+        self.screen_query = ""
+        self.screen_layout.addWidget(QLabel("Screen:"))
+        self.screen_layout.addWidget(self.screen_edit)
+        self.screen_layout.addWidget(self.screen_status)
+
         # Connect all filters to plot update
         self.sector_dropdown.currentTextChanged.connect(self.update_plot)
         self.state_dropdown.currentTextChanged.connect(self.update_plot)
         self.location_dropdown.currentTextChanged.connect(self.update_plot)
+        self.group_dropdown.currentTextChanged.connect(self.update_plot)
+        self.weighting_dropdown.currentTextChanged.connect(self.update_plot)
+        self.chart_dropdown.currentTextChanged.connect(self.update_plot)
         self.min_market_cap.valueChanged.connect(self.update_plot)
         self.max_market_cap.valueChanged.connect(self.update_plot)
         self.start_year_spinbox.valueChanged.connect(self.update_plot)
         self.end_year_spinbox.valueChanged.connect(self.update_plot)
+        self.screen_edit.editingFinished.connect(self.on_screen_edited)
 
         # Matplotlib canvas and toolbar
         self.plot_canvas = YearlyChangePlotCanvas(self, width=15, height=10)
@@ -355,10 +446,12 @@ class StockViewerApp(QMainWindow):
         self.layout.addLayout(self.filter_layout)
         self.layout.addLayout(self.market_cap_layout)
         self.layout.addLayout(self.year_layout)
+        self.layout.addLayout(self.screen_layout)
         self.layout.addWidget(self.toolbar)
         self.layout.addWidget(self.plot_canvas)
         self.main_widget.setLayout(self.layout)
         self.setCentralWidget(self.main_widget)
+        self.hud = instrumentation.attach_hud(self.plot_canvas)
 
         # Initial plot
         self.update_plot()
@@ -383,13 +476,56 @@ class StockViewerApp(QMainWindow):
             (filtered_data['Market Cap'] <= max_cap)
             ]
 
-        return filtered_data['Ticker'].tolist()
+        return self.apply_screen(filtered_data['Ticker'].tolist())
+
+    def filter_state(self, constituents):
+        """The stocks every filter resolved to, and how they are grouped into indices.
+
+        Index pseudo-tickers keep their names when their members change, so
+        the members themselves are part of the view.
+        """
+        return {
+            'constituents': constituents,
+            'group': self.group_dropdown.currentText(),
+            'weighting': self.weighting_dropdown.currentText()
+        }
+
+    def apply_screen(self, tickers):
+        """Narrow tickers to those matching the screener query, if one is entered"""
+        if not self.screen_query:
+            self.screen_status.setText("")
+            return tickers
+        try:
+            matches = screener.query(self.screen_query, tickers)
+        except ValueError as e:
+            self.screen_status.setText(f"Error: {e}")
+            return tickers
+        self.screen_status.setText(f"{len(matches)} of {len(tickers)} stocks match")
+        return matches
+
+    def on_screen_edited(self):
+        if self.screen_edit.text().strip() != self.screen_query:
+            self.screen_query = self.screen_edit.text().strip()
+            self.update_plot()
 
     def update_plot(self):
         start_year = self.start_year_spinbox.value()
         end_year = self.end_year_spinbox.value()
+        trace = instrumentation.pipeline("visual3.update_plot")
+        trace.stage("filter_tickers")
         tickers = self.get_filtered_tickers()
-        self.plot_canvas.plot_yearly_changes(tickers, start_year, end_year)
+        filters = self.filter_state(tickers)
+        field = group_modes[self.group_dropdown.currentText()]
+        if field:
+            trace.stage("indices")
+            index_data = index_builder.group_frames(field, self.weighting_dropdown.currentText(), tickers,
+                                                    index_by_date=True)
+            stock_data.update(index_data)
+            tickers = list(index_data)
+        trace.stage("plot")
+        self.plot_canvas.plot_yearly_changes(tickers, start_year, end_year, filters,
+                                             self.chart_dropdown.currentText())
+        trace.end()
 
 
 def main():
@@ -1,48 +1,57 @@
 import sys
-import mplcursors
 import pandas as pd
 import matplotlib.pyplot as plt
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
-                           QHBoxLayout, QLabel, QSizePolicy, QComboBox)
+                           QHBoxLayout, QLabel, QSizePolicy, QComboBox, QCheckBox)
 from PyQt6.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
 import numpy as np
 import matplotlib.dates as mdates
-from matplotlib.patches import Rectangle
-
-# Dictionary to store DataFrames for each stock
-stock_data = {}
-
-
-def load_market_events(excel_path):
-    try:
-        events_df = pd.read_excel(excel_path, sheet_name='Sheet1')
-        events_df['Start Date'] = pd.to_datetime(events_df['Start Date'])
-        events_df['End Date'] = pd.to_datetime(events_df['End Date'])
-        return events_df
-    except Exception as e:
-        print(f"Error loading market events: {e}")
-        return pd.DataFrame()
-
-
-# Load market events from Excel
-market_events = load_market_events('CS 439 final project data/stock_market_events_with_dates.xlsx')
-
-# List of stock tickers and CSV file paths
-tickers = ["AAPL", "ABBV", "AVGO", "BAC", "BRK.A", "BRK.B", "COST", "GOOGL", "HD",
-           "JNJ", "JPM", "LLY", "MA", "META", "MSFT", "NFLX", "NVDA", "ORCL",
-           "PG", "TSLA", "UNH", "V", "WMT", "XOM"]
-file_paths = [f"CS 439 final project data/MacroTrends_Data_Download_{ticker}.csv" for ticker in tickers]
-
-# Load each CSV file into DataFrames
-for ticker, file_path in zip(tickers, file_paths):
-    try:
-        df = pd.read_csv(file_path)
-        df['date'] = pd.to_datetime(df['date'])
-        stock_data[ticker] = df
-    except Exception as e:
-        print(f"Error loading data for {ticker}: {e}")
+import instrumentation
+import render_cache
+from label_layout import LabelLayout
+from event_overlay import EventOverlay
+from volume_analytics import VOLUME_SPIKE_RATIO
+from event_study import DEFAULT_WINDOW
+from stock_store import shared_data, tickers
+
+# Prices, events and indices are loaded once per process and shared with the other views;
+# rows the data quality scan rejects are already dropped
+shared = shared_data()
+stock_data = dict(shared.stock_data)
+market_events = shared.market_events
+
+# Add sector, state and basket indices as pseudo-tickers
+index_data = shared.index_data
+stock_data.update(index_data)
+
+# Year-partitioned prices on disk; an event window opens only the partitions it overlaps
+partitions = shared.partitions
+
+# Minute bars for the tickers and days we have them, streamed chunk by chunk
+intraday = shared.intraday
+
+# VWAP, ATR and abnormal volume of every stock, computed once for all of them
+analytics = shared.volume_analytics
+
+# Event metrics that can follow each ticker's price change in the impact table: column header
+# suffix, the VolumeAnalytics.event_metrics() columns shown and the format of the cell
+impact_columns = {
+    "None": None,
+    "Peak volume": ("vol", ('peak_abnormal_volume',), "{:.1f}x"),
+    "Overnight / intraday": ("on/intra", ('overnight_pct', 'intraday_pct'), "{:+.1f}% / {:+.1f}%"),
+    "ATR %": ("ATR", ('mean_atr_pct',), "{:.2f}%"),
+    "Close vs VWAP": ("vs VWAP", ('close_vs_vwap_pct',), "{:+.2f}%")
+}
+
+
+def price_window(ticker, start, end):
+    """Daily bars of ticker from start to end, read from the overlapping partitions when it is stored"""
+    if ticker in partitions:
+        return partitions.read(ticker, start, end)
+    df = stock_data[ticker]
+    return df[(df['date'] >= start) & (df['date'] <= end)]
 
 
 class StockPlotCanvas(FigureCanvas):
@@ -62,6 +71,14 @@ class StockPlotCanvas(FigureCanvas):
         super().__init__(fig)
         self.setParent(parent)
         self.cursors = []
+        self.show_significance = False
+        self.show_intraday = False
+        self.impact_column = "None"
+        self.cluster_columns = False
+        self.label_layout = None
+        self.event_overlay = None
+        self.render_cache = render_cache.CanvasCache(self, axes=('ax', 'table_ax'), state={
+            'cursors': [], 'label_layout': None, 'event_overlay': None})
 
     def calculate_event_impact(self, ticker, event_data, df):
         """Calculate percentage change during event period"""
@@ -87,11 +104,51 @@ class StockPlotCanvas(FigureCanvas):
         pct_change = ((end_price - start_price) / start_price) * 100
         return f"{pct_change:.2f}%"
 
+    def calculate_significance(self, selected_tickers, selected_events):
+        """Map (event, ticker) to (CAR %, bootstrap p-value) against the universe market proxy"""
+        events = market_events[market_events['Event'].isin(selected_events)]
+        results = shared.event_study.run(events, tickers=selected_tickers, executor=shared.executor())
+        return {(row.event, row.ticker): (row.car_pct, row.p_value) for row in results.itertuples()}
+
+    def clustered_order(self, selected_tickers, selected_events):
+        """Selected tickers in the dendrogram order of their responses to the selected events"""
+        events = market_events[market_events['Event'].isin(selected_events)]
+        if len(selected_tickers) < 3 or len(events) < 2:
+            return selected_tickers
+        result = shared.event_clusters.cluster(events, selected_tickers)
+        # Index pseudo-tickers aren't clustered and stay at the end
+        return result.ordered_tickers + [t for t in selected_tickers if t not in result.tickers]
+
     def create_impact_table(self, selected_tickers, selected_events):
         """Create a table showing the impact of each event on selected stocks"""
+        trace = instrumentation.pipeline("visual4.create_impact_table")
+        trace.stage("compute")
+
+        significance = {}
+        if self.show_significance:
+            try:
+                significance = self.calculate_significance(selected_tickers, selected_events)
+            except Exception as e:
+                print(f"Error calculating significance: {e}")
+
+        # Volume and range metrics of the extra column, if one is chosen
+        extra = impact_columns[self.impact_column]
+        metrics = {}
+        if extra is not None:
+            events = market_events[market_events['Event'].isin(selected_events)]
+            for m in analytics.event_metrics(events, selected_tickers).itertuples():
+                metrics[(m.event, m.ticker)] = m
+
+        # Each table column after the event names is a (ticker, is_extra) pair
+        columns = []
+        for ticker in selected_tickers:
+            columns.append((ticker, False))
+            if extra is not None:
+                columns.append((ticker, True))
+
         # Create data for table
         table_data = []
-        header = ['Event'] + selected_tickers
+        header = ['Event'] + [f"{ticker} {extra[0]}" if is_extra else ticker for ticker, is_extra in columns]
 
         # Calculate impact for each event
         for event in selected_events:
@@ -99,16 +156,32 @@ class StockPlotCanvas(FigureCanvas):
             row = [event]
 
             for ticker in selected_tickers:
-                if ticker in stock_data:
-                    df = stock_data[ticker]
+                if ticker in stock_data and significance:
+                    # Show the abnormal return the stars were computed on, not the Start-End change
+                    car, p_value = significance.get((event, ticker), (None, None))
+                    if car is None or pd.isna(car):
+                        row.append("N/A")
+                    else:
+                        stars = " **" if p_value < 0.01 else " *" if p_value < 0.05 else ""
+                        row.append(f"{car:+.2f}%{stars}")
+                elif ticker in stock_data:
+                    # A day either side covers the padding of single-day events
+                    df = price_window(ticker, event_data['Start Date'] - pd.Timedelta(days=1),
+                                      event_data['End Date'] + pd.Timedelta(days=1))
                     impact = self.calculate_event_impact(ticker, event_data, df)
+                    trace.count("rows_scanned", len(df))
                     row.append(impact)
                 else:
                     row.append("N/A")
+                if extra is not None:
+                    m = metrics.get((event, ticker))
+                    values = [getattr(m, field) for field in extra[1]] if m is not None else [np.nan]
+                    row.append("N/A" if any(pd.isna(values)) else extra[2].format(*values))
 
             table_data.append(row)
 
         # Clear previous table
+        trace.stage("artists")
         self.table_ax.clear()
         self.table_ax.axis('off')
 
@@ -129,11 +202,30 @@ class StockPlotCanvas(FigureCanvas):
             # Make header cells bold
             if cell[0] == 0:
                 table._cells[cell].set_text_props(weight='bold')
+            elif cell[1] > 0 and columns[cell[1] - 1][1]:
+                # Mark volume spikes in the peak volume column
+                m = metrics.get((selected_events[cell[0] - 1], columns[cell[1] - 1][0]))
+                if self.impact_column == "Peak volume" and m is not None and \
+                        m.peak_abnormal_volume >= VOLUME_SPIKE_RATIO:
+                    table._cells[cell].set_facecolor('#ffe0b3')  # Light orange
             # Color negative changes red and positive changes green
+            elif cell[1] > 0 and significance:
+                # Shade by the sign of the abnormal return, darker when significant
+                key = (selected_events[cell[0] - 1], columns[cell[1] - 1][0])
+                car, p_value = significance.get(key, (None, None))
+                if car is None or pd.isna(p_value):
+                    continue
+                if p_value < 0.01:
+                    shades = ('#ff6666', '#66cc66')
+                elif p_value < 0.05:
+                    shades = ('#ff9999', '#99dd99')
+                else:
+                    shades = ('#f2f2f2', '#f2f2f2')
+                table._cells[cell].set_facecolor(shades[0] if car < 0 else shades[1])
             elif cell[1] > 0:  # Skip event name column
                 text = table._cells[cell].get_text().get_text()
                 if text != "N/A":
-                    value = float(text.strip('%'))
+                    value = float(text.split('%')[0])
                     if value < 0:
                         table._cells[cell].set_facecolor('#ffcccc')  # Light red
                     elif value > 0:
@@ -142,7 +234,22 @@ class StockPlotCanvas(FigureCanvas):
         # Adjust column widths
         table.auto_set_column_width(range(len(header)))
 
+        if significance:
+            self.table_ax.set_title(f"Abnormal return vs. market over ±{DEFAULT_WINDOW} trading days around "
+                                    f"each event start (* p<0.05, ** p<0.01)", fontsize=8)
+        trace.count("artists_created", len(table._cells))
+        trace.end()
+
     def plot_stocks(self, selected_tickers, selected_events):
+        trace = instrumentation.pipeline("visual4.plot_stocks")
+        trace.stage("cache")
+        if self.render_cache.restore(tickers=selected_tickers, events=selected_events,
+                                     significance=self.show_significance, intraday=self.show_intraday,
+                                     impact_column=self.impact_column, cluster_columns=self.cluster_columns):
+            trace.count("cache_hits")
+            trace.end()
+            return
+        trace.stage("clear")
         self.ax.clear()
         self.cursors = []
 
@@ -151,9 +258,13 @@ class StockPlotCanvas(FigureCanvas):
                          "Please select one or more stocks",
                          horizontalalignment='center',
                          verticalalignment='center')
+            trace.stage("draw")
             self.draw()
+            trace.end()
             return
 
+        trace.stage("filter")
+
         # Get the overall date range for all selected events
         event_start_date, event_end_date = self.get_date_range(selected_events)
 
@@ -161,7 +272,10 @@ class StockPlotCanvas(FigureCanvas):
         earliest_stock_date = None
         for ticker in selected_tickers:
             if ticker in stock_data:
-                stock_date = stock_data[ticker]['date'].min()
+                if ticker in partitions:
+                    stock_date = partitions.first_date(ticker)
+                else:
+                    stock_date = stock_data[ticker]['date'].min()
                 if earliest_stock_date is None or stock_date < earliest_stock_date:
                     earliest_stock_date = stock_date
 
@@ -177,12 +291,13 @@ class StockPlotCanvas(FigureCanvas):
         # Plot stock data
         for idx, ticker in enumerate(selected_tickers):
             if ticker in stock_data:
-                df = stock_data[ticker].copy()
-
                 # Filter data based on date range
+                trace.stage("filter")
                 if effective_start_date and event_end_date:
-                    mask = (df['date'] >= effective_start_date) & (df['date'] <= event_end_date)
-                    df = df[mask]
+                    df = price_window(ticker, effective_start_date, event_end_date)
+                else:
+                    df = stock_data[ticker].copy()
+                trace.count("rows_scanned", len(df))
 
                 if df.empty:
                     print(f"No data available for {ticker} in the selected date range")
@@ -191,16 +306,30 @@ class StockPlotCanvas(FigureCanvas):
                 try:
                     # Normalize prices to percentage change from first day
                     first_price = df['close'].iloc[0]
-                    if pd.isna(first_price):
-                        print(f"Invalid first price for {ticker}")
-                        continue
-
                     normalized_prices = ((df['close'] - first_price) / first_price) * 100
 
+                    trace.stage("artists")
                     line, = self.ax.plot(df['date'], normalized_prices,
                                          label=ticker,
                                          color=colors[idx])
-                    cursor = mplcursors.cursor(line, hover=True)
+                    trace.count("artists_created")
+                    lines = [line]
+
+                    # Minute bars inside the window, downsampled as they stream from the store
+                    if self.show_intraday and ticker in intraday:
+                        trace.stage("intraday")
+                        bars = intraday.downsample(ticker, effective_start_date,
+                                                   event_end_date + pd.Timedelta(days=1))
+                        if not bars.empty:
+                            intraday_line, = self.ax.plot(bars['datetime'],
+                                                          ((bars['close'] - first_price) / first_price) * 100,
+                                                          label=f"{ticker} intraday", color=colors[idx],
+                                                          linewidth=0.8, alpha=0.8)
+                            lines.append(intraday_line)
+                            trace.count("artists_created")
+
+                    import mplcursors  # Imported on first plot, keeping it off the startup path
+                    cursor = mplcursors.cursor(lines, hover=True)
                     self.cursors.append(cursor)
                     plotted_any_data = True
 
@@ -208,9 +337,10 @@ class StockPlotCanvas(FigureCanvas):
                     def on_add(sel):
                         date = mdates.num2date(sel.target[0])
                         change = sel.target[1]
+                        date_format = "%Y-%m-%d %H:%M" if sel.artist.get_label().endswith("intraday") else "%Y-%m-%d"
                         sel.annotation.set_text(
                             f'{sel.artist.get_label()}\n'
-                            f'Date: {date.strftime("%Y-%m-%d")}\n'
+                            f'Date: {date.strftime(date_format)}\n'
                             f'Change: {change:.2f}%'
                         )
                         sel.annotation.get_bbox_patch().set(fc="yellow", alpha=0.8)
@@ -220,80 +350,31 @@ class StockPlotCanvas(FigureCanvas):
 
         # Only proceed with event highlighting if we plotted any data
         if plotted_any_data and selected_events:
-            ymin, ymax = self.ax.get_ylim()
-
-            # Sort events by start date to handle label positioning
-            event_positions = []
-            for event in selected_events:
-                event_data = market_events[market_events['Event'] == event].iloc[0]
-                event_positions.append((event_data['Start Date'], event))
-            event_positions.sort()  # Sort by start date
-
-            # Calculate label heights to avoid overlap
-            label_heights = []
-            current_height = 1.0  # Start at the top
-            min_gap = 0.05  # Minimum gap between labels
-
-            for start_date, event in event_positions:
-                try:
-                    event_data = market_events[market_events['Event'] == event].iloc[0]
-                    highlight_start = event_data['Start Date']
-                    highlight_end = event_data['End Date']
-
-                    # Check if it's a single-day event
-                    is_single_day = highlight_start == highlight_end
-
-                    # For single-day events, make the highlight visible but narrow
-                    if is_single_day:
-                        highlight_end += pd.Timedelta(days=1)
-
-                    # Adjust highlight start date if it's before the earliest stock data
-                    adjusted_highlight_start = max(highlight_start, effective_start_date)
-
-                    # Convert dates to matplotlib format for Rectangle
-                    highlight_start_ord = mdates.date2num(adjusted_highlight_start)
-                    highlight_end_ord = mdates.date2num(highlight_end)
-
-                    # Only create rectangle and label if the event overlaps with the visible range
-                    if highlight_end >= effective_start_date:
-                        if is_single_day:
-                            # For single-day events, use a darker red vertical line
-                            self.ax.axvline(x=highlight_start_ord,
-                                            color='darkred',
-                                            alpha=0.5,
-                                            linewidth=2,
-                                            linestyle='--',
-                                            label=event)
-                        else:
-                            # For period events, use the regular rectangle
-                            rect = Rectangle((highlight_start_ord, ymin),
-                                             highlight_end_ord - highlight_start_ord,
-                                             ymax - ymin,
-                                             facecolor='red',
-                                             alpha=0.1,
-                                             label=event)
-                            self.ax.add_patch(rect)
-
-                        # Find appropriate label height
-                        while any(abs(h - current_height) < min_gap for h in label_heights):
-                            current_height -= min_gap
-
-                        # Add event label at the adjusted position with staggered heights
-                        self.ax.text(highlight_start_ord, ymax * current_height,
-                                     event,
-                                     rotation=45,
-                                     verticalalignment='bottom',
-                                     horizontalalignment='left',
-                                     fontsize=8)
-
-                        label_heights.append(current_height)
-                        current_height -= min_gap  # Prepare for next label
-
-                except Exception as e:
-                    print(f"Error highlighting event {event}: {str(e)}")
-                    continue
+            trace.stage("events")
+
+            # Selected events in start-date order, keeping those that reach the plotted range
+            events = (market_events.drop_duplicates('Event').set_index('Event')
+                      .reindex(selected_events).dropna(subset=['Start Date']).reset_index()
+                      .sort_values('Start Date', kind='stable'))
+            single_day = events['Start Date'] == events['End Date']
+            highlight_end = events['End Date'] + single_day * pd.Timedelta(days=1)
+            events = events[highlight_end >= effective_start_date]
+
+            # Periods as one shaded collection and single days as one collection of dashed lines
+            self.event_overlay = EventOverlay(self.ax, events, span_color='red', span_alpha=0.1,
+                                              line_color='darkred', line_alpha=0.5, line_width=2,
+                                              span_label="Market events", line_label="Single-day events")
+            trace.count("artists_created", 2)
+
+            # Stack the labels in non-overlapping rows; rows are redone on zoom
+            trace.stage("event_labels")
+            label_x = mdates.date2num(events['Start Date'].clip(lower=effective_start_date).to_numpy())
+            self.label_layout = LabelLayout(self.ax, fontsize=8)
+            self.label_layout.set_labels(label_x, events['Event'])
+            trace.count("artists_created", self.label_layout.shown)
 
         if plotted_any_data:
+            trace.stage("labels")
             self.ax.set_xlabel("Date")
             self.ax.set_ylabel("Percentage Change (%)")
             # Position title higher and make it bold
@@ -304,17 +385,24 @@ class StockPlotCanvas(FigureCanvas):
             self.ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
             self.ax.grid(True, alpha=0.3)
 
-            # Create impact summary table
-            self.create_impact_table(selected_tickers, selected_events)
+            # Create impact summary table, similar responders side by side if asked
+            trace.stage("impact_table")
+            table_tickers = selected_tickers
+            if self.cluster_columns:
+                table_tickers = self.clustered_order(selected_tickers, selected_events)
+            self.create_impact_table(table_tickers, selected_events)
 
-            plt.tight_layout()
+            trace.stage("tight_layout")
+            self.figure.tight_layout()
         else:
             self.ax.text(0.5, 0.5,
                          "No data available for the selected stocks and date range",
                          horizontalalignment='center',
                          verticalalignment='center')
 
+        trace.stage("draw")
         self.draw()
+        trace.end()
 
     def get_date_range(self, selected_events):
         if not selected_events:
@@ -370,7 +458,7 @@ class StockViewerApp(QMainWindow):
         # Stock selection
         self.ticker_label = QLabel("Select Stocks:")
         self.ticker_combo = QComboBox()
-        self.ticker_combo.addItems(['Select stocks...'] + sorted(tickers))
+        self.ticker_combo.addItems(['Select stocks...'] + sorted(tickers) + list(index_data))
         self.ticker_combo.setCurrentText('Select stocks...')
         self.selected_tickers_label = QLabel("Selected stocks:")
         self.selected_tickers = QLabel("")
@@ -385,6 +473,25 @@ class StockViewerApp(QMainWindow):
         self.selected_events = QLabel("")
         self.event_combo.currentTextChanged.connect(self.add_event)
 
+        # Significance shading for the impact table
+        self.significance_checkbox = QCheckBox("Shade by significance")
+        self.significance_checkbox.toggled.connect(self.toggle_significance)
+
+        # Minute bars over the daily line, for tickers with intraday data
+        self.intraday_checkbox = QCheckBox("Show intraday bars")
+        self.intraday_checkbox.setEnabled(len(intraday) > 0)
+        self.intraday_checkbox.toggled.connect(self.toggle_intraday)
+
+        # Order the impact table's ticker columns by event response cluster
+        self.cluster_checkbox = QCheckBox("Order table by response cluster")
+        self.cluster_checkbox.toggled.connect(self.toggle_cluster_columns)
+
+        # Extra volume or range metric next to each ticker in the impact table
+        self.impact_column_label = QLabel("Extra columns:")
+        self.impact_column_combo = QComboBox()
+        self.impact_column_combo.addItems(list(impact_columns))
+        self.impact_column_combo.currentTextChanged.connect(self.change_impact_column)
+
         # Store selections
         self.selected_ticker_list = []
         self.selected_event_list = []
@@ -394,7 +501,11 @@ class StockViewerApp(QMainWindow):
             self.ticker_label, self.ticker_combo,
             self.selected_tickers_label, self.selected_tickers,
             self.event_label, self.event_combo,
-            self.selected_events_label, self.selected_events
+            self.selected_events_label, self.selected_events,
+            self.significance_checkbox,
+            self.intraday_checkbox,
+            self.cluster_checkbox,
+            self.impact_column_label, self.impact_column_combo
         ]
 
         for widget in controls_widgets:
@@ -406,6 +517,7 @@ class StockViewerApp(QMainWindow):
         # Set fixed width for combos
         self.ticker_combo.setFixedWidth(200)
         self.event_combo.setFixedWidth(200)
+        self.impact_column_combo.setFixedWidth(200)
 
         # Add layouts to main layout
         self.main_layout.addLayout(self.plot_layout, stretch=4)
@@ -414,6 +526,7 @@ class StockViewerApp(QMainWindow):
         self.main_widget.setLayout(self.main_layout)
         self.setCentralWidget(self.main_widget)
         self.resize(1600, 800)  # Wider window
+        self.hud = instrumentation.attach_hud(self.plot_canvas)
 
     def add_ticker(self, ticker):
         if ticker != 'Select stocks...':
@@ -431,9 +544,27 @@ class StockViewerApp(QMainWindow):
                 self.update_plot()
             self.event_combo.setCurrentText('Select events...')
 
+    def toggle_significance(self, checked):
+        self.plot_canvas.show_significance = checked
+        self.update_plot()
+
+    def toggle_intraday(self, checked):
+        self.plot_canvas.show_intraday = checked
+        self.update_plot()
+
+    def toggle_cluster_columns(self, checked):
+        self.plot_canvas.cluster_columns = checked
+        self.update_plot()
+
+    def change_impact_column(self, name):
+        self.plot_canvas.impact_column = name
+        self.update_plot()
+
     def update_plot(self):
         try:
-            self.plot_canvas.plot_stocks(self.selected_ticker_list, self.selected_event_list)
+            with instrumentation.pipeline("visual4.update_plot") as trace:
+                trace.stage("plot")
+                self.plot_canvas.plot_stocks(self.selected_ticker_list, self.selected_event_list)
         except Exception as e:
             print(f"Error updating plot: {str(e)}")
 
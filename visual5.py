@@ -0,0 +1,231 @@
+import sys
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QComboBox, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                             QSpinBox)
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+import instrumentation
+import render_cache
+from stock_store import shared_data
+from backtest import WEIGHTINGS, FREQUENCIES
+
+# Prices and metadata are loaded once per process and shared with the other views
+shared = shared_data()
+stock_metadata = shared.stock_metadata
+backtester = shared.backtester
+
+frequency_names = {'W': "Weekly", 'M': "Monthly", 'Q': "Quarterly", 'Y': "Yearly", 'hold': "Buy and hold"}
+
+
+class PortfolioCanvas(FigureCanvas):
+    def __init__(self, parent=None, width=10, height=8, dpi=100):
+        fig = plt.figure(figsize=(width, height), dpi=dpi)
+        self.ax = fig.add_subplot(111)
+        fig.subplots_adjust(left=0.1, right=0.75, top=0.9, bottom=0.15)
+        super().__init__(fig)
+        self.setParent(parent)
+        self.cursor = None
+        self.line_data = {}
+        self.render_cache = render_cache.CanvasCache(self, state={'cursor': None, 'line_data': {}})
+
+    def plot_portfolio(self, tickers, weighting, rebalance, cost_bps, start_year, end_year):
+        trace = instrumentation.pipeline("visual5.plot_portfolio")
+        trace.stage("cache")
+        if self.render_cache.restore(tickers=tickers, weighting=weighting, rebalance=rebalance, cost_bps=cost_bps,
+                                     start_year=start_year, end_year=end_year):
+            trace.count("cache_hits")
+            trace.end()
+            return
+        trace.stage("clear")
+        self.ax.clear()
+        self.line_data.clear()
+        if self.cursor:
+            self.cursor.remove()
+            self.cursor = None
+
+        # The selected portfolio against an equal-weight buy-and-hold of the same tickers
+        trace.stage("compute")
+        configs = [
+            {'weighting': weighting, 'rebalance': rebalance, 'tickers': tickers, 'cost_bps': cost_bps},
+            {'weighting': 'equal', 'rebalance': 'hold', 'tickers': tickers}
+        ]
+        labels = [f"{weighting.title()} weight, {frequency_names[rebalance].lower()}", "Equal weight, buy and hold"]
+        equity, stats = backtester.run_many(configs, start_year, end_year)
+        lo, hi = backtester.row_range(start_year, end_year)
+        dates = backtester.dates[lo:hi]
+        trace.count("rows_scanned", equity.size)
+
+        if len(dates) == 0 or not tickers:
+            self.ax.set_title("No data available for selected criteria")
+            trace.stage("draw")
+            self.draw()
+            trace.end()
+            return
+
+        trace.stage("artists")
+        lines = []
+        for i, label in enumerate(labels):
+            line, = self.ax.plot(dates, equity[:, i], label=label, linestyle='-' if i == 0 else '--')
+            self.line_data[line] = {'label': label, 'stats': stats.iloc[i]}
+            lines.append(line)
+        trace.count("artists_created", len(lines))
+
+        trace.stage("cursor")
+        import mplcursors  # Imported on first plot, keeping it off the startup path
+        self.cursor = mplcursors.cursor(lines, hover=True, annotation_kwargs={'bbox': dict(fc="yellow", alpha=0.8)})
+
+        @self.cursor.connect("add")
+        def on_add(sel):
+            data = self.line_data[sel.artist]
+            date = mdates.num2date(sel.target[0])
+            stats = data['stats']
+            sel.annotation.set_text(
+                f"{data['label']}\n"
+                f"Date: {date.strftime('%Y-%m-%d')}\n"
+                f"Growth of $1: ${sel.target[1]:.2f}\n"
+                f"CAGR: {stats['cagr_pct']:.2f}%\n"
+                f"Volatility: {stats['volatility_pct']:.2f}%\n"
+                f"Sharpe: {stats['sharpe']:.2f}\n"
+                f"Max Drawdown: {stats['max_drawdown_pct']:.2f}%\n"
+                f"Avg Turnover: {stats['avg_turnover_pct']:.2f}% per rebalance"
+            )
+
+        trace.stage("labels")
+        self.ax.set_yscale('log')
+        self.ax.set_xlabel("Date")
+        self.ax.set_ylabel("Growth of $1 (log scale)")
+        self.ax.set_title(f"Portfolio of {len(tickers)} Stocks, {start_year}-{end_year}")
+        self.ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+
+        trace.stage("draw")
+        self.draw()
+        trace.end()
+
+
+class PortfolioViewerApp(QMainWindow):
+    def __init__(self):
+        super().__init__()
+
+        # Main widget and layout
+        self.main_widget = QWidget(self)
+        self.layout = QVBoxLayout(self.main_widget)
+
+        # Filter layouts
+        self.filter_layout = QHBoxLayout()
+        self.portfolio_layout = QHBoxLayout()
+        self.year_layout = QHBoxLayout()
+        self.setMinimumSize(1000, 800)
+
+        # Dropdowns for filtering the universe, as in visual2
+        self.sector_dropdown = QComboBox(self)
+        self.state_dropdown = QComboBox(self)
+        self.location_dropdown = QComboBox(self)
+        self.sector_dropdown.addItem("All")
+        self.state_dropdown.addItem("All")
+        self.location_dropdown.addItem("All")
+        self.sector_dropdown.addItems(sorted(stock_metadata['Sector'].unique()))
+        self.state_dropdown.addItems(sorted(stock_metadata['Headquarters State'].unique()))
+        self.location_dropdown.addItems(sorted(stock_metadata['Headquarters Location'].unique()))
+
+        self.filter_layout.addWidget(QLabel("Sector:"))
+        self.filter_layout.addWidget(self.sector_dropdown)
+        self.filter_layout.addWidget(QLabel("State:"))
+        self.filter_layout.addWidget(self.state_dropdown)
+        self.filter_layout.addWidget(QLabel("Location:"))
+        self.filter_layout.addWidget(self.location_dropdown)
+
+        # Portfolio construction
+        self.weighting_dropdown = QComboBox(self)
+        self.weighting_dropdown.addItems(WEIGHTINGS)
+        self.rebalance_dropdown = QComboBox(self)
+        for freq in FREQUENCIES:
+            self.rebalance_dropdown.addItem(frequency_names[freq], freq)
+        self.rebalance_dropdown.setCurrentIndex(FREQUENCIES.index('M'))
+        self.cost_spinbox = QSpinBox(self)
+        self.cost_spinbox.setRange(0, 500)
+        self.cost_spinbox.setSuffix(" bps")
+
+        self.portfolio_layout.addWidget(QLabel("Weighting:"))
+        self.portfolio_layout.addWidget(self.weighting_dropdown)
+        self.portfolio_layout.addWidget(QLabel("Rebalance:"))
+        self.portfolio_layout.addWidget(self.rebalance_dropdown)
+        self.portfolio_layout.addWidget(QLabel("Trading Cost:"))
+        self.portfolio_layout.addWidget(self.cost_spinbox)
+
+        # Start and End year
+        self.start_year_spinbox = QSpinBox(self)
+        self.start_year_spinbox.setRange(1980, 2024)
+        self.start_year_spinbox.setValue(1990)
+        self.end_year_spinbox = QSpinBox(self)
+        self.end_year_spinbox.setRange(1980, 2024)
+        self.end_year_spinbox.setValue(2024)
+
+        self.year_layout.addWidget(QLabel("Start Year:"))
+        self.year_layout.addWidget(self.start_year_spinbox)
+        self.year_layout.addWidget(QLabel("End Year:"))
+        self.year_layout.addWidget(self.end_year_spinbox)
+
+        # Connect changes to plot update
+        self.sector_dropdown.currentTextChanged.connect(self.update_plot)
+        self.state_dropdown.currentTextChanged.connect(self.update_plot)
+        self.location_dropdown.currentTextChanged.connect(self.update_plot)
+        self.weighting_dropdown.currentTextChanged.connect(self.update_plot)
+        self.rebalance_dropdown.currentIndexChanged.connect(self.update_plot)
+        self.cost_spinbox.valueChanged.connect(self.update_plot)
+        self.start_year_spinbox.valueChanged.connect(self.update_plot)
+        self.end_year_spinbox.valueChanged.connect(self.update_plot)
+
+        # Matplotlib canvas and toolbar
+        self.plot_canvas = PortfolioCanvas(self, width=10, height=8)
+        self.toolbar = NavigationToolbar2QT(self.plot_canvas, self)
+
+        self.layout.addLayout(self.filter_layout)
+        self.layout.addLayout(self.portfolio_layout)
+        self.layout.addLayout(self.year_layout)
+        self.layout.addWidget(self.toolbar)
+        self.layout.addWidget(self.plot_canvas)
+        self.main_widget.setLayout(self.layout)
+        self.setCentralWidget(self.main_widget)
+        self.hud = instrumentation.attach_hud(self.plot_canvas)
+
+        # Initial plot
+        self.update_plot()
+
+    def get_filtered_tickers(self):
+        filtered_data = stock_metadata
+        if self.sector_dropdown.currentText() != "All":
+            filtered_data = filtered_data[filtered_data['Sector'] == self.sector_dropdown.currentText()]
+        if self.state_dropdown.currentText() != "All":
+            filtered_data = filtered_data[filtered_data['Headquarters State'] == self.state_dropdown.currentText()]
+        if self.location_dropdown.currentText() != "All":
+            filtered_data = filtered_data[
+                filtered_data['Headquarters Location'] == self.location_dropdown.currentText()]
+        return [ticker for ticker in filtered_data['Ticker'] if ticker in backtester.tickers]
+
+    def update_plot(self):
+        with instrumentation.pipeline("visual5.update_plot") as trace:
+            trace.stage("filter_tickers")
+            tickers = self.get_filtered_tickers()
+            trace.stage("plot")
+            self.plot_canvas.plot_portfolio(
+                tickers,
+                self.weighting_dropdown.currentText(),
+                self.rebalance_dropdown.currentData(),
+                self.cost_spinbox.value(),
+                self.start_year_spinbox.value(),
+                self.end_year_spinbox.value()
+            )
+
+
+def main():
+    app = QApplication(sys.argv)
+    viewer = PortfolioViewerApp()
+    viewer.setWindowTitle("Portfolio Backtester")
+    viewer.resize(800, 600)
+    viewer.show()
+    sys.exit(app.exec())
+
+
+if __name__ == "__main__":
+    main()
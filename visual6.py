@@ -0,0 +1,236 @@
+import sys
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from matplotlib.collections import LineCollection
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QComboBox, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                             QSpinBox, QListWidget, QListWidgetItem)
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+import instrumentation
+import render_cache
+from stock_store import shared_data, ticker_company_map
+
+# Prices and events are loaded once per process and shared with the other views
+shared = shared_data()
+market_events = shared.market_events
+event_clusters = shared.event_clusters
+
+# Features each ticker is clustered on, and the distance between them
+feature_modes = {
+    "Impact and abnormal return": ('impact', 'car'),
+    "Impact": ('impact',),
+    "Abnormal return": ('car',)
+}
+distance_modes = {"Euclidean": 'euclidean', "Correlation": 'correlation'}
+
+DEFAULT_CLUSTERS = 4
+
+# Cell values are written into the heatmap up to this many tickers
+ANNOTATE_MAX_TICKERS = 30
+
+# Horizontal space per ticker label, in multiples of the font size; labels are thinned to fit
+LABEL_SPACING = 1.4
+
+
+class ClusterCanvas(FigureCanvas):
+    def __init__(self, parent=None, width=12, height=8, dpi=100):
+        self.fig = plt.figure(figsize=(width, height), dpi=dpi)
+        gs = self.fig.add_gridspec(2, 1, height_ratios=[1, 3])
+        self.dendrogram_ax = self.fig.add_subplot(gs[0])
+        self.ax = self.fig.add_subplot(gs[1])
+        self.fig.subplots_adjust(left=0.22, right=0.9, top=0.93, bottom=0.12, hspace=0.05)
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.hover_data = {}
+        self.current_annotation = None
+        self.render_cache = render_cache.CanvasCache(self, axes=('dendrogram_ax', 'ax'), state={
+            'hover_data': {}, 'current_annotation': None})
+        self.mpl_connect('motion_notify_event', self.on_hover)
+
+    def plot_clusters(self, events, features, metric, n_clusters):
+        trace = instrumentation.pipeline("visual6.plot_clusters")
+        trace.stage("cache")
+        if self.render_cache.restore(events=events, features=features, metric=metric, n_clusters=n_clusters):
+            trace.count("cache_hits")
+            trace.end()
+            return
+        # Fresh Axes keep the axis visibility of the last view, which may have been the message below
+        self.ax.set_axis_on()
+        self.dendrogram_ax.set_axis_on()
+
+        selected = market_events[market_events['Event'].isin(events)]
+        if len(selected) < 2:
+            self.ax.set_axis_off()
+            self.dendrogram_ax.set_axis_off()
+            self.ax.set_title("Select at least two events")
+            self.draw()
+            trace.end()
+            return
+
+        trace.stage("cluster")
+        result = event_clusters.cluster(selected, features=feature_modes[features], metric=distance_modes[metric])
+        labels = result.labels(n_clusters)
+        order = result.order
+        impact = result.ordered_impact().to_numpy(dtype=np.float64)
+        trace.count("rows_scanned", impact.size)
+
+        trace.stage("artists")
+        colors = plt.cm.tab10(np.arange(n_clusters) % 10)
+        self.plot_dendrogram(result, labels, colors)
+        self.plot_heatmap(result, labels[order], impact, colors)
+        trace.count("artists_created", len(result.linkage) + 1)
+
+        self.hover_data = {
+            'tickers': result.ordered_tickers,
+            'events': result.events,
+            'impact': impact,
+            'clusters': labels[order]
+        }
+        trace.stage("draw")
+        self.draw()
+        trace.end()
+
+    def plot_dendrogram(self, result, labels, colors):
+        """Merges inside one cluster take its color, merges above the cut are gray"""
+        xs, ys = result.dendrogram()
+        n = len(result.tickers)
+        cluster = np.concatenate([labels, np.full(n - 1, -1)])
+        for step, (left, right) in enumerate(result.linkage[:, :2].astype(np.int64)):
+            same = cluster[left] >= 0 and cluster[left] == cluster[right]
+            cluster[n + step] = cluster[left] if same else -1
+        segment_colors = [colors[c] if c >= 0 else (0.5, 0.5, 0.5, 1.0) for c in cluster[n:]]
+        self.dendrogram_ax.add_collection(LineCollection(np.stack([xs, ys], axis=2), colors=segment_colors,
+                                                         linewidths=1.2))
+        self.dendrogram_ax.set_xlim(-0.5, n - 0.5)
+        self.dendrogram_ax.set_ylim(0, max(ys.max(), 1e-9) * 1.05 if len(ys) else 1)
+        self.dendrogram_ax.set_xticks([])
+        self.dendrogram_ax.set_ylabel("Distance")
+        for side in ('top', 'right', 'bottom'):
+            self.dendrogram_ax.spines[side].set_visible(False)
+        self.dendrogram_ax.set_title(f"{n} tickers clustered by response to {len(result.events)} events")
+
+    def plot_heatmap(self, result, clusters, impact, colors):
+        """Events as rows and tickers in dendrogram order as columns, colored by % change"""
+        finite = impact[np.isfinite(impact)]
+        limit = max(np.percentile(np.abs(finite), 98), 1.0) if len(finite) else 1.0
+        cmap = plt.get_cmap('RdYlGn').copy()
+        cmap.set_bad('lightgray')
+        image = self.ax.imshow(np.ma.masked_invalid(impact), cmap=cmap, aspect='auto', interpolation='nearest',
+                               norm=mcolors.TwoSlopeNorm(vmin=-limit, vcenter=0, vmax=limit))
+
+        tickers = result.ordered_tickers
+        fontsize = 8 if len(tickers) > 30 else 9
+        label_px = fontsize * LABEL_SPACING * self.fig.dpi / 72
+        step = max(1, int(np.ceil(len(tickers) * label_px / max(self.ax.bbox.width, 1))))
+        self.ax.set_xticks(range(0, len(tickers), step))
+        self.ax.set_xticklabels(tickers[::step], rotation=90, fontsize=fontsize)
+        for label, cluster in zip(self.ax.get_xticklabels(), clusters[::step]):
+            label.set_color(colors[cluster])
+        self.ax.set_yticks(range(len(result.events)))
+        self.ax.set_yticklabels(result.events, fontsize=8)
+
+        if len(tickers) <= ANNOTATE_MAX_TICKERS:
+            for row, col in zip(*np.nonzero(np.isfinite(impact))):
+                self.ax.text(col, row, f"{impact[row, col]:.0f}", ha='center', va='center', fontsize=6)
+
+        colorbar_ax = self.ax.inset_axes([1.02, 0, 0.02, 1])
+        self.fig.colorbar(image, cax=colorbar_ax, extend='both', label="Event % Change")
+
+    def on_hover(self, event):
+        if self.current_annotation is not None:
+            self.current_annotation.remove()
+            self.current_annotation = None
+            self.draw_idle()
+        hover = self.hover_data
+        if not hover or event.inaxes is not self.ax or event.xdata is None:
+            return
+        row, col = int(round(event.ydata)), int(round(event.xdata))
+        if not (0 <= row < len(hover['events']) and 0 <= col < len(hover['tickers'])):
+            return
+        ticker = hover['tickers'][col]
+        value = hover['impact'][row, col]
+        change = "N/A" if np.isnan(value) else f"{value:.1f}%"
+        text = (f"Company: {ticker_company_map.get(ticker, 'Unknown Company')}\n"
+                f"Ticker: {ticker}\n"
+                f"Event: {hover['events'][row]}\n"
+                f"Change: {change}\n"
+                f"Cluster: {hover['clusters'][col] + 1}")
+        self.current_annotation = self.ax.annotate(
+            text, xy=(col, row), xytext=(0, 10), textcoords='offset points', ha='center', va='bottom',
+            bbox=dict(boxstyle='round,pad=0.5', fc='yellow', alpha=0.8), fontsize=8)
+        self.draw_idle()
+
+
+class ClusterViewerApp(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.main_widget = QWidget(self)
+        self.main_layout = QHBoxLayout(self.main_widget)
+
+        # Left side: options above the plot
+        self.plot_layout = QVBoxLayout()
+        self.options_layout = QHBoxLayout()
+        self.feature_dropdown = QComboBox(self)
+        self.feature_dropdown.addItems(list(feature_modes))
+        self.distance_dropdown = QComboBox(self)
+        self.distance_dropdown.addItems(list(distance_modes))
+        self.clusters_spinbox = QSpinBox(self)
+        self.clusters_spinbox.setRange(1, 10)
+        self.clusters_spinbox.setValue(DEFAULT_CLUSTERS)
+        for label, widget in (("Cluster on:", self.feature_dropdown), ("Distance:", self.distance_dropdown),
+                              ("Clusters:", self.clusters_spinbox)):
+            self.options_layout.addWidget(QLabel(label))
+            self.options_layout.addWidget(widget)
+        self.options_layout.addStretch()
+
+        self.plot_canvas = ClusterCanvas(self)
+        self.toolbar = NavigationToolbar2QT(self.plot_canvas, self)
+        self.plot_layout.addLayout(self.options_layout)
+        self.plot_layout.addWidget(self.toolbar)
+        self.plot_layout.addWidget(self.plot_canvas)
+
+        # Right side: the event set to cluster on
+        self.events_layout = QVBoxLayout()
+        self.events_layout.addWidget(QLabel("Events:"))
+        self.event_list = QListWidget(self)
+        for event in market_events['Event']:
+            item = QListWidgetItem(event)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.event_list.addItem(item)
+        self.event_list.setFixedWidth(260)
+        self.events_layout.addWidget(self.event_list)
+
+        self.main_layout.addLayout(self.plot_layout, stretch=4)
+        self.main_layout.addLayout(self.events_layout, stretch=1)
+        self.setCentralWidget(self.main_widget)
+        self.resize(1500, 850)
+        self.hud = instrumentation.attach_hud(self.plot_canvas)
+
+        self.feature_dropdown.currentTextChanged.connect(self.update_plot)
+        self.distance_dropdown.currentTextChanged.connect(self.update_plot)
+        self.clusters_spinbox.valueChanged.connect(self.update_plot)
+        self.event_list.itemChanged.connect(self.update_plot)
+        self.update_plot()
+
+    def selected_events(self):
+        return [self.event_list.item(i).text() for i in range(self.event_list.count())
+                if self.event_list.item(i).checkState() == Qt.CheckState.Checked]
+
+    def update_plot(self):
+        try:
+            with instrumentation.pipeline("visual6.update_plot") as trace:
+                trace.stage("plot")
+                self.plot_canvas.plot_clusters(self.selected_events(), self.feature_dropdown.currentText(),
+                                               self.distance_dropdown.currentText(), self.clusters_spinbox.value())
+        except Exception as e:
+            print(f"Error updating plot: {str(e)}")
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    viewer = ClusterViewerApp()
+    viewer.show()
+    sys.exit(app.exec())
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+from event_analysis import SINGLE_DAY_PADDING, _epoch_days, _segment_aranges
+
+# Trading days in the rolling VWAP
+VWAP_WINDOW = 20
+
+# Trading days averaged into the average true range
+ATR_WINDOW = 14
+
+# Trading days before each day that its volume baseline averages
+VOLUME_BASELINE_WINDOW = 20
+
+# Volume at least this multiple of its baseline counts as a spike
+VOLUME_SPIKE_RATIO = 3.0
+
+# Per-day columns, in frame() order. vwap is the rolling volume-weighted
+# typical price (high + low + close) / 3; atr is the simple moving average of
+# the true range, atr_pct the same as a percentage of the close; the two
+# returns split each day's close-to-close move at the open; abnormal_volume
+# is volume over the mean volume of the VOLUME_BASELINE_WINDOW days before.
+DAILY_COLUMNS = ('vwap', 'true_range', 'atr', 'atr_pct', 'overnight_return', 'intraday_return',
+                 'volume_baseline', 'abnormal_volume')
+
+# Per-(event, ticker) columns of event_metrics()
+EVENT_COLUMNS = ('peak_abnormal_volume', 'mean_abnormal_volume', 'overnight_pct', 'intraday_pct',
+                 'mean_atr_pct', 'close_vs_vwap_pct')
+
+
+def _rolling_sum(values, row_start, window):
+    """Sum of each row's trailing window, cut off at the first row of its ticker, and the rows it covers"""
+    rows = np.arange(len(values))
+    first = np.maximum(rows - window + 1, row_start)
+    prefix = np.concatenate([[0.0], np.cumsum(values)])
+    return prefix[rows + 1] - prefix[first], rows - first + 1
+
+
+class VolumeAnalytics:
+    """VWAP, true range/ATR, abnormal volume and overnight/intraday returns for every ticker at once.
+
+    All tickers' bars are packed end to end and every rolling statistic is a
+    difference of prefix sums, clipped at each ticker's first row, so the
+    whole universe is computed in one pass of array operations. frame()
+    returns one ticker's columns; event_metrics() summarizes event windows
+    for every (event, ticker) pair with searchsorted and reduceat.
+    """
+
+    def __init__(self, stock_data):
+        self.tickers = list(stock_data)
+        self._ticker_pos = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        days, columns = [], {column: [] for column in ('open', 'high', 'low', 'close', 'volume')}
+        for ticker in self.tickers:
+            df = stock_data[ticker]
+            days.append(_epoch_days(df['date'] if 'date' in df.columns else df.index))
+            for column in columns:
+                columns[column].append(df[column].to_numpy(dtype=np.float64))
+        self.lengths = np.array([len(d) for d in days], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)[:-1]]).astype(np.int64)
+        self.days = days
+        bars = {column: np.concatenate(values) if values else np.empty(0) for column, values in columns.items()}
+        self.close = bars['close']
+        self.values = self._daily(bars)
+
+    def _daily(self, bars):
+        open_, high, low, close, volume = (bars[column] for column in ('open', 'high', 'low', 'close', 'volume'))
+        row_start = np.repeat(self.offsets, self.lengths)
+        first_row = np.arange(len(close)) == row_start
+        prev_close = np.concatenate([[np.nan], close[:-1]])
+        prev_close[first_row] = np.nan
+
+        # Rolling VWAP of the typical price; days without volume carry no weight
+        typical = (high + low + close) / 3
+        weight = np.nan_to_num(volume)
+        traded, _ = _rolling_sum(np.nan_to_num(typical * weight), row_start, VWAP_WINDOW)
+        shares, _ = _rolling_sum(weight, row_start, VWAP_WINDOW)
+        vwap = np.divide(traded, shares, out=np.full(len(close), np.nan), where=shares > 0)
+
+        # True range reaches back to the previous close; a ticker's first day has only high - low
+        true_range = np.fmax(high, prev_close) - np.fmin(low, prev_close)
+        range_sum, count = _rolling_sum(np.nan_to_num(true_range), row_start, ATR_WINDOW)
+        atr = np.where(count == ATR_WINDOW, range_sum / ATR_WINDOW, np.nan)
+
+        # Baseline of the days before, so a spike doesn't raise its own baseline
+        volume_sum, count = _rolling_sum(weight, row_start, VOLUME_BASELINE_WINDOW + 1)
+        baseline = np.where(count == VOLUME_BASELINE_WINDOW + 1, (volume_sum - weight) / VOLUME_BASELINE_WINDOW,
+                            np.nan)
+
+        return {
+            'vwap': vwap,
+            'true_range': true_range,
+            'atr': atr,
+            'atr_pct': atr / close * 100,
+            'overnight_return': (open_ / prev_close - 1) * 100,
+            'intraday_return': (close / open_ - 1) * 100,
+            'volume_baseline': baseline,
+            'abnormal_volume': np.divide(volume, baseline, out=np.full(len(close), np.nan), where=baseline > 0),
+            'typical': typical,
+            'volume': weight
+        }
+
+    def __contains__(self, ticker):
+        return ticker in self._ticker_pos
+
+    def frame(self, ticker):
+        """A ticker's daily columns (DAILY_COLUMNS) with its dates"""
+        i = self._ticker_pos[ticker]
+        rows = slice(self.offsets[i], self.offsets[i] + self.lengths[i])
+        return pd.DataFrame({'date': self.days[i].astype('datetime64[D]').astype('datetime64[ns]'),
+                             'close': self.close[rows],
+                             **{column: self.values[column][rows] for column in DAILY_COLUMNS}})
+
+    def event_metrics(self, events, tickers=None, single_day_padding=SINGLE_DAY_PADDING):
+        """Volume and range statistics over each event window, one row per (event, ticker).
+
+        Windows match visual4's event impact: start to end date inclusive,
+        single-day events widened by single_day_padding each side. The
+        overnight and intraday parts compound to the window's close-to-close
+        change; close_vs_vwap_pct is the last close against the VWAP
+        anchored at the window's first day.
+        """
+        tickers = [t for t in (tickers or self.tickers) if t in self._ticker_pos]
+        start_dates = pd.to_datetime(events['Start Date'])
+        end_dates = pd.to_datetime(events['End Date'])
+        single_day = (start_dates == end_dates).to_numpy()
+        pad = int(single_day_padding / pd.Timedelta(days=1))
+        window_start = _epoch_days(start_dates.to_numpy()) - np.where(single_day, pad, 0)
+        window_end = _epoch_days(end_dates.to_numpy()) + np.where(single_day, pad, 0)
+
+        n_events, n_tickers = len(events), len(tickers)
+        lo = np.empty((n_events, n_tickers), dtype=np.int64)
+        hi = np.empty((n_events, n_tickers), dtype=np.int64)
+        for t, ticker in enumerate(tickers):
+            i = self._ticker_pos[ticker]
+            lo[:, t] = self.offsets[i] + np.searchsorted(self.days[i], window_start, side='left')
+            hi[:, t] = self.offsets[i] + np.searchsorted(self.days[i], window_end, side='right')
+        lo, hi = lo.ravel(), hi.ravel()
+
+        metrics = {column: np.full(len(lo), np.nan) for column in EVENT_COLUMNS}
+        lengths = hi - lo
+        v = np.flatnonzero(lengths >= 2)
+        if len(v):
+            idx = _segment_aranges(lo[v], lengths[v])
+            seg_starts = np.concatenate([[0], np.cumsum(lengths[v])[:-1]])
+            counts = lengths[v]
+
+            abnormal = self.values['abnormal_volume'][idx]
+            metrics['peak_abnormal_volume'][v] = np.fmax.reduceat(abnormal, seg_starts)
+            metrics['mean_abnormal_volume'][v] = (np.add.reduceat(np.nan_to_num(abnormal), seg_starts) /
+                                                  np.maximum(np.add.reduceat(np.isfinite(abnormal), seg_starts), 1))
+            atr_pct = self.values['atr_pct'][idx]
+            metrics['mean_atr_pct'][v] = (np.add.reduceat(np.nan_to_num(atr_pct), seg_starts) /
+                                          np.maximum(np.add.reduceat(np.isfinite(atr_pct), seg_starts), 1))
+
+            # Log returns of every day after the first, split at the open
+            overnight = np.log1p(self.values['overnight_return'][idx] / 100)
+            intraday = np.log1p(self.values['intraday_return'][idx] / 100)
+            overnight[seg_starts] = 0.0
+            intraday[seg_starts] = 0.0
+            metrics['overnight_pct'][v] = np.expm1(np.add.reduceat(np.nan_to_num(overnight), seg_starts)) * 100
+            metrics['intraday_pct'][v] = np.expm1(np.add.reduceat(np.nan_to_num(intraday), seg_starts)) * 100
+
+            weight = self.values['volume'][idx]
+            traded = np.add.reduceat(np.nan_to_num(self.values['typical'][idx] * weight), seg_starts)
+            shares = np.add.reduceat(weight, seg_starts)
+            anchored_vwap = np.divide(traded, shares, out=np.full(len(v), np.nan), where=shares > 0)
+            metrics['close_vs_vwap_pct'][v] = (self.close[idx[seg_starts + counts - 1]] / anchored_vwap - 1) * 100
+
+        return pd.DataFrame({
+            'event': np.repeat(events['Event'].to_numpy(), n_tickers),
+            'ticker': np.tile(np.array(tickers, dtype=object), n_events),
+            **metrics
+        })
+
+    def volume_spikes(self, ticker, ratio=VOLUME_SPIKE_RATIO):
+        """Days of ticker whose volume is at least ratio times its baseline"""
+        df = self.frame(ticker)
+        return df[df['abnormal_volume'] >= ratio]
+
+
+if __name__ == "__main__":
+    import time
+    from stock_store import load_stock_data, load_market_events
+
+    stock_data = load_stock_data(quality='drop')
+    start = time.perf_counter()
+    analytics = VolumeAnalytics(stock_data)
+    built = time.perf_counter()
+    metrics = analytics.event_metrics(load_market_events())
+    done = time.perf_counter()
+    rows = int(analytics.lengths.sum())
+    print(f"Daily analytics for {len(analytics.tickers)} tickers ({rows} rows) in {(built - start) * 1000:.1f} ms, "
+          f"{len(metrics)} event windows in {(done - built) * 1000:.1f} ms")
+    top = metrics.sort_values('peak_abnormal_volume', ascending=False).head(15)
+    print(top.to_string(index=False, float_format=lambda x: f"{x:.2f}"))